@@ -0,0 +1,5 @@
+# greenai - Supporting code for the Stanford Green AI Club Website
+#
+# main.py holds the components and pages of the site. The modules in
+# this package hold the machinery around them (caching, builds, tools)
+# so that main.py stays easy to read and edit.
@@ -0,0 +1,257 @@
+# greenai/assets.py - Fingerprinted static assets
+#
+# Files in public/ are served under content-addressed URLs such as
+# /static/3f2a9c0d1b7e4a55.css. Because the URL changes whenever the
+# content does, those responses can be cached by browsers forever
+# (Cache-Control: immutable). Identical files, like the two copies of
+# logo.png, share one URL.
+#
+# build_assets() runs at build time and
+#   * hashes every asset and writes public/static/manifest.json,
+#   * rewrites the relative url(...) references inside CSS files,
+#   * rewrites the asset references in the Quarto blog HTML,
+#   * writes precompressed .br/.gz sidecars next to text files.
+# Run it after every Quarto render:
+#   python -m greenai.assets
+#
+# AssetServer is the ASGI middleware that serves public/ with those
+# sidecars, conditional requests (ETag/Last-Modified), Range requests
+# and, when the server supports it, zero-copy sendfile.
+
+import gzip
+import hashlib
+import json
+import mimetypes
+import re
+import sys
+from functools import cache
+from pathlib import Path
+from urllib.parse import urljoin, urlsplit
+
+from starlette.responses import FileResponse, Response
+
+from greenai.metrics import annotate
+from greenai.pagecache import etag_matches
+
+try:
+    import brotli
+except ImportError:  # Brotli sidecars are skipped; gzip is always available
+    brotli = None
+
+STATIC_DIR = Path("public")
+HASHED_DIR = "static"
+MANIFEST = f"{HASHED_DIR}/manifest.json"
+FINGERPRINT_EXTS = {".css", ".js", ".png", ".jpg", ".jpeg", ".gif", ".svg", ".webp", ".avif", ".ico", ".woff", ".woff2", ".ttf"}
+COMPRESS_EXTS = {".css", ".js", ".json", ".svg", ".html", ".xml", ".txt", ".map", ".ico", ".ttf"}
+MIN_COMPRESS_SIZE = 1024
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "public, max-age=0, must-revalidate"
+
+_CSS_URL_RE = re.compile(r"""url\(\s*(['"]?)([^'")]+)\1\s*\)""")
+_HTML_REF_RE = re.compile(r"""\b(src|href)="([^"]+)\"""")
+
+
+# ----------------- BUILD
+
+def _is_local(ref: str) -> bool:
+    return not (urlsplit(ref).scheme or ref.startswith(("//", "#", "data:")))
+
+
+def _url(static_dir: Path, file: Path) -> str:
+    return "/" + file.relative_to(static_dir).as_posix()
+
+
+def _hashed_name(data: bytes, suffix: str) -> str:
+    return hashlib.sha256(data).hexdigest()[:16] + suffix
+
+
+def _write_if_changed(path: Path, data: bytes):
+    "Keep the mtime of unchanged files so their sidecars stay fresh"
+    if not path.exists() or path.read_bytes() != data:
+        path.write_bytes(data)
+
+
+def fingerprint(static_dir: Path) -> dict:
+    "Hash every asset; CSS is hashed after its own references have been rewritten"
+    files, objects, css = {}, {}, []
+    for f in sorted(static_dir.rglob("*")):
+        if not f.is_file() or f.suffix not in FINGERPRINT_EXTS or f.parts[len(static_dir.parts)] == HASHED_DIR:
+            continue
+        if f.suffix == ".css":
+            css.append(f)
+            continue
+        name = _hashed_name(f.read_bytes(), f.suffix)
+        files[_url(static_dir, f)] = f"/{HASHED_DIR}/{name}"
+        objects.setdefault(name, f.relative_to(static_dir).as_posix())
+
+    hashed_dir = static_dir / HASHED_DIR
+    hashed_dir.mkdir(parents=True, exist_ok=True)
+    for f in css:
+        base = _url(static_dir, f)
+
+        def swap(m):
+            ref = m.group(2)
+            target = files.get(urlsplit(urljoin(base, ref)).path) if _is_local(ref) else None
+            return f'url("{target}")' if target else m.group(0)
+
+        data = _CSS_URL_RE.sub(swap, f.read_text()).encode()
+        name = _hashed_name(data, f.suffix)
+        _write_if_changed(hashed_dir / name, data)
+        files[base] = f"/{HASHED_DIR}/{name}"
+        objects.setdefault(name, f"{HASHED_DIR}/{name}")
+    return {"files": files, "objects": objects}
+
+
+def rewrite_html(html: str, page_url: str, files: dict) -> str:
+    "Point the local src/href references of a page at their fingerprinted URLs"
+    def swap(m):
+        attr, ref = m.groups()
+        if not _is_local(ref):
+            return m.group(0)
+        target = files.get(urlsplit(urljoin(page_url, ref)).path)
+        return f'{attr}="{target}"' if target else m.group(0)
+    return _HTML_REF_RE.sub(swap, html)
+
+
+def write_sidecars(file: Path) -> int:
+    "Write .gz (and .br when brotli is installed) next to `file` if they are stale"
+    data, written = None, 0
+    encoders = {".gz": lambda d: gzip.compress(d, 9, mtime=0)}
+    if brotli is not None:
+        encoders[".br"] = lambda d: brotli.compress(d, quality=11)
+    for ext, encode in encoders.items():
+        sidecar = file.with_name(file.name + ext)
+        if sidecar.exists() and sidecar.stat().st_mtime >= file.stat().st_mtime:
+            continue
+        data = data if data is not None else file.read_bytes()
+        encoded = encode(data)
+        if len(encoded) < len(data) * 0.9:
+            sidecar.write_bytes(encoded)
+            written += 1
+    return written
+
+
+def build_assets(static_dir=STATIC_DIR, log=print) -> dict:
+    "Fingerprint, rewrite and precompress everything in `static_dir`"
+    static_dir = Path(static_dir)
+    manifest = fingerprint(static_dir)
+
+    # Drop rewritten CSS from earlier builds that is no longer referenced
+    for f in (static_dir / HASHED_DIR).iterdir():
+        if f.suffix == ".css" and f.name not in manifest["objects"]:
+            f.unlink()
+            for ext in (".gz", ".br"):
+                f.with_name(f.name + ext).unlink(missing_ok=True)
+
+    rewritten = 0
+    for page in static_dir.rglob("*.html"):
+        html = page.read_text()
+        new = rewrite_html(html, _url(static_dir, page), manifest["files"])
+        if new != html:
+            page.write_text(new)
+            rewritten += 1
+
+    _write_if_changed(static_dir / MANIFEST, (json.dumps(manifest, indent=2, sort_keys=True) + "\n").encode())
+    compressed = sum(
+        write_sidecars(f) for f in static_dir.rglob("*")
+        if f.is_file() and f.suffix in COMPRESS_EXTS and f.stat().st_size >= MIN_COMPRESS_SIZE
+    )
+    log(f"Fingerprinted {len(manifest['files'])} assets as {len(manifest['objects'])} objects, "
+        f"rewrote {rewritten} pages, wrote {compressed} compressed sidecars")
+    return manifest
+
+
+# ----------------- LOOKUP
+
+@cache
+def asset_manifest(static_dir=STATIC_DIR) -> dict:
+    path = Path(static_dir) / MANIFEST
+    return json.loads(path.read_text()) if path.exists() else {"files": {}, "objects": {}}
+
+
+def asset_url(path: str) -> str:
+    "Fingerprinted URL of a file in public/, or `path` itself if it has none"
+    return asset_manifest()["files"].get(path, path)
+
+
+# ----------------- SERVER
+
+def _mtime_ns(path: Path) -> int:
+    "Modification time of `path`, or -1 when it isn't a file"
+    try:
+        return path.stat().st_mtime_ns if path.is_file() else -1
+    except OSError:
+        return -1
+
+
+class AssetServer:
+    "ASGI middleware serving public/ with sidecars, conditional and Range requests"
+
+    def __init__(self, app, directory=STATIC_DIR):
+        self.app = app
+        self.static_dir = Path(directory)
+        self.directory = self.static_dir.resolve()
+
+    def lookup(self, path: str):
+        "The file to serve for `path` and whether it is content-addressed"
+        prefix = f"/{HASHED_DIR}/"
+        if path.startswith(prefix):
+            obj = asset_manifest(self.static_dir)["objects"].get(path[len(prefix):])
+            return (self.directory / obj, True) if obj else (None, False)
+        file = (self.directory / path.lstrip("/")).resolve()
+        if not file.is_relative_to(self.directory) or not file.is_file():
+            return None, False
+        return file, False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in ("GET", "HEAD"):
+            return await self.app(scope, receive, send)
+        file, immutable = self.lookup(scope["path"])
+        if file is None:
+            return await self.app(scope, receive, send)
+        annotate(scope, route="static", kind="static")
+        await self.response(file, immutable, scope)(scope, receive, send)
+
+    def response(self, file: Path, immutable: bool, scope):
+        headers = {k.decode("latin-1"): v.decode("latin-1") for k, v in scope["headers"]}
+        media_type = mimetypes.guess_type(file.name)[0] or "application/octet-stream"
+        out = {"cache-control": IMMUTABLE if immutable else REVALIDATE}
+
+        # A sidecar older than its file is left over from before an edit, so it's ignored
+        mtime = file.stat().st_mtime_ns
+        sidecars = [(enc, file.with_name(file.name + ext)) for enc, ext in (("br", ".br"), ("gzip", ".gz"))]
+        sidecars = [(enc, f) for enc, f in sidecars if _mtime_ns(f) >= mtime]
+        if sidecars:
+            out["vary"] = "Accept-Encoding"
+
+        # Pick the representation: a precompressed sidecar unless a byte range was asked for
+        body, encoding = file, None
+        if "range" not in headers:
+            accepted = {e.split(";")[0].strip() for e in headers.get("accept-encoding", "").split(",")}
+            body, encoding = next(((f, enc) for enc, f in sidecars if enc in accepted), (file, None))
+        if encoding:
+            out["content-encoding"] = encoding
+
+        stat = body.stat()
+        out["etag"] = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+        if "if-none-match" in headers and etag_matches(headers["if-none-match"], out["etag"]):
+            return Response(status_code=304, headers=out)
+        if body is file and "range" not in headers and "http.response.zerocopysend" in scope.get("extensions", {}):
+            return ZeroCopyFileResponse(body, headers=out, media_type=media_type, stat_result=stat)
+        return FileResponse(body, headers=out, media_type=media_type, stat_result=stat)
+
+
+class ZeroCopyFileResponse(FileResponse):
+    "FileResponse that hands the file descriptor to the server (ASGI zerocopysend extension)"
+
+    async def __call__(self, scope, receive, send):
+        self.set_stat_headers(self.stat_result or Path(self.path).stat())
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if scope["method"].upper() == "HEAD":
+            return await send({"type": "http.response.body", "body": b""})
+        with open(self.path, "rb") as f:
+            await send({"type": "http.response.zerocopysend", "file": f.fileno()})
+
+
+if __name__ == "__main__":
+    build_assets(*sys.argv[1:2])
@@ -0,0 +1,257 @@
+# greenai/bench.py - Render benchmarks for the components and pages
+#
+# Times every component in main.py (building the FT tree and turning it
+# into HTML) and every page through an in-process ASGI client, and
+# reports time per call, memory allocated per call and the size of the
+# HTML. Results can be saved as a baseline; later runs fail when a
+# benchmark got slower than the baseline by more than the threshold.
+#
+#   python -m greenai.bench                 # run and compare with the baseline
+#   python -m greenai.bench --save          # run and store a new baseline
+#   python -m greenai.bench -k Hero -t 0.5  # only matching names, 50% threshold
+#
+# The explorer benchmarks query a generated database of EXPLORER_ROWS
+# projects with the content cache cleared, and the search benchmarks a
+# generated search.json of SEARCH_SECTIONS blog sections without the
+# result cache (and, for "new prefix", without the prefix cache); both
+# fail when their p99 is over the budget in BUDGETS.
+
+import argparse
+import json
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+BASELINE = Path("bench_baseline.json")
+THRESHOLD = 0.25
+MIN_TIME = 0.2
+MIN_RUNS = 20
+
+COMPONENTS = [
+    "NavbarSection", "HeroSection", "OurMission", "CurrentInitiatives", "Projects", "Resources",
+    "FAQ", "Contact", "FooterSection", "AboutUs", "Team", "ContactBox", "SeeProjects",
+]
+ROUTES = ["/", "/about", "/contact", "/projects", "/resources"]
+EXPLORER_ROWS = 20_000
+SEARCH_SECTIONS = 5_000
+# name prefix -> p99 budget in ms
+BUDGETS = {"explorer:": 20, "search:": 1}
+
+# name -> setup function returning the op to time; op() runs one iteration
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    "Register a benchmark; the decorated function sets up and returns a callable to time"
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+
+def register_site():
+    "Register the benchmarks for the components and pages of main.py"
+    import main
+    from fasthtml.common import to_xml
+    from starlette.testclient import TestClient
+    from greenai.fragments import fragments
+    from greenai.metrics import find_middleware
+    from greenai.pagecache import PageCache
+
+    for name in COMPONENTS:
+        # Time building the component, not looking it up in the fragment cache
+        component = getattr(main, name)
+        component = getattr(component, "__wrapped__", component)
+        benchmark(f"component:{name}")(lambda component=component: lambda: to_xml(component()))
+
+    # Entering the client keeps one event loop thread for every request
+    client = TestClient(main.app).__enter__()
+    cache = find_middleware(main.app, PageCache)
+    for path in ROUTES:
+        def uncached(path=path):
+            def op():
+                if cache is not None:
+                    cache.clear()
+                fragments.clear()
+                return client.get(path).content
+            return op
+        benchmark(f"route:{path}")(uncached)
+        if cache is not None and path in cache.paths:
+            benchmark(f"route:{path} (cached)")(lambda path=path: lambda: client.get(path).content)
+
+
+def register_explorer(directory, rows=EXPLORER_ROWS):
+    "Register the projects explorer queries against a generated database of `rows` projects in `directory`"
+    import random
+    from greenai.content import ContentStore
+    from greenai.explorer import ProjectFilters, count_projects, facets, search_projects
+
+    rng = random.Random(0)
+    # A few topic words in a vocabulary of filler words, so search terms are as selective as in real text
+    topics = ("carbon energy efficient training inference datacenter climate grid solar model sparse "
+              "pruning quantization emissions hardware cooling battery materials forecasting wildfire").split()
+    filler = ["".join(rng.choices("abcdefghijklmnopqrstuvwxyz", k=rng.randint(4, 9))) for _ in range(3000)]
+    departments = ["Computer Science", "Electrical Engineering", "Earth System Science", "Civil Engineering",
+                   "Materials Science", "Economics", "Mechanical Engineering", "Statistics"]
+    projects = [{"title": " ".join(rng.sample(topics, 2) + rng.sample(filler, 2)).title(),
+                 "description": " ".join(rng.choices(filler, k=25) + rng.sample(topics, 2)),
+                 "category": rng.choice(["green-in", "green-by"]), "department": rng.choice(departments),
+                 "year": rng.randint(2015, 2025)} for _ in range(rows)]
+    store = ContentStore(Path(directory) / "content.db", seed={"projects": projects})
+    _, cursor = search_projects(store, ProjectFilters(), limit=1000)
+
+    def query(run):
+        def setup():
+            def op():
+                store.cache.clear()
+                return run()
+            return op
+        return setup
+
+    benchmark("explorer:browse")(query(lambda: search_projects(store, ProjectFilters())))
+    benchmark("explorer:search")(query(lambda: search_projects(store, ProjectFilters(q="carbon effic"))))
+    benchmark("explorer:filtered")(query(lambda: search_projects(store, ProjectFilters(category="green-by", year=2021))))
+    benchmark("explorer:search+filter")(query(
+        lambda: search_projects(store, ProjectFilters(q="solar", department="Economics"))))
+    benchmark("explorer:page 51")(query(lambda: search_projects(store, ProjectFilters(), after=cursor)))
+    benchmark("explorer:facets")(query(lambda: facets(store, ProjectFilters())))
+    benchmark("explorer:facets (search)")(query(lambda: facets(store, ProjectFilters(q="grid"))))
+    benchmark("explorer:facets (filtered)")(query(lambda: facets(store, ProjectFilters(category="green-in", year=2020))))
+
+    def results(filters):
+        "What /projects/results does for a new search: the first page, the total and the facets"
+        return search_projects(store, filters), count_projects(store, filters), facets(store, filters)
+
+    benchmark("explorer:results (search+filter)")(query(lambda: results(ProjectFilters(q="grid", year=2020))))
+
+
+def register_search(directory, sections=SEARCH_SECTIONS):
+    "Register blog searches against a generated search.json of `sections` sections in `directory`"
+    import random
+    from greenai.search import SearchIndex
+
+    rng = random.Random(0)
+    topics = ("carbon energy efficient training inference datacenter climate grid solar model sparse pruning "
+              "quantization emissions hardware cooling battery materials forecasting sustainable sustainability").split()
+    filler = ["".join(rng.choices("abcdefghijklmnopqrstuvwxyz", k=rng.randint(3, 10))) for _ in range(20_000)]
+    entries = [{"objectID": f"posts/p{i // 20}.html#s{i}", "href": f"posts/p{i // 20}.html#s{i}",
+                "title": " ".join(rng.sample(topics, 2) + rng.sample(filler, 3)),
+                "section": " ".join(rng.sample(filler, 3)),
+                "text": " ".join(rng.choices(filler, k=150) + rng.sample(topics, 3))} for i in range(sections)]
+    path = Path(directory) / "search.json"
+    path.write_text(json.dumps(entries))
+    index = SearchIndex(path)
+    index.refresh()
+
+    def search(q, new_prefix=False):
+        def setup():
+            def op():
+                index.index.results.clear()
+                if new_prefix:
+                    index.index.prefixes.clear()
+                return index.search(q)
+            return op
+        return setup
+
+    benchmark("search:one word")(search("carbon"))
+    benchmark("search:two words")(search("carbon training"))
+    benchmark("search:three words")(search("efficient grid solar"))
+    benchmark("search:prefix")(search("sustain energy"))
+    benchmark("search:new prefix")(search("sustain energy", new_prefix=True))
+
+
+def over_budget(results, budgets=BUDGETS, log=print):
+    "Names of the benchmarks whose p99 is over their budget"
+    over = []
+    for name, r in results.items():
+        for prefix, budget_ms in budgets.items():
+            if name.startswith(prefix) and r["p99_ns"] / 1e6 > budget_ms:
+                over.append(name)
+                log(f"OVER BUDGET {name}: p99 {r['p99_ns'] / 1e6:.1f} ms > {budget_ms} ms")
+    return over
+
+
+def measure(op, min_time=MIN_TIME, min_runs=MIN_RUNS):
+    "Time `op` repeatedly and measure its allocations once"
+    result = op()  # warm up
+    samples, deadline = [], time.perf_counter() + min_time
+    while len(samples) < min_runs or time.perf_counter() < deadline:
+        t = time.perf_counter_ns()
+        op()
+        samples.append(time.perf_counter_ns() - t)
+
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    op()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    samples.sort()
+    return {
+        "ns_per_op": int(statistics.median(samples)),
+        "min_ns": samples[0],
+        "p99_ns": samples[min(len(samples) - 1, int(len(samples) * 0.99))],
+        "runs": len(samples),
+        "alloc_bytes": peak,
+        "html_bytes": len(result) if isinstance(result, (str, bytes)) else None,
+    }
+
+
+def run(pattern="", log=print):
+    results = {}
+    for name, setup in BENCHMARKS.items():
+        if pattern.lower() in name.lower():
+            results[name] = measure(setup())
+            r = results[name]
+            size = f"{r['html_bytes']:>8} B" if r["html_bytes"] is not None else " " * 10
+            log(f"{name:<40} {r['ns_per_op'] / 1e3:>10.1f} µs/op  p99 {r['p99_ns'] / 1e3:>9.1f} µs  "
+                f"{r['alloc_bytes'] / 1024:>8.1f} KiB  {size}")
+    return results
+
+
+def compare(results, baseline, threshold=THRESHOLD, log=print):
+    "Names of the benchmarks that are slower than the baseline by more than `threshold`"
+    # The fastest run is much less noisy than the median on a busy machine
+    regressions = []
+    for name, r in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        change = r["min_ns"] / base["min_ns"] - 1
+        if change > threshold:
+            regressions.append(name)
+            log(f"REGRESSION {name}: {base['min_ns'] / 1e3:.1f} -> {r['min_ns'] / 1e3:.1f} µs/op fastest ({change:+.0%})")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render benchmarks for the site")
+    parser.add_argument("-k", "--filter", default="", help="only run benchmarks whose name contains this")
+    parser.add_argument("-t", "--threshold", type=float, default=THRESHOLD, help="allowed slowdown, e.g. 0.25 = 25%%")
+    parser.add_argument("--baseline", type=Path, default=BASELINE)
+    parser.add_argument("--save", action="store_true", help="store the results as the new baseline")
+    args = parser.parse_args(argv)
+
+    register_site()
+    with tempfile.TemporaryDirectory() as directory:
+        register_explorer(directory)
+        register_search(directory)
+        results = run(args.filter)
+    over = over_budget(results)
+    if args.save:
+        baseline = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+        args.baseline.write_text(json.dumps({**baseline, **results}, indent=2, sort_keys=True) + "\n")
+        print(f"Saved {len(results)} results to {args.baseline}")
+        return 1 if over else 0
+    if not args.baseline.exists():
+        print(f"No baseline at {args.baseline}; run with --save to create one")
+        return 1 if over else 0
+    regressions = compare(results, json.loads(args.baseline.read_text()), args.threshold)
+    return 1 if regressions or over else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
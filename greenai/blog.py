@@ -0,0 +1,115 @@
+# greenai/blog.py - In-memory store of the Quarto blog posts
+#
+# Blog posts are rendered by Quarto into public/blog/posts/*.html.
+# PostStore keeps each post in memory (reloading it when the file's
+# mtime changes) so the routes in main.py can answer with the post
+# itself instead of redirecting to the .html file.
+#
+# Quarto writes relative links ("../posts/index.html"), which only work
+# from the post's own URL. They are made absolute when a post is loaded
+# so the same HTML can be served from /blog/posts/<name> or /resources.
+
+import hashlib
+import re
+from dataclasses import dataclass
+from email.utils import formatdate
+from pathlib import Path
+from urllib.parse import urljoin
+
+from starlette.responses import HTMLResponse, Response
+
+from greenai.pagecache import etag_matches
+
+_NAME_RE = re.compile(r"^[\w-]+$")
+_REF_RE = re.compile(r"""\b(src|href)="([^"]+)\"""")
+_OFFSET_RE = re.compile(r'(<meta name="quarto:offset" content=")([^"]*)(")')
+_TITLE_RE = re.compile(r"<title>(.*?)</title>", re.S)
+_MAIN_RE = re.compile(r"<main\b.*?</main>", re.S)
+
+
+def absolute_refs(html: str, page_url: str) -> str:
+    "Resolve relative src/href (and Quarto's site offset) against `page_url`"
+    def swap(m):
+        attr, ref = m.groups()
+        if ref.startswith(("/", "#", "data:", "mailto:")) or "://" in ref:
+            return m.group(0)
+        return f'{attr}="{urljoin(page_url, ref)}"'
+    html = _REF_RE.sub(swap, html)
+    return _OFFSET_RE.sub(lambda m: m.group(1) + urljoin(page_url, m.group(2)) + m.group(3), html)
+
+
+def etag_for(*parts) -> str:
+    return '"' + hashlib.sha256("\0".join(map(str, parts)).encode()).hexdigest()[:32] + '"'
+
+
+@dataclass
+class Post:
+    "A rendered blog post as served to visitors"
+    name: str
+    mtime: float
+    html: bytes
+    etag: str
+    last_modified: str
+    title: str
+    main: str
+
+
+class PostStore:
+    "Blog posts kept in memory, keyed by name and reloaded when their file changes"
+
+    def __init__(self, directory="public/blog/posts", url_prefix="/blog/posts/"):
+        self.directory = Path(directory)
+        self.url_prefix = url_prefix
+        self.posts = {}
+        self.wrapped_posts = {}
+
+    def get(self, name: str):
+        "The post called `name`, or None when there is no such post"
+        if not _NAME_RE.match(name):
+            return None
+        path = self.directory / f"{name}.html"
+        try:
+            mtime = path.stat().st_mtime
+        except FileNotFoundError:
+            self.posts.pop(name, None)
+            return None
+        post = self.posts.get(name)
+        if post is None or post.mtime != mtime:
+            post = self.load(name, path, mtime)
+            self.posts[name] = post
+        return post
+
+    def load(self, name, path, mtime) -> Post:
+        html = absolute_refs(path.read_text(), f"{self.url_prefix}{name}.html")
+        title = _TITLE_RE.search(html)
+        main = _MAIN_RE.search(html)
+        body = html.encode()
+        return Post(
+            name=name,
+            mtime=mtime,
+            html=body,
+            etag='"' + hashlib.sha256(body).hexdigest()[:32] + '"',
+            last_modified=formatdate(mtime, usegmt=True),
+            title=title.group(1).strip() if title else name,
+            main=main.group(0) if main else "",
+        )
+
+    def wrapped(self, post: Post, render, key=""):
+        "`render(post)` cached per post, until the post changes or `key` does"
+        cached = self.wrapped_posts.get(post.name)
+        if cached is None or cached[0] != (post.mtime, key):
+            cached = ((post.mtime, key), render(post))
+            self.wrapped_posts[post.name] = cached
+        return cached[1]
+
+
+def not_modified(req, etag: str) -> bool:
+    return etag_matches(req.headers.get("if-none-match", ""), etag) if "if-none-match" in req.headers else False
+
+
+def post_response(req, post: Post):
+    "The post's own HTML, or 304 when the browser already has it"
+    headers = {"etag": post.etag, "last-modified": post.last_modified, "cache-control": "no-cache"}
+    if not_modified(req, post.etag):
+        return Response(status_code=304, headers=headers)
+    return HTMLResponse(post.html, headers=headers)
@@ -0,0 +1,272 @@
+# greenai/blogbuild.py - Incremental build of the Quarto blog
+#
+# `quarto render` re-renders every post and rewrites listings.json and
+# search.json, which gets slow once the blog has hundreds of posts. This
+# renders only what changed:
+#   * every page (a .qmd/.md/.ipynb under SOURCE_DIRS) is hashed
+#     together with the files it uses: the folder named after it
+#     (posts/<name>/) and any local file it links to. The project files
+#     (_quarto.yml, _brand.yml, styles.css, _metadata.yml) are part of
+#     every hash, so changing them re-renders everything,
+#   * a listing page (front matter with `listing:`) also depends on the
+#     front matter of the posts next to it, so it is re-rendered when a
+#     post is added, removed or retitled,
+#   * each changed page is rendered by its own Quarto process in a
+#     private copy of the project holding just that page and its files,
+#     so pages render in parallel without sharing Quarto's scratch files,
+#   * the page's HTML and files are copied into public/blog and its
+#     entries in search.json and listings.json are replaced in place,
+#   * the hashes are kept in _blog_build.json (commit it along with
+#     public/blog so the next build starts from there), and finally the
+#     assets are re-fingerprinted (greenai/assets.py).
+#
+#   python -m greenai.blogbuild            # render what changed
+#   python -m greenai.blogbuild --force    # render everything
+#   python -m greenai.blogbuild --dry-run  # list what would be rendered
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+PROJECT_FILES = ("_quarto.yml", "_brand.yml", "styles.css")
+SOURCE_DIRS = ("", "posts")
+SOURCE_EXTS = (".qmd", ".md", ".ipynb")
+OUTPUT_DIR = "public/blog"
+STATE = "_blog_build.json"
+# Output files indexing the whole site, never copied from a page's render;
+# a page's entries are patched into the first two, sitemap.xml is left as is
+INDEXES = ("search.json", "listings.json", "sitemap.xml")
+
+_FRONT_MATTER_RE = re.compile(r"\A---\s*\n(.*?)\n---\s*\n", re.S)
+_LOCAL_REF_RE = re.compile(r"""(?:\]\(|src=["']|href=["']|^\s*image:\s*["']?)([^)"'\s#?]+)""", re.M)
+
+
+def front_matter(source: Path) -> str:
+    "The YAML front matter of a page (a notebook's is its first raw cell)"
+    if source.suffix == ".ipynb":
+        cells = json.loads(source.read_text()).get("cells", [])
+        text = "".join(cells[0]["source"]) + "\n" if cells and cells[0].get("cell_type") == "raw" else ""
+    else:
+        text = source.read_text()
+    m = _FRONT_MATTER_RE.match(text)
+    return m.group(1) if m else ""
+
+
+def is_listing(source: Path) -> bool:
+    return re.search(r"^listing:", front_matter(source), re.M) is not None
+
+
+def sha256_files(files) -> str:
+    h = hashlib.sha256()
+    for f in sorted(files):
+        h.update(str(f).encode() + b"\0" + f.read_bytes() + b"\0")
+    return h.hexdigest()
+
+
+class BlogProject:
+    "The blog's Quarto project: its pages, what each depends on and where it renders to"
+
+    def __init__(self, root=".", output_dir=OUTPUT_DIR):
+        self.root = Path(root)
+        self.output = self.root / output_dir
+
+    def rel(self, path: Path) -> str:
+        return path.relative_to(self.root).as_posix()
+
+    def project_files(self) -> list[Path]:
+        "Files every page depends on"
+        names = [*PROJECT_FILES, *(f"{d}/_metadata.yml" for d in SOURCE_DIRS if d)]
+        return [self.root / name for name in names if (self.root / name).exists()]
+
+    def sources(self) -> list[Path]:
+        "Every page Quarto renders"
+        pages = []
+        for d in SOURCE_DIRS:
+            for f in sorted((self.root / d).glob("*")):
+                if f.suffix in SOURCE_EXTS and not f.name.startswith(("_", ".")) and f.stem.upper() != "README":
+                    pages.append(f)
+        return pages
+
+    def resources(self, source: Path) -> list[Path]:
+        "The files a page uses: its own folder and the local files it links to"
+        files = {f for f in (source.parent / source.stem).rglob("*") if f.is_file()}
+        for ref in _LOCAL_REF_RE.findall(source.read_text()):
+            path = Path(os.path.normpath(source.parent / ref))
+            if path.is_file() and not os.path.relpath(path, self.root).startswith(".."):
+                files.add(path)
+        return sorted(files)
+
+    def siblings(self, source: Path) -> list[Path]:
+        "The pages a listing lists: the others in its folder"
+        return [s for s in self.sources() if s.parent == source.parent and s != source]
+
+    def digest(self, source: Path, common: str) -> str:
+        h = hashlib.sha256(common.encode())
+        h.update(sha256_files([source, *self.resources(source)]).encode())
+        if is_listing(source):
+            for s in self.siblings(source):
+                h.update(f"{self.rel(s)}\0{front_matter(s)}\0".encode())
+        return h.hexdigest()
+
+    def digests(self) -> dict:
+        common = sha256_files(self.project_files())
+        return {self.rel(s): self.digest(s, common) for s in self.sources()}
+
+    def output_html(self, rel_source: str) -> str:
+        "Where Quarto writes a page, relative to the output dir, e.g. posts/resources.html"
+        return Path(rel_source).with_suffix(".html").as_posix()
+
+
+# ----------------- RENDERING
+
+def render_page(root: str, rel_source: str, files: list, quarto="quarto") -> dict:
+    "Render one page in a private copy of the project; returns the files it produced"
+    root = Path(root)
+    work = Path(tempfile.mkdtemp(prefix="blogbuild-"))
+    for rel in files:
+        dest = work / rel
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copy2(root / rel, dest)
+    start = time.perf_counter()
+    proc = subprocess.run([quarto, "render", rel_source, "--quiet"], cwd=work, capture_output=True, text=True)
+    seconds = time.perf_counter() - start
+    if proc.returncode != 0:
+        shutil.rmtree(work, ignore_errors=True)
+        return {"source": rel_source, "ok": False, "seconds": seconds, "error": proc.stderr[-2000:]}
+    return {"source": rel_source, "ok": True, "seconds": seconds, "work": str(work)}
+
+
+def merge_output(work_output: Path, output: Path, page_html: str, search: list, listings: list):
+    "Copy a rendered page into the output dir and patch its entries into the shared indexes"
+    for f in work_output.rglob("*"):
+        rel = f.relative_to(work_output)
+        if not f.is_file() or rel.as_posix() in INDEXES:
+            continue
+        # Unchanged files (site_libs, shared images) keep their mtime and sidecars
+        dest = output / rel
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        if not dest.exists() or dest.read_bytes() != f.read_bytes():
+            shutil.copy2(f, dest)
+
+    new_search = work_output / "search.json"
+    entries = json.loads(new_search.read_text()) if new_search.exists() else []
+    replace_entries(search, page_html, [e for e in entries if page_of(e) == page_html])
+
+    new_listings = work_output / "listings.json"
+    if new_listings.exists():
+        for listing in json.loads(new_listings.read_text()):
+            if listing["listing"].lstrip("/") == page_html:
+                listings[:] = [l for l in listings if l["listing"] != listing["listing"]] + [listing]
+
+
+def page_of(entry: dict) -> str:
+    "The page a search.json entry belongs to, e.g. posts/resources.html"
+    return entry["href"].split("#")[0]
+
+
+def replace_entries(search: list, page_html: str, entries: list):
+    "Swap the search entries of one page for `entries`, keeping their place in the list"
+    positions = [i for i, e in enumerate(search) if page_of(e) == page_html]
+    at = positions[0] if positions else len(search)
+    search[:] = [e for e in search if page_of(e) != page_html]
+    search[at:at] = entries
+
+
+def remove_page(output: Path, page_html: str, search: list, listings: list):
+    "Delete the output of a page whose source is gone"
+    (output / page_html).unlink(missing_ok=True)
+    for ext in (".br", ".gz"):
+        (output / (page_html + ext)).unlink(missing_ok=True)
+    shutil.rmtree(output / page_html.replace(".html", "_files"), ignore_errors=True)
+    replace_entries(search, page_html, [])
+    for listing in listings:
+        listing["items"] = [i for i in listing["items"] if i.lstrip("/") != page_html]
+
+
+def load_json(path: Path, default):
+    return json.loads(path.read_text()) if path.exists() else default
+
+
+def build_blog(root=".", force=False, jobs=None, dry_run=False, quarto=None, log=print) -> dict:
+    "Render the pages that changed since the last build and patch the shared indexes"
+    project = BlogProject(root)
+    state_path = project.root / STATE
+    state = load_json(state_path, {})
+    digests = project.digests()
+    changed = sorted(s for s, d in digests.items() if force or state.get(s) != d)
+    removed = sorted(set(state) - set(digests))
+    log(f"{len(digests)} pages: {len(changed)} to render, {len(removed)} removed")
+    if dry_run or not (changed or removed):
+        for s in changed:
+            log(f"  {s}")
+        return {"changed": changed, "removed": removed, "rendered": []}
+
+    quarto = quarto or os.environ.get("QUARTO", "quarto")
+    if changed and shutil.which(quarto) is None:
+        raise SystemExit(f"{quarto} not found; install Quarto (https://quarto.org) or set QUARTO")
+
+    shared = [project.rel(f) for f in project.project_files()]
+    tasks = {}
+    for s in changed:
+        source = project.root / s
+        pages = [source, *(project.siblings(source) if is_listing(source) else [])]
+        files = {project.rel(p) for page in pages for p in [page, *project.resources(page)]}
+        tasks[s] = sorted(files | set(shared))
+
+    output_dir = project.output.relative_to(project.root)
+    search = load_json(project.output / "search.json", [])
+    listings = load_json(project.output / "listings.json", [])
+    start, results = time.perf_counter(), []
+    with ProcessPoolExecutor(max_workers=jobs or os.cpu_count()) as pool:
+        futures = [pool.submit(render_page, str(project.root), s, files, quarto) for s, files in tasks.items()]
+        for future in futures:
+            result = future.result()
+            results.append(result)
+            if not result["ok"]:
+                log(f"FAILED {result['source']} ({result['seconds']:.1f} s)\n{result['error']}")
+                continue
+            work = Path(result["work"])
+            merge_output(work / output_dir, project.output, project.output_html(result["source"]), search, listings)
+            shutil.rmtree(work, ignore_errors=True)
+            state[result["source"]] = digests[result["source"]]
+            log(f"rendered {result['source']} ({result['seconds']:.1f} s)")
+
+    for s in removed:
+        remove_page(project.output, project.output_html(s), search, listings)
+        state.pop(s, None)
+        log(f"removed {s}")
+
+    (project.output / "search.json").write_text(json.dumps(search, indent=2) + "\n")
+    (project.output / "listings.json").write_text(json.dumps(listings) + "\n")
+    state_path.write_text(json.dumps(dict(sorted(state.items())), indent=2) + "\n")
+
+    from greenai.assets import build_assets
+    build_assets(project.output.parent, log=log)
+    failed = [r["source"] for r in results if not r["ok"]]
+    log(f"Built the blog in {time.perf_counter() - start:.1f} s" + (f", {len(failed)} failed" if failed else ""))
+    return {"changed": changed, "removed": removed, "rendered": [r["source"] for r in results if r["ok"]],
+            "failed": failed}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render the blog pages that changed")
+    parser.add_argument("--force", action="store_true", help="render every page")
+    parser.add_argument("--dry-run", action="store_true", help="only list the pages that would be rendered")
+    parser.add_argument("-j", "--jobs", type=int, help="Quarto processes at once (default: one per CPU)")
+    parser.add_argument("--root", default=".", help="the Quarto project (where _quarto.yml is)")
+    args = parser.parse_args(argv)
+    result = build_blog(args.root, args.force, args.jobs, args.dry_run)
+    return 1 if result.get("failed") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,149 @@
+# greenai/coldstart.py - Cold-start (import time) report
+#
+# On Vercel every new instance imports main.py before it can answer its
+# first request. This runs `python -X importtime -c "import main"` in a
+# fresh interpreter, a few times, and reports how long the import took
+# overall and which modules cost the most, plus how long the first
+# request takes after that.
+#
+# Most of the import is FastHTML and MonsterUI, which no change to the
+# site can speed up, and which vary a lot from run to run. The budget is
+# for what main adds once they are imported (about 5 ms before greenai/
+# existed). check_budget() lists what is wrong with the cold start, for
+# CI and tests/test_coldstart.py: main's own import over the budget, or
+# a module only some routes or the build need (LAZY_MODULES) imported
+# by `import main`.
+#
+#   python -m greenai.coldstart              # report
+#   python -m greenai.coldstart --budget 30  # exit 1 when main adds over 30 ms
+#   PAGE_SNAPSHOT=dist python -m greenai.coldstart
+
+import argparse
+import re
+import statistics
+import subprocess
+import sys
+
+RUNS = 3
+FRAMEWORKS = ("fasthtml.common", "monsterui.all")
+BUDGET_MS = 50
+# Only some routes, the build steps and tools need these; main imports
+# them when they are used
+LAZY_MODULES = ("greenai.search", "greenai.events", "greenai.explorer",
+                "greenai.export", "greenai.bench", "greenai.blogbuild", "greenai.coldstart", "greenai.loadtest",
+                "greenai.pageweight", "PIL", "fontTools")
+_LINE_RE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+OWN_IMPORT = """
+import time
+import {frameworks}
+t = time.perf_counter()
+import {module}
+print(f"{{(time.perf_counter() - t) * 1000:.3f}}")
+"""
+
+FIRST_REQUEST = """
+import time
+t = time.perf_counter()
+import main
+from starlette.testclient import TestClient
+t1 = time.perf_counter()
+with TestClient(main.app) as client:
+    client.get("/")
+t2 = time.perf_counter()
+print(f"{(t1 - t) * 1000:.3f} {(t2 - t1) * 1000:.3f}")
+"""
+
+
+def parse_importtime(stderr: str):
+    "{module: (self µs, cumulative µs, depth)} from -X importtime output"
+    modules = {}
+    for line in stderr.splitlines():
+        m = _LINE_RE.match(line)
+        if m:
+            modules[m.group(4)] = (int(m.group(1)), int(m.group(2)), len(m.group(3)) // 2)
+    return modules
+
+
+def import_times(module="main", python=sys.executable):
+    "Per-module import times of `module` in a fresh interpreter"
+    proc = subprocess.run([python, "-X", "importtime", "-c", f"import {module}"],
+                          capture_output=True, text=True, check=True)
+    return parse_importtime(proc.stderr)
+
+
+def own_import_ms(module="main", runs=RUNS, python=sys.executable):
+    "Median ms that importing `module` takes once the FRAMEWORKS are imported, in fresh interpreters"
+    code = OWN_IMPORT.format(frameworks=", ".join(FRAMEWORKS), module=module)
+    samples = [float(subprocess.run([python, "-c", code], capture_output=True, text=True, check=True).stdout)
+               for _ in range(runs)]
+    return statistics.median(samples)
+
+
+def import_report(module="main", runs=RUNS, top=15, python=sys.executable):
+    "Median import time of `module` (all of it, and on top of the frameworks) and the most expensive modules it pulls in"
+    samples = [import_times(module, python) for _ in range(runs)]
+    total_ms = statistics.median(s[module][1] for s in samples) / 1000
+    last = samples[-1]
+    return {
+        "module": module,
+        "total_ms": round(total_ms, 1),
+        "own_ms": round(own_import_ms(module, runs, python), 1),
+        # The packages imported directly (depth 1) and the modules that are slow themselves
+        "direct": sorted(((name, c / 1000) for name, (_, c, d) in last.items() if d == 1), key=lambda x: -x[1])[:top],
+        "self": sorted(((name, s / 1000) for name, (s, _, _) in last.items()), key=lambda x: -x[1])[:top],
+        "modules": sorted(last),
+    }
+
+
+def first_request_ms(python=sys.executable):
+    "(import ms, first GET / ms) in a fresh interpreter"
+    out = subprocess.run([python, "-c", FIRST_REQUEST], capture_output=True, text=True, check=True).stdout
+    import_ms, request_ms = map(float, out.split()[-2:])
+    return import_ms, request_ms
+
+
+def offenders(report, budget_ms=None, lazy=LAZY_MODULES) -> list[str]:
+    "What in an import report breaks the budget or imports a module that should stay lazy"
+    found = []
+    if budget_ms is not None and report["own_ms"] > budget_ms:
+        found.append(f"import {report['module']} took {report['own_ms']:.1f} ms after the frameworks "
+                     f"(budget {budget_ms:.1f} ms)")
+    modules = set(report["modules"])
+    found += [f"{name} is imported at startup" for name in lazy if name in modules]
+    return found
+
+
+def check_budget(budget_ms: float = BUDGET_MS, module="main", runs=RUNS, lazy=LAZY_MODULES) -> list[str]:
+    "The offenders in a fresh import report of `module`; empty when the cold start is within budget"
+    return offenders(import_report(module, runs), budget_ms, lazy)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure the cold start of the site")
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--runs", type=int, default=RUNS)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--budget", type=float, help="fail when main adds more to the frameworks' import (ms)")
+    args = parser.parse_args(argv)
+
+    report = import_report(args.module, args.runs, args.top)
+    print(f"import {args.module}: {report['total_ms']:.1f} ms, {report['own_ms']:.1f} ms of it after "
+          f"{' and '.join(FRAMEWORKS)} (median of {args.runs})")
+    print("\nDirect imports (cumulative):")
+    for name, ms in report["direct"]:
+        print(f"  {ms:>9.1f} ms  {name}")
+    print("\nSlowest modules (self):")
+    for name, ms in report["self"]:
+        print(f"  {ms:>9.1f} ms  {name}")
+    if args.module == "main":
+        import_ms, request_ms = first_request_ms()
+        print(f"\nimport + first request: {import_ms:.1f} ms + {request_ms:.1f} ms")
+    found = offenders(report, args.budget)
+    for offender in found:
+        print(f"\nOFFENDER: {offender}")
+    return 1 if found else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,238 @@
+# greenai/compression.py - Negotiated compression for dynamic responses
+#
+# The HTML of every page repeats the same Tailwind classes, inline
+# styles and the page_styles block, so it compresses very well.
+# Compression picks the best encoding the browser accepts (br, zstd or
+# gzip) and compresses the response on the way out. Complete bodies are
+# remembered in a small LRU cache per route and encoding, so a cached
+# page is compressed once instead of on every request. Streamed
+# responses are compressed chunk by chunk and flushed as they go.
+#
+# Per-route compression ratios and CPU time are kept in `stats` so the
+# levels below can be tuned (see compression_report()). Routes are the
+# templates Metrics uses (/blog/posts/{postname}, not every post), so
+# the table stays small whatever URLs are requested.
+
+import gzip
+import hashlib
+import time
+import zlib
+from collections import OrderedDict, defaultdict
+
+from greenai.metrics import route_of
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+LEVELS = {"br": 5, "zstd": 6, "gzip": 6}
+MIN_SIZE = 512
+COMPRESSIBLE = ("text/", "application/json", "application/javascript", "application/xml", "image/svg+xml")
+
+# route -> encoding -> counters
+stats = defaultdict(lambda: defaultdict(lambda: {"responses": 0, "cache_hits": 0, "bytes_in": 0, "bytes_out": 0, "cpu_s": 0.0}))
+
+
+def available_encodings():
+    "Encodings this process can produce, best first"
+    return [e for e, ok in (("br", brotli), ("zstd", zstandard), ("gzip", True)) if ok]
+
+
+def negotiate(accept_encoding: str, encodings=None):
+    "Pick our preferred encoding among those the client accepts (q > 0)"
+    accepted = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip().lower()] = q
+    for enc in encodings or available_encodings():
+        if accepted.get(enc, accepted.get("*", 0)) > 0:
+            return enc
+    return None
+
+
+def compress(data: bytes, encoding: str, level=None) -> bytes:
+    level = LEVELS[encoding] if level is None else level
+    if encoding == "br":
+        return brotli.compress(data, quality=level)
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=level).compress(data)
+    return gzip.compress(data, level, mtime=0)
+
+
+class StreamCompressor:
+    "Incremental compressor that flushes after every chunk so streamed HTML reaches the browser"
+
+    def __init__(self, encoding: str, level=None):
+        level = LEVELS[encoding] if level is None else level
+        self.encoding = encoding
+        if encoding == "br":
+            self.obj = brotli.Compressor(quality=level)
+        elif encoding == "zstd":
+            self.obj = zstandard.ZstdCompressor(level=level).compressobj()
+        else:
+            self.obj = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def chunk(self, data: bytes) -> bytes:
+        if self.encoding == "br":
+            return self.obj.process(data) + self.obj.flush()
+        if self.encoding == "zstd":
+            return self.obj.compress(data) + self.obj.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+        return self.obj.compress(data) + self.obj.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        if self.encoding == "br":
+            return self.obj.finish()
+        return self.obj.flush()
+
+
+def compression_report():
+    "Compression ratio and CPU time per route and encoding"
+    return {
+        route: {
+            enc: {**s, "ratio": round(s["bytes_in"] / s["bytes_out"], 2) if s["bytes_out"] else None,
+                  "cpu_ms_per_response": round(1000 * s["cpu_s"] / max(s["responses"] - s["cache_hits"], 1), 3)}
+            for enc, s in encs.items()
+        }
+        for route, encs in stats.items()
+    }
+
+
+def compression_metrics():
+    "The counters in `stats` in Prometheus text format"
+    for name, key in (("responses", "responses"), ("cache_hits", "cache_hits"), ("bytes_in", "bytes_in"),
+                      ("bytes_out", "bytes_out"), ("cpu_seconds", "cpu_s")):
+        yield f"# TYPE greenai_compression_{name}_total counter"
+        for route, encs in sorted(stats.items()):
+            label = route.replace("\\", "\\\\").replace('"', '\\"')
+            for enc, s in sorted(encs.items()):
+                yield f'greenai_compression_{name}_total{{route="{label}",encoding="{enc}"}} {s[key]}'
+
+
+class Compression:
+    "ASGI middleware that compresses text responses according to Accept-Encoding"
+
+    def __init__(self, app, maxsize=128, min_size=MIN_SIZE):
+        self.app = app
+        self.maxsize = maxsize
+        self.min_size = min_size
+        self.encoded = OrderedDict()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            return await self.app(scope, receive, send)
+        headers = dict(scope["headers"])
+        encoding = negotiate(headers.get(b"accept-encoding", b"").decode("latin-1"))
+        if encoding is None:
+            return await self.app(scope, receive, self.add_vary(send))
+        start, compressor = None, None
+        if b"if-none-match" in headers:
+            # Validators we handed out name the encoded variant; the app only knows the plain one
+            suffix = b"-" + encoding.encode() + b'"'
+            scope = {**scope, "headers": [(k, v.replace(suffix, b'"') if k == b"if-none-match" else v)
+                                          for k, v in scope["headers"]]}
+
+        async def send_compressed(message):
+            nonlocal start, compressor
+            if message["type"] == "http.response.start":
+                start = message
+                if not self.should_compress(message):
+                    start = None
+                    if message["status"] == 304 and self.compressible(message):
+                        message = self.encoded_start(message, encoding, None)
+                    await send(message)
+                return
+            if message["type"] != "http.response.body" or (start is None and compressor is None):
+                return await send(message)
+
+            body, more = message.get("body", b""), message.get("more_body", False)
+            if compressor is None and not more:
+                # Complete body in one message: compress once and remember the result
+                s = start
+                start = None
+                if len(body) < self.min_size:
+                    await send(s)
+                    return await send(message)
+                out = self.encode(route_of(scope), encoding, body)
+                await send(self.encoded_start(s, encoding, len(out)))
+                return await send({"type": "http.response.body", "body": out})
+
+            # Streaming body: compress as it arrives
+            cpu = time.thread_time()
+            if compressor is None:
+                compressor = StreamCompressor(encoding)
+                await send(self.encoded_start(start, encoding, None))
+                start = None
+            out = compressor.chunk(body) + (b"" if more else compressor.finish())
+            s = stats[route_of(scope)][encoding]
+            s["bytes_in"] += len(body)
+            s["bytes_out"] += len(out)
+            s["cpu_s"] += time.thread_time() - cpu
+            if not more:
+                s["responses"] += 1
+            await send({"type": "http.response.body", "body": out, "more_body": more})
+
+        await self.app(scope, receive, send_compressed)
+
+    def add_vary(self, send):
+        "Uncompressed text responses still vary on Accept-Encoding for shared caches"
+        async def wrapped(message):
+            if message["type"] == "http.response.start" and self.compressible(message):
+                message = {**message, "headers": self.vary_headers(message)}
+            await send(message)
+        return wrapped
+
+    def vary_headers(self, start):
+        headers = [(k, v) for k, v in start.get("headers", []) if k.lower() != b"vary"]
+        vary = [v.decode("latin-1") for k, v in start.get("headers", []) if k.lower() == b"vary"]
+        return headers + [(b"vary", ", ".join(vary + ["Accept-Encoding"]).encode("latin-1"))]
+
+    def compressible(self, start) -> bool:
+        headers = dict(start.get("headers", []))
+        ctype = headers.get(b"content-type", b"").decode("latin-1")
+        return b"content-encoding" not in headers and ctype.startswith(COMPRESSIBLE)
+
+    def should_compress(self, start) -> bool:
+        if start["status"] < 200 or start["status"] in (204, 206, 304):
+            return False
+        return self.compressible(start)
+
+    def encoded_start(self, start, encoding, length):
+        headers = [(k, v) for k, v in self.vary_headers(start) if k.lower() != b"content-length"]
+        if start["status"] != 304:
+            headers.append((b"content-encoding", encoding.encode()))
+        if length is not None:
+            headers.append((b"content-length", str(length).encode()))
+        # A strong ETag identifies the uncompressed bytes; mark the encoded variant
+        headers = [(k, v[:-1] + b"-" + encoding.encode() + b'"' if k == b"etag" and v.endswith(b'"') else v)
+                   for k, v in headers]
+        return {**start, "headers": headers}
+
+    def encode(self, route, encoding, body: bytes) -> bytes:
+        s = stats[route][encoding]
+        s["responses"] += 1
+        s["bytes_in"] += len(body)
+        key = (route, encoding, hashlib.blake2b(body, digest_size=16).digest())
+        out = self.encoded.get(key)
+        if out is not None:
+            self.encoded.move_to_end(key)
+            s["cache_hits"] += 1
+        else:
+            cpu = time.thread_time()
+            out = compress(body, encoding)
+            s["cpu_s"] += time.thread_time() - cpu
+            self.encoded[key] = out
+            if len(self.encoded) > self.maxsize:
+                self.encoded.popitem(last=False)
+        s["bytes_out"] += len(out)
+        return out
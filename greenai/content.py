@@ -0,0 +1,149 @@
+# greenai/content.py - SQLite store for the site's content
+#
+# The navbar links, team members, initiatives and projects live in a
+# SQLite database (data/content.db, or CONTENT_DB) instead of lists in
+# main.py, so they can be edited without a deploy and can grow to
+# hundreds of rows. A new database is created and filled from the seed
+# data in main.py.
+#
+# Every insert, update or delete, from this process or any other tool
+# (sqlite3 CLI, a script), bumps a version counter through triggers.
+# Reads go through a cache keyed by that version, so pages are rendered
+# from memory until the content actually changes. The same version is
+# part of the page and fragment cache keys in main.py.
+#
+# Where the file system is read-only (Vercel), the database can't be
+# written, so the store works on an in-memory copy of the deployed one
+# (or of the seed data) made at every cold start. Changes made there are
+# lost with the instance and not seen by other instances: content is
+# edited locally and deployed with the site.
+
+import sqlite3
+import threading
+from pathlib import Path
+
+from sqlite_minutils import Database
+
+# table -> (columns, indexed columns)
+SCHEMA = {
+    "nav_links": ({"id": int, "label": str, "href": str, "position": int}, [("position",)]),
+    "team_members": ({"id": int, "name": str, "role": str, "major": str, "email": str,
+                      "linkedin": str, "github": str, "position": int}, [("position",)]),
+    "initiatives": ({"id": int, "title": str, "info": str, "description": str, "image": str,
+                     "link_text": str, "link": str, "active": int, "position": int}, [("active", "position")]),
+    "projects": ({"id": int, "title": str, "description": str, "image": str, "link": str,
+                  "featured": int, "position": int, "category": str, "department": str, "year": int},
+                 [("featured", "position"), ("year",), ("category", "year"), ("department", "year"),
+                  ("category", "department", "year")]),
+}
+DEFAULTS = {"position": 0, "active": 1, "featured": 0, "category": "", "department": "", "year": 0}
+# table -> columns with a full-text (FTS5) index, kept in sync by triggers
+FULL_TEXT = {"projects": ["title", "description", "department"]}
+
+
+def in_memory_copy(path) -> Database:
+    "An in-memory database holding a copy of the one at `path`, if there is one"
+    db = Database(memory_name="greenai-content")
+    if Path(path).is_file():
+        source = sqlite3.connect(f"file:{Path(path).resolve()}?mode=ro&immutable=1", uri=True)
+        try:
+            source.backup(db.conn)
+        finally:
+            source.close()
+    return db
+
+
+class ContentStore:
+    "The site's content in SQLite, read through a cache invalidated by a version counter"
+
+    def __init__(self, path="data/content.db", seed=None, maxsize=1024):
+        self.path = path
+        self.maxsize = maxsize
+        self.db = self.connect(path)
+        self.lock = threading.Lock()
+        self.cache = {}
+        self.cached_version = None
+        self.create()
+        if seed and not any(self.db[table].count for table in SCHEMA):
+            self.seed(seed)
+
+    def connect(self, path):
+        try:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            db = Database(path)
+            db.execute("PRAGMA journal_mode=WAL")
+            return db
+        except (OSError, sqlite3.OperationalError):
+            # Read-only file system (e.g. serverless): keep the content in memory
+            return in_memory_copy(path)
+
+    def create(self):
+        db = self.db
+        db.execute("CREATE TABLE IF NOT EXISTS content_version (id INTEGER PRIMARY KEY CHECK (id = 1), version INTEGER NOT NULL)")
+        db.execute("INSERT OR IGNORE INTO content_version (id, version) VALUES (1, 0)")
+        for table, (columns, indexes) in SCHEMA.items():
+            db.create_table(table, columns, pk="id", not_null=[c for c in columns if c in DEFAULTS],
+                            defaults={c: v for c, v in DEFAULTS.items() if c in columns}, if_not_exists=True)
+            # Tables created by an older version of this schema get the new columns
+            existing = db[table].columns_dict
+            for column, kind in columns.items():
+                if column not in existing:
+                    db[table].add_column(column, kind, not_null_default=DEFAULTS.get(column))
+            for index in indexes:
+                db[table].create_index(index, if_not_exists=True)
+            if table in FULL_TEXT:
+                db[table].enable_fts(FULL_TEXT[table], create_triggers=True, tokenize="porter", replace=True)
+            for event in ("INSERT", "UPDATE", "DELETE"):
+                db.execute(f"CREATE TRIGGER IF NOT EXISTS {table}_{event.lower()}_version AFTER {event} ON {table} "
+                           "BEGIN UPDATE content_version SET version = version + 1 WHERE id = 1; END")
+
+    def seed(self, seed: dict):
+        "Fill empty tables from `seed` ({table: [row, ...]}), keeping the list order"
+        for table, rows in seed.items():
+            self.db[table].insert_all([{"position": i, **row} for i, row in enumerate(rows)])
+
+    # ----------------- READING
+
+    def version(self) -> int:
+        "Bumped by every change to the content, whoever makes it"
+        return self.db.execute("SELECT version FROM content_version WHERE id = 1").fetchone()[0]
+
+    def cached(self, key, compute):
+        "`compute()`, remembered under `key` until the content changes"
+        version = self.version()
+        with self.lock:
+            if version != self.cached_version:
+                self.cache.clear()
+                self.cached_version = version
+            result = self.cache.get(key)
+        if result is None:
+            result = compute()
+            with self.lock:
+                if version == self.cached_version:
+                    self.cache[key] = result
+                    if len(self.cache) > self.maxsize:
+                        self.cache.pop(next(iter(self.cache)))
+        return result
+
+    def rows(self, table: str, where: str = None, args=(), order_by="position"):
+        "Rows of `table` as dicts, from the cache while the content is unchanged"
+        return self.cached((table, where, tuple(args), order_by),
+                           lambda: list(self.db[table].rows_where(where, args, order_by=order_by)))
+
+    def query(self, sql: str, args=()):
+        "Rows of any SELECT as dicts, cached the same way"
+        return self.cached((sql, tuple(args)), lambda: list(self.db.query(sql, args)))
+
+    def nav_links(self):
+        return self.rows("nav_links")
+
+    def team(self):
+        return self.rows("team_members")
+
+    def initiatives(self):
+        return self.rows("initiatives", "active = 1")
+
+    def projects(self, featured=None):
+        if featured is None:
+            return self.rows("projects")
+        return self.rows("projects", "featured = ?", [int(featured)])
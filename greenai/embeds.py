@@ -0,0 +1,229 @@
+# greenai/embeds.py - Click-to-load YouTube videos and Google Forms
+#
+# A YouTube or Google Forms <iframe> downloads megabytes of scripts and
+# opens connections to several hosts as soon as the page loads, whether
+# or not the visitor ever plays the video or fills in the form. Embed()
+# renders a light placeholder instead: a local thumbnail (videos) or a
+# short note (forms) with a play/open button. The real iframe is kept in
+# a <template> and swapped in by a few lines of script when the button
+# is clicked (load="click"), or when the placeholder scrolls into view
+# (load="visible"). Without JavaScript the button is a plain link to
+# the video or form.
+#
+# Thumbnails are downloaded once at build time, cropped to 16:9 (YouTube
+# pads some with black bars), resized and saved as WebP in
+# public/assets/embeds, recorded in a manifest. `python main.py build`
+# does this before it exports the site. A video without a thumbnail (no
+# build yet, no network) shows its title on a dark background instead;
+# pages never load images from YouTube:
+#   python -m greenai.embeds             # the videos linked from main.py
+#   python -m greenai.embeds --offline   # keep what is built, no network
+# Run python -m greenai.assets afterwards to fingerprint the new files.
+
+import hashlib
+import io
+import json
+import re
+import sys
+from functools import cache
+from pathlib import Path
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+from fasthtml.common import A, Div, Iframe, Img, Script, Span, Style, Template
+
+from greenai.assets import asset_url
+
+STATIC_DIR = Path("public")
+EMBED_DIR = "assets/embeds"
+MANIFEST = f"{EMBED_DIR}/manifest.json"
+THUMBNAIL_WIDTH = 960
+# Largest first; maxresdefault does not exist for every video
+THUMBNAIL_URLS = ("https://i.ytimg.com/vi/{id}/maxresdefault.jpg", "https://i.ytimg.com/vi/{id}/sddefault.jpg",
+                  "https://i.ytimg.com/vi/{id}/hqdefault.jpg")
+VIDEO_ALLOW = "accelerometer; autoplay; clipboard-write; encrypted-media; gyroscope; picture-in-picture; web-share"
+
+_YOUTUBE_ID_RE = re.compile(r"(?:youtube(?:-nocookie)?\.com/(?:embed/|watch\?v=|shorts/)|youtu\.be/)([\w-]{11})")
+
+
+def youtube_id(url: str) -> str:
+    "The video id of a YouTube watch, embed or youtu.be URL"
+    m = _YOUTUBE_ID_RE.search(url)
+    if m is None:
+        raise ValueError(f"not a YouTube URL: {url}")
+    return m.group(1)
+
+
+# ----------------- BUILD
+
+def fetch(url: str) -> bytes:
+    import urllib.request
+    with urllib.request.urlopen(url, timeout=30) as resp:
+        return resp.read()
+
+
+def build_thumbnail(video_id: str, static_dir: Path, fetch=fetch, width=THUMBNAIL_WIDTH) -> dict:
+    "Download, crop and save the thumbnail of a video; returns its manifest entry"
+    from PIL import Image
+
+    for url in THUMBNAIL_URLS:
+        try:
+            data = fetch(url.format(id=video_id))
+            break
+        except OSError:
+            continue
+    else:
+        raise OSError(f"no thumbnail for {video_id}")
+    with Image.open(io.BytesIO(data)) as im:
+        im = im.convert("RGB")
+        w, h = im.size
+        crop = round(w * 9 / 16)
+        if crop < h:
+            im = im.crop((0, (h - crop) // 2, w, (h - crop) // 2 + crop))
+        if im.width > width:
+            im = im.resize((width, round(im.height * width / im.width)), Image.LANCZOS)
+        buf = io.BytesIO()
+        im.save(buf, "WEBP", quality=72, method=6)
+    body = buf.getvalue()
+    name = f"{video_id}.{hashlib.sha256(body).hexdigest()[:10]}.webp"
+    (static_dir / EMBED_DIR / name).write_bytes(body)
+    return {"src": f"/{EMBED_DIR}/{name}", "width": im.width, "height": im.height}
+
+
+def videos_in(*files) -> list[str]:
+    "Ids of the YouTube videos linked from `files`"
+    ids = []
+    for f in files:
+        for video_id in _YOUTUBE_ID_RE.findall(Path(f).read_text()):
+            if video_id not in ids:
+                ids.append(video_id)
+    return ids
+
+
+def build_thumbnails(video_ids, static_dir=STATIC_DIR, offline=False, fetch=fetch, log=print) -> dict:
+    "Fetch the thumbnails not in the manifest yet; with `offline` (or on failure) the video shows its title"
+    static_dir = Path(static_dir)
+    manifest_path = static_dir / MANIFEST
+    old = json.loads(manifest_path.read_text()) if manifest_path.exists() else {}
+    (static_dir / EMBED_DIR).mkdir(parents=True, exist_ok=True)
+    manifest = {}
+    for video_id in video_ids:
+        entry = old.get(video_id)
+        if entry and (static_dir / entry["src"].lstrip("/")).exists():
+            manifest[video_id] = entry
+            continue
+        if offline:
+            continue
+        try:
+            manifest[video_id] = build_thumbnail(video_id, static_dir, fetch)
+            log(f"  {video_id}: {manifest[video_id]['src']}")
+        except OSError as e:
+            log(f"  {video_id}: {e}; showing the title instead")
+
+    keep = {e["src"] for e in manifest.values()}
+    for f in (static_dir / EMBED_DIR).glob("*.webp"):
+        if f"/{EMBED_DIR}/{f.name}" not in keep:
+            f.unlink()
+    manifest_path.write_text(json.dumps(manifest, indent=2) + "\n")
+    log(f"Thumbnails for {len(manifest)} of {len(video_ids)} videos")
+    return manifest
+
+
+# ----------------- COMPONENTS
+
+@cache
+def thumbnail_manifest(static_dir=STATIC_DIR) -> dict:
+    path = Path(static_dir) / MANIFEST
+    return json.loads(path.read_text()) if path.exists() else {}
+
+
+def Embed(iframe, placeholder, href: str, label: str, load="click", cls="", **kwargs):
+    "`placeholder` linking to `href`, replaced by `iframe` when clicked (or, with load='visible', when seen)"
+    return Div(
+        A(placeholder, Span(label, cls="embed-button"), href=href, target="_blank", rel="noopener", aria_label=label),
+        Template(iframe),
+        cls=f"embed {cls}".strip(), data_embed=load, **kwargs,
+    )
+
+
+def YouTubeEmbed(url: str, title: str, load="click"):
+    "A YouTube video as a thumbnail with a play button"
+    video_id = youtube_id(url)
+    thumb = thumbnail_manifest().get(video_id)
+    params = dict(parse_qsl(urlsplit(url).query))
+    params.pop("si", None)
+    # The click that loads the player also starts the video
+    src = f"https://www.youtube-nocookie.com/embed/{video_id}?{urlencode({**params, 'autoplay': 1})}"
+    return Embed(
+        Iframe(src=src, title=title, allow=VIDEO_ALLOW, referrerpolicy="strict-origin-when-cross-origin",
+               allowfullscreen=True, frameborder="0"),
+        Img(src=asset_url(thumb["src"]), alt=title, width=thumb["width"], height=thumb["height"],
+            loading="lazy", decoding="async") if thumb else Span(title, cls="embed-title"),
+        href=f"https://www.youtube.com/watch?v={video_id}", label=f"Play: {title}", load=load, cls="embed-video",
+    )
+
+
+def FormEmbed(url: str, title: str, height=300, load="click"):
+    "A Google Form as a short note with an open button"
+    form_url = url.replace("embedded=true", "").rstrip("?&")
+    return Embed(
+        Iframe(src=url, title=title, frameborder="0", marginheight="0", marginwidth="0"),
+        Span(title, cls="embed-title"),
+        href=form_url, label="Open the form", load=load, cls="embed-form", style=f"height: {height}px",
+    )
+
+
+embed_styles = """
+.embed { position: relative; width: 100%; border-radius: 8px; overflow: hidden; }
+.embed > a { display: flex; flex-direction: column; align-items: center; justify-content: center; gap: 12px;
+    width: 100%; height: 100%; text-decoration: none; }
+.embed iframe { display: block; width: 100%; height: 100%; border: 0; }
+.embed-video { aspect-ratio: 16 / 9; background: #000; }
+.embed-video img { position: absolute; inset: 0; width: 100%; height: 100%; object-fit: cover; }
+.embed-video .embed-title { color: #fff; font-weight: 600; padding: 0 16px; text-align: center; }
+.embed-video .embed-button { position: relative; width: 68px; height: 48px; border-radius: 12px;
+    background: rgba(0, 0, 0, 0.75); font-size: 0; transition: background 0.2s; }
+.embed-video .embed-button::after { content: ""; position: absolute; left: 27px; top: 14px;
+    border-style: solid; border-width: 10px 0 10px 17px; border-color: transparent transparent transparent #fff; }
+.embed-video a:hover .embed-button { background: var(--primary-color, #397B5B); }
+.embed-form { background: #fff; }
+.embed-form .embed-button { padding: 8px 20px; border-radius: 6px; background: var(--primary-color, #397B5B);
+    color: #fff; font-family: "Roboto Mono", monospace; }
+"""
+
+# Swaps the iframe in for the placeholder; pages swapped in by htmx get
+# the same treatment through htmx:load
+embed_script = """
+(() => {
+  const show = el => {
+    const tpl = el.querySelector(":scope > template");
+    if (tpl) { el.removeAttribute("data-embed"); el.replaceChildren(tpl.content.cloneNode(true)); }
+  };
+  document.addEventListener("click", e => {
+    const el = e.target.closest("[data-embed]");
+    if (el && !e.ctrlKey && !e.metaKey && !e.shiftKey) { e.preventDefault(); show(el); }
+  });
+  const seen = "IntersectionObserver" in window && new IntersectionObserver(entries => entries.forEach(e => {
+    if (e.isIntersecting) { seen.unobserve(e.target); show(e.target); }
+  }), {rootMargin: "200px"});
+  const watch = root => seen && root.querySelectorAll('[data-embed="visible"]').forEach(el => seen.observe(el));
+  document.addEventListener("htmx:load", e => watch(e.target));
+  document.addEventListener("DOMContentLoaded", () => watch(document));
+})();
+"""
+
+
+def EmbedHeaders():
+    "Styles and the click/scroll handler for Embed()"
+    return Style(embed_styles), Script(embed_script)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    offline = "--offline" in argv
+    files = [a for a in argv if not a.startswith("--")] or ["main.py"]
+    build_thumbnails(videos_in(*files), offline=offline)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
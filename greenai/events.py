@@ -0,0 +1,318 @@
+# greenai/events.py - Upcoming events, refreshed in the background
+#
+# The event calendar (lu.ma, or anything publishing an iCalendar or
+# JSON feed) is fetched by a background task, never by a request:
+#   * EventsCache keeps the last good list of events in memory and in a
+#     snapshot file (data/events.json), so a new process has events to
+#     show before its first fetch,
+#   * the list is fresh for TTL seconds. After that it is still served
+#     while a refresh runs in the background (stale-while-revalidate),
+#   * a failed or slow fetch (TIMEOUT) keeps the last good list and is
+#     retried after RETRY seconds, doubling up to the TTL.
+#
+# Sources are small objects with an async fetch() returning events:
+# FileSource for a local .ics/.json file (and tests), HttpSource for a
+# URL such as lu.ma's calendar feed. source_for() picks one from a
+# string, e.g. EVENTS_SOURCE in main.py.
+#
+#   python -m greenai.events https://api.lu.ma/ics/get?entity=calendar&id=cal-...
+
+import asyncio
+import json
+import logging
+import os
+import re
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import date, datetime, timezone
+from pathlib import Path
+from zoneinfo import ZoneInfo
+
+log = logging.getLogger("greenai.events")
+
+TTL = 15 * 60             # seconds a fetched list is fresh
+STALE = 24 * 60 * 60      # seconds after the TTL it is served while revalidating
+RETRY = 60                # seconds before retrying a failed fetch (doubles up to the TTL)
+TIMEOUT = 10              # seconds per fetch
+TZ = ZoneInfo("America/Los_Angeles")
+
+
+@dataclass
+class Event:
+    title: str
+    start: datetime
+    end: datetime | None = None
+    url: str = ""
+    location: str = ""
+    tags: list = field(default_factory=list)
+
+    def to_json(self) -> dict:
+        d = asdict(self)
+        d["start"] = self.start.isoformat()
+        d["end"] = self.end.isoformat() if self.end else None
+        return d
+
+    @classmethod
+    def from_json(cls, d: dict) -> "Event":
+        return cls(
+            title=d["title"],
+            start=aware(datetime.fromisoformat(d["start"])),
+            end=aware(datetime.fromisoformat(d["end"])) if d.get("end") else None,
+            url=d.get("url") or "",
+            location=d.get("location") or "",
+            tags=list(d.get("tags") or []),
+        )
+
+
+def aware(dt: datetime) -> datetime:
+    "`dt`, in local (Stanford) time when it has no timezone"
+    return dt if dt.tzinfo else dt.replace(tzinfo=TZ)
+
+
+# ----------------- PARSING
+
+def parse_ics_datetime(value: str, params: dict) -> datetime:
+    if params.get("VALUE") == "DATE" or re.fullmatch(r"\d{8}", value):
+        return datetime.combine(date(int(value[:4]), int(value[4:6]), int(value[6:8])), datetime.min.time(), TZ)
+    dt = datetime.strptime(value.rstrip("Z"), "%Y%m%dT%H%M%S")
+    if value.endswith("Z"):
+        return dt.replace(tzinfo=timezone.utc)
+    return dt.replace(tzinfo=ZoneInfo(params["TZID"]) if "TZID" in params else TZ)
+
+
+def unescape_ics(value: str) -> str:
+    return re.sub(r"\\([\\,;nN])", lambda m: "\n" if m.group(1) in "nN" else m.group(1), value)
+
+
+def parse_ics(text: str) -> list[Event]:
+    "The VEVENTs of an iCalendar file"
+    # Long lines are folded: a line starting with a space continues the last one
+    lines = re.sub(r"\r?\n[ \t]", "", text).splitlines()
+    events, props = [], None
+    for line in lines:
+        if line == "BEGIN:VEVENT":
+            props = {}
+        elif line == "END:VEVENT" and props is not None:
+            if "SUMMARY" in props and "DTSTART" in props:
+                start = parse_ics_datetime(*props["DTSTART"])
+                events.append(Event(
+                    title=unescape_ics(props["SUMMARY"][0]),
+                    start=start,
+                    end=parse_ics_datetime(*props["DTEND"]) if "DTEND" in props else None,
+                    url=props.get("URL", ("",))[0],
+                    location=unescape_ics(props.get("LOCATION", ("",))[0]),
+                    tags=[t.strip() for t in unescape_ics(props.get("CATEGORIES", ("",))[0]).split(",") if t.strip()],
+                ))
+            props = None
+        elif props is not None and ":" in line:
+            name, value = line.split(":", 1)
+            name, *params = name.split(";")
+            props[name.upper()] = (value, dict(p.split("=", 1) for p in params if "=" in p))
+    return events
+
+
+def parse_json(text: str) -> list[Event]:
+    "Events from a JSON list (or {\"events\": [...]}) of {title, start, end, url, location, tags}"
+    data = json.loads(text)
+    return [Event.from_json(d) for d in (data["events"] if isinstance(data, dict) else data)]
+
+
+def parse_events(text: str) -> list[Event]:
+    return parse_ics(text) if text.lstrip().startswith("BEGIN:VCALENDAR") else parse_json(text)
+
+
+# ----------------- SOURCES
+
+class FileSource:
+    "Events from a local .ics or .json file"
+
+    def __init__(self, path):
+        self.path = Path(path)
+
+    def __repr__(self):
+        return f"FileSource({str(self.path)!r})"
+
+    async def fetch(self) -> list[Event]:
+        return parse_events(await asyncio.to_thread(self.path.read_text))
+
+
+class HttpSource:
+    "Events from an iCalendar or JSON feed, e.g. a lu.ma calendar"
+
+    def __init__(self, url, timeout=TIMEOUT):
+        self.url = url
+        self.timeout = timeout
+
+    def __repr__(self):
+        return f"HttpSource({self.url!r})"
+
+    async def fetch(self) -> list[Event]:
+        import httpx
+
+        async with httpx.AsyncClient(timeout=self.timeout, follow_redirects=True) as client:
+            resp = await client.get(self.url, headers={"accept": "text/calendar, application/json"})
+            resp.raise_for_status()
+        return parse_events(resp.text)
+
+
+def source_for(spec: str | None):
+    "HttpSource for a URL, FileSource for a path, None for nothing"
+    if not spec:
+        return None
+    return HttpSource(spec) if re.match(r"https?://", spec) else FileSource(spec)
+
+
+# ----------------- CACHE
+
+class EventsCache:
+    "The last good list of events from `source`, refreshed in the background"
+
+    def __init__(self, source, snapshot="data/events.json", ttl=TTL, stale=STALE, retry=RETRY, timeout=TIMEOUT):
+        self.source = source
+        self.snapshot = Path(snapshot) if snapshot else None
+        self.ttl = ttl
+        self.stale = stale
+        self.retry = retry
+        self.timeout = timeout
+        self.events: list[Event] = []
+        self.fetched_at = None   # wall clock time of the last good fetch
+        self.changes = 0
+        self.refreshes = {"ok": 0, "error": 0}
+        self.failures = 0        # consecutive failed fetches
+        self.retry_at = 0.0
+        self.task = None         # the background loop started by start()
+        self.refreshing = None   # a refresh started by revalidate()
+        self.load_snapshot()
+
+    def version(self) -> int:
+        "Bumped whenever the list of events changes"
+        return self.changes
+
+    def age(self):
+        return None if self.fetched_at is None else time.time() - self.fetched_at
+
+    def state(self) -> str:
+        "'fresh', 'stale' (served while revalidating), 'expired' (last good list, refresh failing) or 'empty'"
+        age = self.age()
+        if age is None:
+            return "empty"
+        return "fresh" if age < self.ttl else "stale" if age < self.ttl + self.stale else "expired"
+
+    def upcoming(self, now=None, limit=None) -> list[Event]:
+        "Events that haven't ended yet, soonest first; only ever reads memory"
+        now = now or datetime.now(timezone.utc)
+        events = sorted((e for e in self.events if (e.end or e.start) >= now), key=lambda e: e.start)
+        return events[:limit] if limit else events
+
+    # ----------------- REFRESHING
+
+    async def refresh(self) -> bool:
+        "Fetch the events once; on failure keep the last good list"
+        try:
+            events = await asyncio.wait_for(self.source.fetch(), self.timeout)
+        except Exception as e:
+            self.refreshes["error"] += 1
+            self.failures += 1
+            self.retry_at = time.monotonic() + self.backoff()
+            log.warning("events: fetching from %r failed (%s: %s); keeping %d events from the last good fetch",
+                        self.source, type(e).__name__, e, len(self.events))
+            return False
+        self.refreshes["ok"] += 1
+        self.failures = 0
+        self.retry_at = 0.0
+        self.fetched_at = time.time()
+        if events != self.events:
+            self.events = events
+            self.changes += 1
+        await asyncio.to_thread(self.save_snapshot)
+        return True
+
+    def backoff(self) -> float:
+        return min(self.retry * 2 ** (self.failures - 1), self.ttl)
+
+    def revalidate(self):
+        "Start a refresh in the background if the events are not fresh; never waits for it"
+        if self.source is None or self.state() == "fresh" or time.monotonic() < self.retry_at:
+            return
+        if (self.task and not self.task.done()) or (self.refreshing and not self.refreshing.done()):
+            return
+        try:
+            self.refreshing = asyncio.get_running_loop().create_task(self.refresh())
+        except RuntimeError:
+            pass  # no event loop (a sync caller); the next async caller will do it
+
+    async def run(self):
+        "Refresh every TTL seconds, and sooner after a failure, until cancelled"
+        while True:
+            age = self.age()
+            if age is not None and age < self.ttl:
+                await asyncio.sleep(self.ttl - age)
+            ok = await self.refresh()
+            if not ok:
+                await asyncio.sleep(self.backoff())
+
+    async def start(self):
+        "Start the background refresh (an app startup handler)"
+        if self.source is not None and self.task is None:
+            self.task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self):
+        for task in (self.task, self.refreshing):
+            if task and not task.done():
+                task.cancel()
+        self.task = self.refreshing = None
+
+    # ----------------- SNAPSHOT
+
+    def load_snapshot(self):
+        if not self.snapshot or not self.snapshot.exists():
+            return
+        try:
+            data = json.loads(self.snapshot.read_text())
+            self.events = [Event.from_json(d) for d in data["events"]]
+            self.fetched_at = data["fetched_at"]
+            self.changes += 1
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            log.warning("events: ignoring unreadable snapshot %s (%s)", self.snapshot, e)
+
+    def save_snapshot(self):
+        if not self.snapshot:
+            return
+        data = {"fetched_at": self.fetched_at, "source": repr(self.source), "events": [e.to_json() for e in self.events]}
+        try:
+            self.snapshot.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.snapshot.with_name(f".{self.snapshot.name}.{os.getpid()}")
+            tmp.write_text(json.dumps(data, indent=1))
+            tmp.replace(self.snapshot)
+        except OSError as e:
+            # Read-only file system (e.g. serverless): the events stay in memory only
+            log.info("events: not saving snapshot %s (%s)", self.snapshot, e)
+
+    def metrics(self):
+        "Freshness and refresh counters in Prometheus text format"
+        yield "# TYPE greenai_events gauge"
+        yield f"greenai_events {len(self.events)}"
+        yield "# TYPE greenai_events_age_seconds gauge"
+        yield f"greenai_events_age_seconds {self.age() if self.fetched_at is not None else 'NaN'}"
+        yield "# TYPE greenai_events_refresh_total counter"
+        for result, n in self.refreshes.items():
+            yield f'greenai_events_refresh_total{{result="{result}"}} {n}'
+
+
+def main(argv=None):
+    "Fetch a source once and print its upcoming events"
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        print("usage: python -m greenai.events <url or file>")
+        return 2
+    cache = EventsCache(source_for(argv[0]), snapshot=None)
+    if not asyncio.run(cache.refresh()):
+        return 1
+    for e in cache.upcoming():
+        print(f"{e.start.astimezone(TZ):%a %b %d %H:%M}  {e.title}  {e.url}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+# greenai/explorer.py - Queries behind the projects explorer (/projects)
+#
+# Projects are filtered by full-text search (the FTS5 index over title,
+# description and department, every word matched as a prefix) and by
+# three facets: Green-in vs Green-by AI, department and year. Results
+# are ordered newest first and paginated with a keyset cursor (the year
+# and id of the last row shown), so page 50 costs the same as page 1.
+# Facet counts apply every filter except the facet's own, so each
+# option shows how many results picking it would give. They come from
+# one grouped query per search (facet_counts), so picking facets only
+# adds up cached rows.
+#
+# Everything goes through ContentStore.query(), so repeated queries are
+# answered from memory until the content changes.
+
+import re
+from dataclasses import dataclass
+
+PAGE_SIZE = 20
+MAX_FACET_VALUES = 30
+CATEGORIES = {"green-in": "Green-in AI", "green-by": "Green-by AI"}
+FACETS = ("category", "department", "year")
+_COLUMNS = "id, title, description, image, link, category, department, year"
+
+
+@dataclass
+class ProjectFilters:
+    "What the visitor searched for and picked in the facets"
+    q: str = ""
+    category: str = ""
+    department: str = ""
+    year: int | None = None
+
+    def params(self, **extra) -> dict:
+        "Non-empty filters as query parameters"
+        params = {"q": self.q, "category": self.category, "department": self.department, "year": self.year, **extra}
+        return {k: v for k, v in params.items() if v not in ("", None)}
+
+
+def fts_query(text: str) -> str:
+    "FTS5 query matching every word of `text` as a prefix (quoted, so no FTS syntax leaks through)"
+    return " ".join(f'"{word}"*' for word in re.findall(r"\w+", text.lower()))
+
+
+# SQLite integers are 64-bit; a larger number in a cursor would fail the query
+_INT64 = range(-2**63, 2**63)
+
+
+def parse_cursor(cursor: str):
+    "(year, id) from a cursor like '2024.137', or None (the first page) for anything else"
+    m = re.fullmatch(r"(-?[0-9]+)\.([0-9]+)", cursor or "")
+    if m is None:
+        return None
+    year, id_ = int(m.group(1)), int(m.group(2))
+    return (year, id_) if year in _INT64 and id_ in _INT64 else None
+
+
+def where_clause(filters: ProjectFilters, exclude=None):
+    "SQL conditions and arguments for `filters`, leaving out the facet `exclude`"
+    conditions, args = [], []
+    match = fts_query(filters.q)
+    if match:
+        conditions.append("id IN (SELECT rowid FROM projects_fts WHERE projects_fts MATCH ?)")
+        args.append(match)
+    for facet in FACETS:
+        value = getattr(filters, facet)
+        if facet != exclude and value not in ("", None):
+            conditions.append(f"{facet} = ?")
+            args.append(value)
+    return " AND ".join(conditions) or "1", args
+
+
+def search_projects(store, filters: ProjectFilters, after=None, limit=PAGE_SIZE):
+    "One page of matching projects, newest first, and the cursor of the next page (or None)"
+    where, args = where_clause(filters)
+    position = parse_cursor(after)
+    if position:
+        where += " AND (year, id) < (?, ?)"
+        args += list(position)
+    rows = store.query(f"SELECT {_COLUMNS} FROM projects WHERE {where} ORDER BY year DESC, id DESC LIMIT ?",
+                       [*args, limit + 1])
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        return rows[:limit], f"{last['year']}.{last['id']}"
+    return rows, None
+
+
+def facet_counts(store, q: str = "") -> list:
+    "Rows of (category, department, year, n): how many projects matching the search `q` have each combination"
+    # The search runs once and every facet (and the total) is added up from
+    # these rows, which stay cached whatever facets are picked
+    match = fts_query(q)
+    sql = "SELECT category, department, year, count(*) AS n FROM projects"
+    if match:
+        sql += " WHERE id IN (SELECT rowid FROM projects_fts WHERE projects_fts MATCH ?)"
+    return store.query(sql + " GROUP BY category, department, year", [match] if match else [])
+
+
+def _picked(row, filters: ProjectFilters, exclude=None) -> bool:
+    "Whether a facet_counts() row passes every facet filter but `exclude`"
+    return all(facet == exclude or getattr(filters, facet) in ("", None) or row[facet] == getattr(filters, facet)
+               for facet in FACETS)
+
+
+def count_projects(store, filters: ProjectFilters) -> int:
+    return sum(row["n"] for row in facet_counts(store, filters.q) if _picked(row, filters))
+
+
+def facets(store, filters: ProjectFilters) -> dict:
+    "{facet: [(value, count), ...]} for the facets, each counted without its own filter"
+    rows = facet_counts(store, filters.q)
+    out = {}
+    for facet in FACETS:
+        counts = {}
+        for row in rows:
+            if row[facet] not in ("", 0, None) and _picked(row, filters, exclude=facet):
+                counts[row[facet]] = counts.get(row[facet], 0) + row["n"]
+        # Years newest first, the others most common first
+        values = sorted(counts.items(), key=lambda x: -x[0] if facet == "year" else (-x[1], x[0]))
+        out[facet] = values[:MAX_FACET_VALUES]
+    return out
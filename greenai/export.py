@@ -0,0 +1,148 @@
+# greenai/export.py - Static export of every page on the site
+#
+# The content of the site is static, so instead of running Python on
+# every page view the whole site can be pre-rendered into a directory
+# that any CDN can serve. export_site() calls each registered route
+# in-process, writes the HTML it returns, copies the files in public/
+# and writes a manifest plus redirect rules for the redirects.
+#
+# Builds are incremental: pages whose output hash did not change since
+# the last build are not written again.
+#
+# Routes whose answer depends on the query string or changes on its own
+# (search results, live listings) are passed as `dynamic` and left out:
+# a static host ignores the query string and would serve one frozen
+# answer for every request.
+
+import hashlib
+import json
+import re
+import shutil
+from pathlib import Path
+
+from fasthtml.common import Client
+
+from greenai.assets import asset_manifest, HASHED_DIR
+
+MANIFEST_NAME = "manifest.json"
+_PARAM_RE = re.compile(r"\{(\w+)(?::[^}]*)?\}")
+
+
+def route_paths(app, params=None, dynamic=()):
+    "List the concrete GET paths of `app`, filling path parameters from `params` and leaving out `dynamic`"
+    params = params or {}
+    paths = []
+    for route in app.routes:
+        path, methods = getattr(route, "path", None), getattr(route, "methods", None)
+        if path is None or not methods or "GET" not in methods or path in dynamic:
+            continue
+        names = _PARAM_RE.findall(path)
+        if not names:
+            paths.append(path)
+        elif len(names) == 1 and names[0] in params:
+            paths += [_PARAM_RE.sub(str(value), path) for value in params[names[0]]]
+        # Other parametrised routes (e.g. the static file route) are skipped
+    return paths
+
+
+def output_file(path: str) -> str:
+    "Where the HTML for `path` is written, e.g. /about -> about/index.html"
+    path = path.strip("/")
+    if path.endswith(".html"):
+        return path
+    return f"{path}/index.html" if path else "index.html"
+
+
+def sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def copy_public(static_dir: Path, out_dir: Path) -> int:
+    "Copy the static files into the output directory, skipping unchanged files"
+    copied = 0
+    for src in static_dir.rglob("*"):
+        if not src.is_file():
+            continue
+        dst = out_dir / src.relative_to(static_dir)
+        stat = src.stat()
+        if dst.exists() and dst.stat().st_size == stat.st_size and dst.stat().st_mtime >= stat.st_mtime:
+            continue
+        dst.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copy2(src, dst)
+        copied += 1
+    return copied
+
+
+def copy_hashed(static_dir: Path, out_dir: Path) -> int:
+    "Materialise the fingerprinted /static/ URLs, which AssetServer resolves at runtime"
+    copied = 0
+    for name, source in asset_manifest(static_dir)["objects"].items():
+        for ext in ("", ".gz", ".br"):
+            src, dst = static_dir / (source + ext), out_dir / HASHED_DIR / (name + ext)
+            if src.exists() and not dst.exists():
+                dst.parent.mkdir(parents=True, exist_ok=True)
+                shutil.copy2(src, dst)
+                copied += 1
+    return copied
+
+
+def write_redirects(out_dir: Path, redirects: dict):
+    "Write the redirects as Netlify-style `_redirects` and as a `vercel.json`"
+    lines = [f"{src} {dst} {status}" for src, (dst, status) in sorted(redirects.items())]
+    (out_dir / "_redirects").write_text("\n".join(lines) + "\n")
+    vercel = {
+        "cleanUrls": True,
+        "redirects": [
+            {"source": src, "destination": dst, "permanent": status in (301, 308)}
+            for src, (dst, status) in sorted(redirects.items())
+        ],
+    }
+    (out_dir / "vercel.json").write_text(json.dumps(vercel, indent=2) + "\n")
+
+
+def export_site(app, out_dir="dist", static_dir="public", params=None, base_url="http://localhost",
+                partial_prefixes=(), dynamic=(), meta=None, log=print):
+    "Pre-render every route of `app` into `out_dir` and return the manifest"
+    # Routes under `partial_prefixes` are fetched by htmx from the pages;
+    # a static host can't vary on HX-Request, so export the fragment itself
+    out_dir, static_dir = Path(out_dir), Path(static_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    manifest_path = out_dir / MANIFEST_NAME
+    previous = json.loads(manifest_path.read_text()).get("routes", {}) if manifest_path.exists() else {}
+
+    copied = copy_public(static_dir, out_dir) + copy_hashed(static_dir, out_dir)
+    client = Client(app, url=base_url)
+    routes, redirects = {}, {}
+    written = skipped = 0
+    for path in route_paths(app, params, dynamic):
+        partial = path.startswith(tuple(partial_prefixes))
+        resp = client.get(path, headers={"HX-Request": "true"} if partial else None)
+        if resp.is_redirect:
+            redirects[path] = (resp.headers["location"], resp.status_code)
+            continue
+        if resp.status_code != 200:
+            log(f"  ! {path} returned {resp.status_code}, not exported")
+            continue
+        if not resp.headers.get("content-type", "").startswith("text/html"):
+            continue  # API endpoints (search, stats) only make sense with Python behind them
+        fname, digest = output_file(path), sha256(resp.content)
+        routes[path] = {"file": fname, "sha256": digest, "bytes": len(resp.content),
+                        "content_type": resp.headers.get("content-type", ""), "partial": partial}
+        target = out_dir / fname
+        if previous.get(path, {}).get("sha256") == digest and target.exists():
+            skipped += 1
+            continue
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_bytes(resp.content)
+        written += 1
+        log(f"  {path} -> {fname}")
+
+    write_redirects(out_dir, redirects)
+    manifest = {"meta": meta or {}, "routes": routes, "redirects": {k: {"location": v[0], "status": v[1]} for k, v in redirects.items()},
+                "dynamic": sorted(dynamic)}
+    manifest_path.write_text(json.dumps(manifest, indent=2) + "\n")
+    log(f"Exported {written} pages ({skipped} unchanged), {len(redirects)} redirects, "
+        f"{copied} static files copied into {out_dir}/")
+    if dynamic:
+        log(f"Left out (they need the app server): {', '.join(sorted(dynamic))}")
+    return manifest
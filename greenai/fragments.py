@@ -0,0 +1,85 @@
+# greenai/fragments.py - Memoized HTML fragments for components
+#
+# Most components in main.py only depend on their arguments and on
+# constants, yet every page built them from scratch: /about and
+# /contact both rebuilt Team() with all its cards, and render_md parsed
+# the same markdown on every request. A component decorated with
+# @fragment is rendered to HTML once per set of arguments and kept in a
+# shared LRU cache; pages then put the cached string in their tree
+# instead of rebuilding it.
+#
+# Components that also depend on something else (the footer shows the
+# current year) pass `key=`, a function whose result is added to the
+# cache key, so the fragment is rebuilt when it changes.
+#
+# Sync handlers run in a thread pool, so the cache is shared between
+# threads: its bookkeeping is done under a lock, but rendering is not
+# (a fragment may render other fragments), so two threads can render
+# the same fragment at once and the last one is kept.
+
+import threading
+from collections import OrderedDict, defaultdict
+from functools import wraps
+
+from fasthtml.common import NotStr, to_xml
+
+
+class FragmentCache:
+    "LRU cache of rendered fragments with hit/miss counters per component"
+
+    def __init__(self, maxsize=512):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = defaultdict(int)
+        self.misses = defaultdict(int)
+        self.lock = threading.Lock()
+
+    def get(self, name, key, render):
+        "The cached HTML for `key`, rendering (and storing) it on a miss"
+        with self.lock:
+            html = self.entries.get(key)
+            if html is not None:
+                self.entries.move_to_end(key)
+                self.hits[name] += 1
+                return html
+            self.misses[name] += 1
+        html = render()
+        with self.lock:
+            self.entries[key] = html
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+        return html
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def metrics(self):
+        "Hit and miss counters in Prometheus text format"
+        with self.lock:
+            counters = [("hits", dict(self.hits)), ("misses", dict(self.misses))]
+        for kind, counts in counters:
+            yield f"# TYPE greenai_fragment_{kind}_total counter"
+            for name, n in sorted(counts.items()):
+                yield f'greenai_fragment_{kind}_total{{fragment="{name}"}} {n}'
+
+
+fragments = FragmentCache()
+
+
+def fragment(func=None, *, key=None, cache=fragments):
+    "Decorator caching a component's HTML per arguments (plus `key()`, if given)"
+    def decorate(func):
+        name = func.__name__
+
+        @wraps(func)
+        def cached(*args, **kwargs):
+            cache_key = (name, args, tuple(sorted(kwargs.items())), key() if key else None)
+            try:
+                hash(cache_key)
+            except TypeError:  # unhashable arguments (e.g. a dict): render every time
+                return func(*args, **kwargs)
+            return NotStr(cache.get(name, cache_key, lambda: to_xml(func(*args, **kwargs))))
+        return cached
+    return decorate(func) if func is not None else decorate
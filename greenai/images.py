@@ -0,0 +1,138 @@
+# greenai/images.py - Responsive image pipeline
+#
+# The images in public/assets are full-size PNG/JPG files, but most of
+# them are displayed only a few hundred pixels wide. build_images()
+# creates resized AVIF and WebP variants of each image (named after a
+# hash of their content) and records them in a manifest. ResponsiveImg()
+# reads that manifest and emits a <picture> with srcset/sizes, so the
+# browser downloads the smallest file that fits, plus width/height so
+# the layout does not shift while images load.
+#
+# Building needs Pillow (pip install -r requirements-build.txt):
+#   python -m greenai.images
+# The site itself only reads the manifest, so Pillow is not needed to
+# serve pages. Without a manifest, ResponsiveImg() falls back to <img>.
+
+import hashlib
+import io
+import json
+import sys
+from functools import cache
+from pathlib import Path
+
+from fasthtml.common import Img, Link, Picture, Source
+
+from greenai.assets import asset_url
+
+STATIC_DIR = Path("public")
+VARIANT_DIR = "assets/variants"
+MANIFEST = f"{VARIANT_DIR}/manifest.json"
+SOURCES = ("assets/*.png", "assets/*.jpg")
+WIDTHS = (160, 320, 640, 960, 1280, 1920)
+FORMATS = {"avif": {"quality": 55}, "webp": {"quality": 78, "method": 6}}
+
+
+def _hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _variant_widths(width: int, widths=WIDTHS):
+    "Widths to generate for an image `width` pixels wide (never upscale)"
+    return [w for w in widths if w < width] + ([width] if width <= max(widths) else [])
+
+
+def build_image(src: Path, static_dir: Path, formats=FORMATS, widths=WIDTHS) -> dict:
+    "Write the resized variants of `src` and return its manifest entry"
+    from PIL import Image, features
+
+    data = src.read_bytes()
+    out_dir = static_dir / VARIANT_DIR
+    out_dir.mkdir(parents=True, exist_ok=True)
+    with Image.open(io.BytesIO(data)) as im:
+        im.load()
+        width, height = im.size
+        entry = {"source": _hash(data), "width": width, "height": height, "variants": {}}
+        for fmt, opts in formats.items():
+            if not features.check(fmt):
+                continue
+            variants = []
+            for w in _variant_widths(width, widths):
+                resized = im if w == width else im.resize((w, round(height * w / width)), Image.LANCZOS)
+                buf = io.BytesIO()
+                resized.save(buf, fmt.upper(), **opts)
+                body = buf.getvalue()
+                name = f"{src.stem}-{w}.{_hash(body)[:10]}.{fmt}"
+                (out_dir / name).write_bytes(body)
+                variants.append([w, f"/{VARIANT_DIR}/{name}"])
+            entry["variants"][fmt] = variants
+    return entry
+
+
+def build_images(static_dir=STATIC_DIR, sources=SOURCES, log=print) -> dict:
+    "Generate variants for every source image, reusing those whose source hash is unchanged"
+    static_dir = Path(static_dir)
+    manifest_path = static_dir / MANIFEST
+    old = json.loads(manifest_path.read_text()) if manifest_path.exists() else {}
+    manifest, built = {}, 0
+    for pattern in sources:
+        for src in sorted(static_dir.glob(pattern)):
+            url = "/" + src.relative_to(static_dir).as_posix()
+            entry = old.get(url)
+            files = [static_dir / u.lstrip("/") for vs in (entry or {}).get("variants", {}).values() for _, u in vs]
+            if entry and entry["source"] == _hash(src.read_bytes()) and all(f.exists() for f in files):
+                manifest[url] = entry
+                continue
+            manifest[url] = build_image(src, static_dir)
+            built += 1
+            log(f"  {url}: {src.stat().st_size // 1024} KB -> " + ", ".join(
+                f"{len(v)} {fmt}" for fmt, v in manifest[url]["variants"].items()))
+
+    # Remove variants that are no longer referenced
+    keep = {u for e in manifest.values() for vs in e["variants"].values() for _, u in vs}
+    for f in (static_dir / VARIANT_DIR).glob("*.*"):
+        if f.suffix != ".json" and f"/{VARIANT_DIR}/{f.name}" not in keep:
+            f.unlink()
+
+    manifest_path.parent.mkdir(parents=True, exist_ok=True)
+    manifest_path.write_text(json.dumps(manifest, indent=2) + "\n")
+    log(f"Built variants for {built} images ({len(manifest) - built} unchanged)")
+    return manifest
+
+
+@cache
+def image_manifest(static_dir=STATIC_DIR) -> dict:
+    path = Path(static_dir) / MANIFEST
+    return json.loads(path.read_text()) if path.exists() else {}
+
+
+def ResponsiveImg(src: str, sizes="100vw", lazy=True, **kwargs):
+    "Image with AVIF/WebP srcset, intrinsic width/height and lazy loading"
+    loading = {"loading": "lazy", "decoding": "async"} if lazy else {"loading": "eager"}
+    entry = image_manifest().get(src)
+    if entry is None:
+        return Img(src=asset_url(src), **loading, **kwargs)
+    width, height = entry["width"], entry["height"]
+    if "width" in kwargs:
+        # Keep the aspect ratio when the caller fixes the display width
+        display_width = int(kwargs.pop("width"))
+        width, height = display_width, round(height * display_width / width)
+    img = Img(src=asset_url(src), width=width, height=height, **loading, **kwargs)
+    sources = [
+        Source(type=f"image/{fmt}", srcset=", ".join(f"{asset_url(url)} {w}w" for w, url in variants), sizes=sizes)
+        for fmt, variants in entry["variants"].items()
+    ]
+    return Picture(*sources, img)
+
+
+def ImagePreload(src: str, sizes="100vw", fmt="avif"):
+    "<link rel=preload> for the `fmt` variant the browser will pick for ResponsiveImg(src, sizes)"
+    entry = image_manifest().get(src)
+    if entry is None or fmt not in entry["variants"]:
+        return Link(rel="preload", _as="image", href=asset_url(src), fetchpriority="high")
+    # Browsers without `fmt` support skip a typed preload instead of fetching the wrong file
+    srcset = ", ".join(f"{asset_url(url)} {w}w" for w, url in entry["variants"][fmt])
+    return Link(rel="preload", _as="image", type=f"image/{fmt}", imagesrcset=srcset, imagesizes=sizes, fetchpriority="high")
+
+
+if __name__ == "__main__":
+    build_images(*sys.argv[1:2])
@@ -0,0 +1,363 @@
+# greenai/loadtest.py - Load test against a locally started server
+#
+# Starts the site the way it is deployed (or targets a running server
+# with --url), then keeps `concurrency` simulated visitors busy for
+# `duration` seconds. Each visitor requests pages from a weighted mix of
+# navigation: the home page most often, the other pages, the blog, and
+# the images in public/assets, with the headers a browser sends.
+#
+# It reports requests per second, p50/p95/p99 latency overall and per
+# route, the error rate, and the CPU and memory (RSS) of every server
+# process, read from /proc (Linux). Each run is saved as JSON under
+# loadtest/ and runs can be compared side by side:
+#
+#   python -m greenai.loadtest                              # production, one worker per CPU
+#   python -m greenai.loadtest --server serve               # `python main.py` (dev server)
+#   python -m greenai.loadtest --workers 1 --workers 4 -c 64
+#   python -m greenai.loadtest --url http://localhost:5001  # a server that is already running
+#   python -m greenai.loadtest --clients 4                  # load generator processes
+#   python -m greenai.loadtest --compare loadtest/*.json
+#
+# The load generator runs on the same machine as the server and takes
+# CPU from it (by default half the CPUs); compare runs made the same way,
+# and if the server's CPU stays well below 100% per worker, the
+# generator, not the server, was the limit.
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+import httpx
+
+RESULTS_DIR = Path("loadtest")
+CONCURRENCY = 32
+DURATION = 20     # seconds measured
+WARMUP = 3        # seconds of load before measuring
+CLIENTS = max(1, (os.cpu_count() or 2) // 2)   # load generator processes
+READY_TIMEOUT = 90
+SAMPLE_EVERY = 0.5
+HEADERS = {"accept": "text/html,*/*", "accept-encoding": "br, gzip", "user-agent": "greenai-loadtest"}
+
+# path -> weight; images in public/assets are added by navigation_mix()
+PAGES = {
+    "/": 30,
+    "/about": 8,
+    "/contact": 6,
+    "/projects": 8,
+    "/fragments/footer": 10,   # loaded by every page as it scrolls
+    "/blog/posts": 5,
+    "/blog/posts/resources": 3,
+    "/resources": 4,
+}
+ASSETS_WEIGHT = 26
+
+# name -> (command, environment); `workers` is filled in
+SERVERS = {
+    "production": ([sys.executable, "main.py"], {"SERVER_MODE": "production", "WEB_CONCURRENCY": "{workers}"}),
+    "serve": ([sys.executable, "main.py"], {"LIVE_RELOAD": "0"}),
+}
+
+
+def navigation_mix(assets_dir="public/assets") -> list[tuple[str, float]]:
+    "(path, weight) for the pages and, sharing ASSETS_WEIGHT, the images"
+    assets = [f for f in sorted(Path(assets_dir).glob("*")) if f.is_file()]
+    mix = list(PAGES.items())
+    mix += [(f"/{f.relative_to('public').as_posix()}", ASSETS_WEIGHT / len(assets)) for f in assets]
+    return mix
+
+
+def percentile(samples: list, q: float):
+    "The `q` quantile of sorted `samples`"
+    return samples[min(len(samples) - 1, int(len(samples) * q))] if samples else None
+
+
+def latency_summary(samples: list) -> dict:
+    samples = sorted(samples)
+    ms = lambda s: round(s * 1000, 2) if s is not None else None
+    return {"p50": ms(percentile(samples, 0.5)), "p95": ms(percentile(samples, 0.95)),
+            "p99": ms(percentile(samples, 0.99)), "max": ms(samples[-1] if samples else None),
+            "mean": ms(statistics.fmean(samples) if samples else None)}
+
+
+# ----------------- SERVER PROCESSES
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def descendants(pid: int) -> list[int]:
+    "`pid` and every process started under it (uvicorn workers, the reloader's child)"
+    parents = {}
+    for stat in Path("/proc").glob("[0-9]*/stat"):
+        try:
+            fields = stat.read_text().rsplit(")", 1)[1].split()
+            parents.setdefault(int(fields[1]), []).append(int(stat.parent.name))
+        except (OSError, IndexError, ValueError):
+            continue
+    found, todo = [], [pid]
+    while todo:
+        p = todo.pop()
+        found.append(p)
+        todo += parents.get(p, [])
+    return found
+
+
+def proc_usage(pid: int):
+    "(CPU seconds, RSS bytes) of a process, or None once it is gone"
+    try:
+        fields = Path(f"/proc/{pid}/stat").read_text().rsplit(")", 1)[1].split()
+        rss_pages = int(Path(f"/proc/{pid}/statm").read_text().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    ticks = os.sysconf("SC_CLK_TCK")
+    return (int(fields[11]) + int(fields[12])) / ticks, rss_pages * os.sysconf("SC_PAGE_SIZE")
+
+
+class ProcessSampler:
+    "Samples CPU time and RSS of a server's processes while the load runs"
+
+    def __init__(self, pid: int | None):
+        self.pid = pid
+        self.first, self.last, self.peak_rss = {}, {}, {}
+
+    def sample(self):
+        if self.pid is None or not Path("/proc").exists():
+            return
+        for pid in descendants(self.pid):
+            usage = proc_usage(pid)
+            if usage is None:
+                continue
+            self.first.setdefault(pid, (time.perf_counter(), usage[0]))
+            self.last[pid] = (time.perf_counter(), usage[0])
+            self.peak_rss[pid] = max(self.peak_rss.get(pid, 0), usage[1])
+
+    async def run(self, stop: asyncio.Event):
+        while not stop.is_set():
+            self.sample()
+            try:
+                await asyncio.wait_for(stop.wait(), SAMPLE_EVERY)
+            except asyncio.TimeoutError:
+                pass
+        self.sample()
+
+    def report(self) -> list[dict]:
+        out = []
+        for pid, (t0, cpu0) in self.first.items():
+            t1, cpu1 = self.last[pid]
+            cpu = cpu1 - cpu0
+            out.append({"pid": pid, "cpu_s": round(cpu, 2),
+                        "cpu_percent": round(100 * cpu / (t1 - t0), 1) if t1 > t0 else None,
+                        "rss_mb": round(self.peak_rss[pid] / 2**20, 1)})
+        return sorted(out, key=lambda w: w["pid"])
+
+
+def start_server(name: str, workers: int, port: int):
+    "Start the server config `name` on `port`; returns the process"
+    command, env = SERVERS[name]
+    env = {k: v.format(workers=workers) for k, v in env.items()}
+    return subprocess.Popen(command, env={**os.environ, **env, "PORT": str(port)},
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True)
+
+
+async def wait_ready(base_url: str, proc=None, timeout=READY_TIMEOUT):
+    "Wait until /readyz answers 200 (production workers warm up first)"
+    deadline = time.perf_counter() + timeout
+    async with httpx.AsyncClient(base_url=base_url, timeout=2) as client:
+        while time.perf_counter() < deadline:
+            if proc is not None and proc.poll() is not None:
+                raise RuntimeError(f"server exited with {proc.returncode}")
+            try:
+                if (await client.get("/readyz")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.25)
+    raise TimeoutError(f"{base_url} not ready after {timeout} s")
+
+
+def stop_server(proc):
+    import signal
+
+    try:
+        os.killpg(proc.pid, signal.SIGTERM)
+        proc.wait(timeout=30)
+    except (ProcessLookupError, subprocess.TimeoutExpired):
+        os.killpg(proc.pid, signal.SIGKILL)
+
+
+# ----------------- LOAD
+
+async def visit(base_url: str, visitors: int, measure_from: float, stop_at: float, mix, seed=0) -> dict:
+    "Run `visitors` until `stop_at` (wall clock); latencies of requests started after `measure_from`"
+    paths, weights = zip(*mix)
+    rng = random.Random(seed)
+    routes = {p: {"latencies": [], "errors": 0} for p in paths}
+    transferred = 0
+    limits = httpx.Limits(max_connections=visitors, max_keepalive_connections=visitors)
+    async with httpx.AsyncClient(base_url=base_url, headers=HEADERS, limits=limits, timeout=30) as client:
+        async def visitor():
+            nonlocal transferred
+            while (now := time.time()) < stop_at:
+                path = rng.choices(paths, weights)[0]
+                t = time.perf_counter()
+                try:
+                    resp = await client.get(path)
+                    ok, size = resp.status_code < 400, resp.num_bytes_downloaded
+                except httpx.HTTPError:
+                    ok, size = False, 0
+                if now >= measure_from:
+                    routes[path]["latencies"].append(time.perf_counter() - t)
+                    routes[path]["errors"] += not ok
+                    transferred += size
+
+        await asyncio.gather(*(visitor() for _ in range(visitors)))
+    return {"routes": routes, "bytes": transferred}
+
+
+def visit_in_process(*args) -> dict:
+    return asyncio.run(visit(*args))
+
+
+async def generate_load(base_url: str, concurrency=CONCURRENCY, duration=DURATION, warmup=WARMUP,
+                        clients=1, mix=None, server_pid=None) -> dict:
+    "Keep `concurrency` visitors requesting the mix; statistics cover the `duration` after `warmup`"
+    mix = mix or navigation_mix()
+    # One Python process can only send a few hundred requests a second, so
+    # the visitors are spread over `clients` processes
+    clients = max(1, min(clients, concurrency))
+    shares = [concurrency // clients + (i < concurrency % clients) for i in range(clients)]
+    measure_from = time.time() + warmup
+    stop_at = measure_from + duration
+    sampler, sampling = ProcessSampler(server_pid), asyncio.Event()
+
+    async def measure():
+        await asyncio.sleep(max(0, measure_from - time.time()))
+        await sampler.run(sampling)
+
+    sampler_task = asyncio.create_task(measure())
+    if clients == 1:
+        parts = [await visit(base_url, concurrency, measure_from, stop_at, mix)]
+    else:
+        loop = asyncio.get_running_loop()
+        with ProcessPoolExecutor(clients) as pool:
+            parts = await asyncio.gather(*(loop.run_in_executor(pool, visit_in_process, base_url, n, measure_from,
+                                                                stop_at, mix, seed) for seed, n in enumerate(shares)))
+    sampling.set()
+    await sampler_task
+
+    routes = {p: {"latencies": [], "errors": 0} for p, _ in mix}
+    for part in parts:
+        for p, r in part["routes"].items():
+            routes[p]["latencies"] += r["latencies"]
+            routes[p]["errors"] += r["errors"]
+    latencies = [t for r in routes.values() for t in r["latencies"]]
+    errors = sum(r["errors"] for r in routes.values())
+    transferred = sum(part["bytes"] for part in parts)
+    workers = sampler.report()
+    return {
+        "requests": len(latencies),
+        "rps": round(len(latencies) / duration, 1),
+        "latency_ms": latency_summary(latencies),
+        "errors": errors,
+        "error_rate": round(errors / len(latencies), 4) if latencies else None,
+        "mb_per_s": round(transferred / duration / 2**20, 2),
+        "routes": {p: {"requests": len(r["latencies"]), "errors": r["errors"], **latency_summary(r["latencies"])}
+                   for p, r in routes.items() if r["latencies"]},
+        "processes": workers,
+        "cpu_percent": round(sum(w["cpu_percent"] or 0 for w in workers), 1) if workers else None,
+        "rss_mb": round(sum(w["rss_mb"] for w in workers), 1) if workers else None,
+    }
+
+
+async def run_config(server: str, workers: int, concurrency: int, duration: float, clients=1, url=None) -> dict:
+    "Start a server config (unless `url` is given), load it, stop it"
+    proc = None
+    if url is None:
+        port = free_port()
+        url = f"http://127.0.0.1:{port}"
+        proc = start_server(server, workers, port)
+    try:
+        await wait_ready(url, proc)
+        result = await generate_load(url, concurrency, duration, clients=clients, server_pid=proc.pid if proc else None)
+    finally:
+        if proc is not None:
+            stop_server(proc)
+    label = "external" if proc is None else f"{server}-w{workers}" if server == "production" else server
+    return {
+        "label": f"{label}-c{concurrency}",
+        "server": server if proc else url,
+        "workers": workers if proc and server == "production" else None,
+        "concurrency": concurrency,
+        "clients": clients,
+        "duration_s": duration,
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "cpus": os.cpu_count(),
+        **result,
+    }
+
+
+# ----------------- REPORTS
+
+def print_comparison(results: list[dict], log=print):
+    log(f"{'run':<28} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'errors':>7} {'cpu':>7} {'rss':>8}")
+    for r in results:
+        lat = r["latency_ms"]
+        cpu = f"{r['cpu_percent']:.0f}%" if r.get("cpu_percent") is not None else "-"
+        rss = f"{r['rss_mb']:.0f} MB" if r.get("rss_mb") is not None else "-"
+        log(f"{r['label']:<28} {r['rps']:>8.1f} {lat['p50']:>6.1f}ms {lat['p95']:>6.1f}ms {lat['p99']:>6.1f}ms "
+            f"{(r['error_rate'] or 0):>7.2%} {cpu:>7} {rss:>8}")
+
+
+def print_routes(result: dict, log=print):
+    log(f"  {'route':<34} {'reqs':>6} {'p50':>8} {'p95':>8} {'p99':>8} {'errors':>6}")
+    for path, r in sorted(result["routes"].items(), key=lambda x: -x[1]["requests"]):
+        log(f"  {path:<34} {r['requests']:>6} {r['p50']:>6.1f}ms {r['p95']:>6.1f}ms {r['p99']:>6.1f}ms {r['errors']:>6}")
+    for w in result["processes"]:
+        log(f"  pid {w['pid']:<8} cpu {w['cpu_s']:>7.2f} s ({w['cpu_percent']}%)  rss {w['rss_mb']} MB")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the site")
+    parser.add_argument("--server", choices=list(SERVERS), default="production")
+    parser.add_argument("--workers", type=int, action="append", help="production workers (repeat to compare)")
+    parser.add_argument("-c", "--concurrency", type=int, action="append", help="simulated visitors (repeat to compare)")
+    parser.add_argument("-d", "--duration", type=float, default=DURATION, help="seconds to measure")
+    parser.add_argument("--clients", type=int, default=CLIENTS, help="load generator processes")
+    parser.add_argument("--url", help="load a server that is already running instead of starting one")
+    parser.add_argument("--out", type=Path, default=RESULTS_DIR, help="where to save the results")
+    parser.add_argument("--compare", nargs="+", type=Path, help="print saved results side by side")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        print_comparison([json.loads(p.read_text()) for p in args.compare])
+        return 0
+
+    results = []
+    for workers in args.workers or [os.cpu_count() or 1]:
+        for concurrency in args.concurrency or [CONCURRENCY]:
+            result = asyncio.run(run_config(args.server, workers, concurrency, args.duration, args.clients, args.url))
+            args.out.mkdir(parents=True, exist_ok=True)
+            path = args.out / f"{result['label']}-{result['created'].replace(':', '')}.json"
+            path.write_text(json.dumps(result, indent=1) + "\n")
+            print(f"\n{result['label']}: saved to {path}")
+            print_routes(result)
+            results.append(result)
+    print()
+    print_comparison(results)
+    return 1 if any(r["errors"] for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
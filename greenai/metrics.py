@@ -0,0 +1,233 @@
+# greenai/metrics.py - Request metrics, Server-Timing and Prometheus export
+#
+# Metrics is the outermost middleware. For every request it records the
+# latency, status code and response size per route, and whether the
+# response came from a page handler ("dynamic"), the page cache
+# ("cached") or public/ ("static"). For page handlers the time is split
+# into render (running the handler, which builds the FT tree) and
+# serialize (turning that tree into HTML), measured by the before/after
+# hooks FastHTML calls around each handler.
+#
+# The breakdown is sent to the browser in a Server-Timing header and
+# everything is exported at /metrics in Prometheus text format. Each
+# worker runs a single event loop, so the counters are plain dicts and
+# ints updated without locks.
+#
+# Set PROFILE_SLOW_MS to profile a sample (PROFILE_SAMPLE, default 1%)
+# of requests with cProfile and keep the profiles of requests slower
+# than that many milliseconds in profiles/. cProfile sees the whole
+# event loop thread, so concurrent requests show up in the profile too.
+
+import bisect
+import os
+import random
+import re
+import time
+from collections import defaultdict
+from pathlib import Path
+
+TIMING_KEY = "greenai.timing"
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+def annotate(scope, **values):
+    "Let inner middleware tell Metrics about a request (e.g. kind='static')"
+    timing = scope.get(TIMING_KEY)
+    if timing is not None:
+        timing.update(values)
+
+
+def route_of(scope) -> str:
+    "The route template a request is counted under, once its handler (or a middleware) has named it"
+    return scope.get(TIMING_KEY, {}).get("route", "unmatched")
+
+
+class Histogram:
+    "Cumulative Prometheus-style histogram"
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def lines(self, name, labels):
+        total = 0
+        for bound, n in zip(self.buckets, self.counts):
+            total += n
+            yield f'{name}_bucket{{{labels},le="{bound}"}} {total}'
+        yield f'{name}_bucket{{{labels},le="+Inf"}} {self.count}'
+        yield f"{name}_sum{{{labels}}} {self.sum:.6f}"
+        yield f"{name}_count{{{labels}}} {self.count}"
+
+
+class Registry:
+    "All metrics of this process"
+
+    def __init__(self):
+        self.requests = defaultdict(int)  # (route, method, status, kind) -> count
+        self.latency = defaultdict(lambda: Histogram(LATENCY_BUCKETS))
+        self.sizes = defaultdict(lambda: Histogram(SIZE_BUCKETS))
+        self.render = defaultdict(lambda: [0.0, 0])
+        self.serialize = defaultdict(lambda: [0.0, 0])
+        self.extra = []  # callables returning more exposition lines
+
+    def record(self, route, method, status, kind, seconds, size, timing):
+        self.requests[(route, method, status, kind)] += 1
+        self.latency[(route, kind)].observe(seconds)
+        self.sizes[(route, kind)].observe(size)
+        if "render" in timing:
+            r = self.render[route]
+            r[0] += timing["render"]
+            r[1] += 1
+        if "serialize" in timing:
+            s = self.serialize[route]
+            s[0] += timing["serialize"]
+            s[1] += 1
+
+    def exposition(self) -> str:
+        "Everything in Prometheus text format"
+        out = [
+            "# HELP greenai_http_requests_total Requests by route, method, status and kind (dynamic/cached/static).",
+            "# TYPE greenai_http_requests_total counter",
+        ]
+        for (route, method, status, kind), n in sorted(self.requests.items()):
+            out.append(f'greenai_http_requests_total{{route="{_esc(route)}",method="{method}",status="{status}",kind="{kind}"}} {n}')
+        out += ["# HELP greenai_http_request_duration_seconds Time until the last byte was sent.",
+                "# TYPE greenai_http_request_duration_seconds histogram"]
+        for (route, kind), h in sorted(self.latency.items()):
+            out += h.lines("greenai_http_request_duration_seconds", f'route="{_esc(route)}",kind="{kind}"')
+        out += ["# HELP greenai_http_response_size_bytes Bytes sent in the response body.",
+                "# TYPE greenai_http_response_size_bytes histogram"]
+        for (route, kind), h in sorted(self.sizes.items()):
+            out += h.lines("greenai_http_response_size_bytes", f'route="{_esc(route)}",kind="{kind}"')
+        for name, data, help in (("render", self.render, "Time spent in the route handler building the page."),
+                                 ("serialize", self.serialize, "Time spent turning the page into HTML.")):
+            out += [f"# HELP greenai_{name}_seconds {help}", f"# TYPE greenai_{name}_seconds summary"]
+            for route, (total, n) in sorted(data.items()):
+                out += [f'greenai_{name}_seconds_sum{{route="{_esc(route)}"}} {total:.6f}',
+                        f'greenai_{name}_seconds_count{{route="{_esc(route)}"}} {n}']
+        for extra in self.extra:
+            out += list(extra())
+        return "\n".join(out) + "\n"
+
+
+def _esc(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"')
+
+
+registry = Registry()
+
+
+def find_middleware(app, cls):
+    "The instance of middleware `cls` in the app's (built) middleware stack"
+    if app.middleware_stack is None:
+        app.middleware_stack = app.build_middleware_stack()
+    layer = app.middleware_stack
+    while layer is not None:
+        if isinstance(layer, cls):
+            return layer
+        layer = getattr(layer, "app", None)
+    return None
+
+
+# ----------------- FASTHTML HOOKS
+
+_route_templates = {}
+
+
+def before_handler(req):
+    "Beforeware: remember the route template and when the handler started"
+    timing = req.scope.get(TIMING_KEY)
+    if timing is None:
+        return
+    endpoint = req.scope.get("endpoint")
+    if endpoint not in _route_templates:
+        _route_templates.update({getattr(r, "endpoint", None): r.path for r in req.app.routes if hasattr(r, "path")})
+    route = _route_templates.get(endpoint, req.url.path)
+    timing.update(route=route, kind="static" if "{ext:static}" in route else "dynamic",
+                  handler_start=time.perf_counter())
+
+
+def after_handler(resp, req):
+    "FastHTML after hook: the handler is done, what follows is serialization"
+    timing = req.scope.get(TIMING_KEY)
+    if timing is not None and "handler_start" in timing:
+        timing["handler_end"] = time.perf_counter()
+        timing["render"] = timing["handler_end"] - timing["handler_start"]
+
+
+# ----------------- MIDDLEWARE
+
+class Metrics:
+    "ASGI middleware recording per-route metrics and adding a Server-Timing header"
+
+    def __init__(self, app, registry=registry, profile_slow_ms=None, profile_sample=None, profile_dir="profiles"):
+        self.app = app
+        self.registry = registry
+        slow = profile_slow_ms if profile_slow_ms is not None else os.environ.get("PROFILE_SLOW_MS")
+        self.profile_slow = float(slow) / 1000 if slow else None
+        self.profile_sample = float(profile_sample or os.environ.get("PROFILE_SAMPLE", "0.01"))
+        self.profile_dir = Path(profile_dir)
+        self.profiling = False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        start = time.perf_counter()
+        timing = scope[TIMING_KEY] = {}
+        status, size = 500, 0
+
+        profiler = None
+        if self.profile_slow is not None and not self.profiling and random.random() < self.profile_sample:
+            import cProfile
+            self.profiling = True
+            profiler = cProfile.Profile()
+            profiler.enable()
+
+        async def send_timed(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                now = time.perf_counter()
+                status = message["status"]
+                if "handler_end" in timing:
+                    timing["serialize"] = now - timing["handler_end"]
+                message = {**message, "headers": [*message.get("headers", []), (b"server-timing", self.server_timing(timing, now - start))]}
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_timed)
+        finally:
+            seconds = time.perf_counter() - start
+            route = route_of(scope)
+            self.registry.record(route, scope["method"], status, timing.get("kind", "dynamic"), seconds, size, timing)
+            if profiler is not None:
+                profiler.disable()
+                self.profiling = False
+                if seconds >= self.profile_slow:
+                    self.save_profile(profiler, route, seconds)
+
+    def server_timing(self, timing, total) -> bytes:
+        parts = [f"app;dur={total * 1000:.2f}"]
+        if "render" in timing:
+            parts.append(f"render;dur={timing['render'] * 1000:.2f}")
+        if "serialize" in timing:
+            parts.append(f"serialize;dur={timing['serialize'] * 1000:.2f}")
+        if timing.get("kind") in ("cached", "static"):
+            parts.append(f"{timing['kind']};desc=\"{timing['kind']}\"")
+        return ", ".join(parts).encode()
+
+    def save_profile(self, profiler, route, seconds):
+        self.profile_dir.mkdir(exist_ok=True)
+        name = re.sub(r"[^\w]+", "_", route).strip("_") or "root"
+        path = self.profile_dir / f"{time.strftime('%Y%m%d-%H%M%S')}-{name}-{seconds * 1000:.0f}ms.prof"
+        profiler.dump_stats(path)
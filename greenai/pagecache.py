@@ -0,0 +1,205 @@
+# greenai/pagecache.py - Whole-page response cache
+#
+# Pages on this site only change when the content changes (a new
+# deploy, an edited entry) or when the year in the footer ticks over.
+# PageCache stores the rendered bytes of each page the first time it is
+# requested and serves those bytes afterwards, together with a strong
+# ETag and a Last-Modified date so that browsers can revalidate with a
+# cheap 304 Not Modified.
+#
+# A static export (python main.py build) can be loaded as a snapshot
+# when the app starts, so even the first request for a page is answered
+# without rendering it.
+#
+# A streamed page (greenai/streaming.py) is passed on to the visitor
+# chunk by chunk while it is stored, so a cache miss does not hold back
+# the page's head; only that first response goes out without an ETag.
+
+import hashlib
+import json
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime
+from email.utils import formatdate, parsedate_to_datetime
+from pathlib import Path
+
+from greenai.metrics import annotate
+
+# Headers that belong to a single response and must never be replayed
+# to another visitor, or that cache_headers() sets itself.
+_UNCACHED_HEADERS = {b"content-length", b"set-cookie", b"date", b"etag", b"last-modified", b"cache-control", b"vary"}
+
+# Request headers that change what the handlers return (FastHTML sends
+# a partial page to HTMX requests).
+_VARY_HEADERS = (b"hx-request", b"hx-history-restore-request", b"hx-boosted")
+
+
+@dataclass
+class CachedPage:
+    "Rendered bytes of a page together with its validators"
+    status: int
+    headers: list
+    body: bytes
+    etag: str = ""
+    last_modified: str = ""
+    created: float = field(default_factory=lambda: datetime.now().timestamp())
+
+    def __post_init__(self):
+        self.etag = self.etag or '"' + hashlib.sha256(self.body).hexdigest()[:32] + '"'
+        self.last_modified = self.last_modified or formatdate(self.created, usegmt=True)
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    "Weak comparison of an If-None-Match header against an ETag, as used for GET"
+    if if_none_match.strip() == "*":
+        return True
+    tags = [t.strip() for t in if_none_match.split(",")]
+    return etag.removeprefix("W/") in [t.removeprefix("W/") for t in tags]
+
+
+def not_modified(headers: dict, page: CachedPage) -> bool:
+    "True when the request's validators show the client already has `page`"
+    if b"if-none-match" in headers:
+        return etag_matches(headers[b"if-none-match"].decode("latin-1"), page.etag)
+    if b"if-modified-since" in headers:
+        try:
+            since = parsedate_to_datetime(headers[b"if-modified-since"].decode("latin-1"))
+        except (TypeError, ValueError):
+            return False
+        return int(page.created) <= since.timestamp()
+    return False
+
+
+@dataclass
+class Snapshot:
+    "Pages pre-rendered by the static export, for the content generation they were built for"
+    generation: tuple
+    pages: dict  # (path, HX-Request header) -> CachedPage
+
+
+def load_snapshot(directory) -> Snapshot | None:
+    "The pages of a static export in `directory`, or None without a usable export"
+    manifest_path = Path(directory) / "manifest.json"
+    if not manifest_path.exists():
+        return None
+    manifest = json.loads(manifest_path.read_text())
+    generation = manifest.get("meta", {}).get("generation")
+    if generation is None:
+        return None
+    pages = {}
+    for path, route in manifest["routes"].items():
+        headers = [(b"content-type", route["content_type"].encode("latin-1"))]
+        body = (Path(directory) / route["file"]).read_bytes()
+        pages[(path, b"true" if route.get("partial") else b"")] = CachedPage(200, headers, body)
+    return Snapshot(tuple(generation), pages)
+
+
+class PageCache:
+    "ASGI middleware that serves rendered pages from memory and answers conditional requests"
+
+    def __init__(self, app, paths=(), version="", maxsize=256, snapshot: Snapshot | None = None):
+        self.app = app
+        self.paths = set(paths)
+        self.version = version
+        self.maxsize = maxsize
+        self.snapshot = snapshot
+        self.pages = OrderedDict()
+        self.generation = None
+        self.hits = self.misses = 0
+
+    def current_generation(self):
+        "Content version and year; when either changes every cached page is dropped"
+        version = self.version() if callable(self.version) else self.version
+        return (version, datetime.now().year)
+
+    def key(self, scope, headers):
+        # One site, so the Host header is left out: pages warmed or
+        # exported for the public URL serve any name the site answers to
+        vary = tuple(headers.get(h, b"") for h in _VARY_HEADERS)
+        return (scope["path"], scope.get("query_string", b""), vary)
+
+    def clear(self):
+        self.pages.clear()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "GET" or scope["path"] not in self.paths:
+            return await self.app(scope, receive, send)
+
+        generation = self.current_generation()
+        if generation != self.generation:
+            self.clear()
+            self.generation = generation
+
+        headers = dict(scope["headers"])
+        key = self.key(scope, headers)
+        page = self.pages.get(key) or self.from_snapshot(key, generation)
+        if page is None:
+            self.misses += 1
+            page, sent = await self.render(scope, receive, send)
+            if page.status == 200:
+                self.pages[key] = page
+                if len(self.pages) > self.maxsize:
+                    self.pages.popitem(last=False)
+            if sent:
+                return
+        else:
+            self.hits += 1
+            self.pages.move_to_end(key)
+            annotate(scope, route=scope["path"], kind="cached")
+
+        await self.respond(page, headers, send)
+
+    def from_snapshot(self, key, generation):
+        "The pre-rendered page for `key`, stored in the cache on first use"
+        path, query, (hx_request, *other_vary) = key
+        if self.snapshot is None or self.snapshot.generation != generation or query or any(other_vary):
+            return None
+        page = self.snapshot.pages.get((path, hx_request))
+        if page is not None:
+            self.pages[key] = page
+        return page
+
+    async def render(self, scope, receive, send=None) -> tuple[CachedPage, bool]:
+        "Run the wrapped app and collect its response; a streamed one is also passed on to `send`"
+        start, chunks, streaming = {}, [], False
+
+        async def collect(message):
+            nonlocal streaming
+            if message["type"] == "http.response.start":
+                start.update(message)
+            elif message["type"] == "http.response.body":
+                body, more = message.get("body", b""), message.get("more_body", False)
+                chunks.append(body)
+                if send is None or not (streaming or more):
+                    return
+                if not streaming:
+                    streaming = True
+                    headers = [(k, v) for k, v in start.get("headers", []) if k.lower() not in _UNCACHED_HEADERS]
+                    await send({**start, "headers": headers + self.cache_headers()})
+                await send({"type": "http.response.body", "body": body, "more_body": more})
+
+        await self.app(scope, receive, collect)
+        headers = [(k, v) for k, v in start.get("headers", []) if k.lower() not in _UNCACHED_HEADERS]
+        return CachedPage(start.get("status", 500), headers, b"".join(chunks)), streaming
+
+    def cache_headers(self) -> list:
+        return [
+            (b"cache-control", b"no-cache"),
+            # Every header in the cache key, so shared caches key on them too;
+            # FastHTML's own Vary leaves out HX-Boosted and snapshots have none
+            (b"vary", b", ".join(_VARY_HEADERS)),
+        ]
+
+    async def respond(self, page: CachedPage, request_headers: dict, send):
+        headers = page.headers + [
+            (b"etag", page.etag.encode()),
+            (b"last-modified", page.last_modified.encode()),
+            *self.cache_headers(),
+        ]
+        if page.status == 200 and not_modified(request_headers, page):
+            await send({"type": "http.response.start", "status": 304, "headers": headers})
+            await send({"type": "http.response.body", "body": b""})
+            return
+        headers.append((b"content-length", str(len(page.body)).encode()))
+        await send({"type": "http.response.start", "status": page.status, "headers": headers})
+        await send({"type": "http.response.body", "body": page.body})
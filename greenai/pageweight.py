@@ -0,0 +1,334 @@
+# greenai/pageweight.py - Page weight and carbon budget for every page
+#
+# Loads every route of the app in-process the way a browser would on a
+# first visit: the HTML, then the stylesheets, scripts, fonts, images
+# (the srcset candidate a 1280 px wide screen would pick), iframes and
+# the HTMX sections that load themselves, recursively. For each page it
+# reports the bytes transferred (compressed, as sent with
+# `accept-encoding: br, gzip`) and uncompressed, the number of requests,
+# the largest resources and an estimate of the CO2 per view with the
+# Sustainable Web Design model:
+#
+#   energy (kWh) = transfer (GB) * 0.81 kWh/GB
+#   CO2 (g)      = energy * 442 g/kWh (global average grid intensity)
+#
+# per view weighted as 75% first visits and 25% returning visits that
+# download 2% of the bytes again.
+#
+# External resources (CDN scripts, YouTube and Google Forms iframes) are
+# counted as requests but only measured with --external, which fetches
+# them over the network (just the resource itself, not what it loads).
+#
+# Every page is checked against BUDGETS; the run fails when one is over.
+# The report is written as JSON and appended to a history file, and the
+# change since the last run is printed:
+#
+#   python -m greenai.pageweight                # report, fail over budget
+#   python -m greenai.pageweight -k /blog       # only matching routes
+#   python -m greenai.pageweight --external     # also measure CDN files and iframes
+
+import argparse
+import json
+import re
+import sys
+import time
+from datetime import datetime, timezone
+from html.parser import HTMLParser
+from pathlib import Path
+from urllib.parse import urljoin, urlsplit
+
+KWH_PER_GB = 0.81
+GRID_G_PER_KWH = 442
+FIRST_VISIT_SHARE = 0.75
+RETURNING_RELOAD_SHARE = 0.02
+VIEWPORT = 1280
+ACCEPT_ENCODING = "br, gzip"
+REPORT = Path("pageweight_report.json")
+HISTORY = Path("pageweight_history.jsonl")
+
+# Limits per page, in KB transferred, requests, CO2 grams per view and
+# KB of the largest single resource. "default" applies to every route;
+# a route's own entry overrides single limits.
+BUDGETS = {
+    "default": {"transfer_kb": 600, "requests": 40, "co2_g": 0.2, "largest_kb": 250},
+}
+# Routes that aren't pages (JSON, metrics, health checks)
+SKIP = {"/api/search", "/_stats/compression", "/metrics", "/readyz"}
+
+_CSS_URL_RE = re.compile(r"""url\(\s*['"]?([^'")]+)['"]?\s*\)""")
+_CSS_IMPORT_RE = re.compile(r"""@import\s+['"]([^'"]+)['"]""")
+_FONT_SRC_RE = re.compile(r"\bsrc\s*:([^;}]+)")
+
+
+def co2_grams(transfer_bytes: int) -> float:
+    "CO2 (g) per view of a page transferring `transfer_bytes`, Sustainable Web Design model"
+    kwh = transfer_bytes / 1e9 * KWH_PER_GB
+    visit_share = FIRST_VISIT_SHARE + (1 - FIRST_VISIT_SHARE) * RETURNING_RELOAD_SHARE
+    return kwh * visit_share * GRID_G_PER_KWH
+
+
+def pick_candidate(srcset: str, sizes: str = "", viewport=VIEWPORT):
+    "The srcset URL a browser `viewport` px wide (1x) would load"
+    candidates = []
+    for part in srcset.split(","):
+        bits = part.split()
+        if bits:
+            w = bits[1] if len(bits) > 1 else "1x"
+            candidates.append((bits[0], int(w[:-1]) if w.endswith("w") else None))
+    if not candidates:
+        return None
+    if all(w is None for _, w in candidates):
+        return candidates[0][0]
+    slot = viewport
+    for size in (s.strip() for s in sizes.split(",") if s.strip()):
+        m = re.fullmatch(r"(?:\(min-width:\s*(\d+)px\)\s*)?(\d+)(px|vw)", size)
+        if m and (m.group(1) is None or int(m.group(1)) <= viewport):
+            slot = int(m.group(2)) * (viewport / 100 if m.group(3) == "vw" else 1)
+            break
+    widths = sorted((w, url) for url, w in candidates if w)
+    return next((url for w, url in widths if w >= slot), widths[-1][1])
+
+
+class ResourceParser(HTMLParser):
+    "Collects the URLs an HTML page makes the browser load"
+
+    def __init__(self):
+        super().__init__()
+        self.urls = []        # (kind, url)
+        self.fragments = []   # hx-get URLs loaded by htmx without a click
+        self.picture = None   # URL picked from a <picture>'s first <source>, if any
+        self.in_style = False
+        self.in_template = 0  # <template> content is not loaded until a script uses it
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "template" or self.in_template:
+            self.in_template += tag == "template"
+            return
+        a = dict(attrs)
+        if a.get("hx-get") and re.search(r"\b(revealed|load|intersect)\b", a.get("hx-trigger") or ""):
+            self.fragments.append(a["hx-get"])
+        if a.get("style"):
+            self.urls += [("image", url) for url in _CSS_URL_RE.findall(a["style"])]
+        rel = (a.get("rel") or "").lower().split()
+        if tag == "link" and a.get("href"):
+            if "stylesheet" in rel or ("preload" in rel and a.get("as") == "style"):
+                self.urls.append(("css", a["href"]))
+            elif "preload" in rel or "modulepreload" in rel:
+                self.urls.append((a.get("as") or "other", a["href"]))
+            elif "icon" in rel:
+                self.urls.append(("image", a["href"]))
+        elif tag == "script" and a.get("src"):
+            self.urls.append(("js", a["src"]))
+        elif tag == "picture":
+            self.picture = ""
+        elif tag == "source" and self.picture == "" and a.get("srcset"):
+            self.picture = pick_candidate(a["srcset"], a.get("sizes") or "")
+            self.urls.append(("image", self.picture))
+        elif tag == "img":
+            if not self.picture:
+                url = pick_candidate(a["srcset"], a.get("sizes") or "") if a.get("srcset") else a.get("src")
+                if url:
+                    self.urls.append(("image", url))
+        elif tag in ("iframe", "video", "audio", "embed") and a.get("src"):
+            self.urls.append(("iframe" if tag == "iframe" else "media", a["src"]))
+        elif tag == "style":
+            self.in_style = True
+
+    def handle_endtag(self, tag):
+        if tag == "template":
+            self.in_template = max(0, self.in_template - 1)
+        elif tag == "picture":
+            self.picture = None
+        elif tag == "style":
+            self.in_style = False
+
+    def handle_data(self, data):
+        if self.in_style:
+            self.urls += css_urls(data)
+
+
+def css_urls(css: str):
+    "(kind, url) for the files a stylesheet loads"
+    urls = [("css", url) for url in _CSS_IMPORT_RE.findall(css)]
+    # A font's src lists alternatives (woff2, woff, ...); browsers load the first
+    fonts = [_CSS_URL_RE.findall(src)[:1] for src in _FONT_SRC_RE.findall(css)]
+    urls += [("font", url) for first in fonts for url in first]
+    for url in _CSS_URL_RE.findall(_FONT_SRC_RE.sub("", css)):
+        ext = url.split("?")[0].rsplit(".", 1)[-1].lower()
+        urls.append(("font" if ext in ("woff2", "woff", "ttf", "otf") else "image", url))
+    return urls
+
+
+class PageWeigher:
+    "Loads pages through an in-process client and adds up what each one transfers"
+
+    def __init__(self, client, base_url="http://testserver", external=False, external_client=None):
+        self.client = client
+        self.base_url = base_url
+        self.host = urlsplit(base_url).netloc
+        self.external = external
+        self.external_client = external_client
+        self.fetched = {}
+
+    def fetch(self, url: str, hx=False):
+        "(status, content type, transferred bytes, uncompressed bytes, body) of `url`, or None when not measured"
+        key = (url, hx)
+        if key not in self.fetched:
+            local = urlsplit(url).netloc in ("", self.host)
+            headers = {"accept-encoding": ACCEPT_ENCODING, **({"hx-request": "true"} if hx else {})}
+            if local:
+                resp = self.client.get(url, headers=headers)
+            elif self.external:
+                try:
+                    resp = self.external_client.get(url, headers=headers)
+                except Exception:
+                    resp = None
+            else:
+                resp = None
+            self.fetched[key] = None if resp is None else (
+                resp.status_code, resp.headers.get("content-type", ""),
+                resp.num_bytes_downloaded or len(resp.content), len(resp.content), resp.content)
+        return self.fetched[key]
+
+    def weigh(self, path: str) -> dict:
+        "Everything a first visit to `path` transfers"
+        page = self.fetch(urljoin(self.base_url, path))
+        if page is None or not page[1].startswith("text/html"):
+            return None
+        resources, queue, seen = [], [("document", urljoin(self.base_url, path), False)], set()
+        while queue:
+            kind, url, hx = queue.pop(0)
+            if url in seen or url.startswith(("data:", "javascript:", "#")):
+                continue
+            seen.add(url)
+            result = self.fetch(url, hx)
+            local = urlsplit(url).netloc == self.host
+            entry = {"url": url[len(self.base_url):] if local else url, "kind": kind, "external": not local}
+            if result is None:
+                resources.append({**entry, "transfer": None, "size": None})
+                continue
+            status, ctype, transfer, size, body = result
+            resources.append({**entry, "status": status, "transfer": transfer, "size": size})
+            if status != 200 or not local:
+                continue
+            if ctype.startswith("text/html"):
+                parser = ResourceParser()
+                parser.feed(body.decode("utf-8", "replace"))
+                queue += [(k, urljoin(url, u), False) for k, u in parser.urls]
+                queue += [("fragment", urljoin(url, u), True) for u in parser.fragments]
+            elif ctype.startswith("text/css"):
+                queue += [(k, urljoin(url, u), False) for k, u in css_urls(body.decode("utf-8", "replace"))]
+        return summarize(path, resources)
+
+
+def summarize(path: str, resources) -> dict:
+    measured = [r for r in resources if r["transfer"] is not None]
+    transfer = sum(r["transfer"] for r in measured)
+    by_kind = {}
+    for r in measured:
+        by_kind[r["kind"]] = by_kind.get(r["kind"], 0) + r["transfer"]
+    return {
+        "route": path,
+        "requests": len(resources),
+        "transfer": transfer,
+        "size": sum(r["size"] for r in measured),
+        "co2_g": round(co2_grams(transfer), 4),
+        "by_kind": by_kind,
+        "largest": sorted(measured, key=lambda r: -r["transfer"])[:5],
+        "not_measured": [r["url"] for r in resources if r["transfer"] is None],
+        "errors": [r["url"] for r in measured if r.get("status", 200) >= 400],
+    }
+
+
+def budget_for(route: str, budgets=BUDGETS) -> dict:
+    return {**budgets["default"], **budgets.get(route, {})}
+
+
+def over_budget(page: dict, budgets=BUDGETS) -> list[str]:
+    "What `page` is over budget on, as messages"
+    budget, over = budget_for(page["route"], budgets), []
+    largest = page["largest"][0]["transfer"] if page["largest"] else 0
+    checks = (("transfer_kb", page["transfer"] / 1024, "KB transferred"), ("requests", page["requests"], "requests"),
+              ("co2_g", page["co2_g"], "g CO2 per view"), ("largest_kb", largest / 1024, "KB largest resource"))
+    for limit, value, unit in checks:
+        if limit in budget and value > budget[limit]:
+            what = f" ({page['largest'][0]['url']})" if limit == "largest_kb" else ""
+            over.append(f"{page['route']}: {value:.4g} {unit}{what} > budget {budget[limit]}")
+    return over
+
+
+def weigh_site(app, params=None, pattern="", external=False, log=print) -> dict:
+    "Page weight report for every GET route of `app` matching `pattern`"
+    from starlette.testclient import TestClient
+    from greenai.export import route_paths
+
+    external_client = None
+    if external:
+        import httpx
+        external_client = httpx.Client(timeout=20, follow_redirects=True)
+    pages = []
+    with TestClient(app) as client:
+        weigher = PageWeigher(client, external=external, external_client=external_client)
+        for path in route_paths(app, params):
+            if path in SKIP or pattern not in path:
+                continue
+            page = weigher.weigh(path)
+            if page is not None:
+                pages.append(page)
+    if external_client:
+        external_client.close()
+    return {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "model": {"kwh_per_gb": KWH_PER_GB, "grid_g_per_kwh": GRID_G_PER_KWH,
+                  "first_visit_share": FIRST_VISIT_SHARE, "returning_reload_share": RETURNING_RELOAD_SHARE},
+        "external_measured": external,
+        "pages": pages,
+        "total": {"transfer": sum(p["transfer"] for p in pages), "requests": sum(p["requests"] for p in pages),
+                  "co2_g": round(sum(p["co2_g"] for p in pages), 4)},
+    }
+
+
+def print_report(report, previous=None, log=print):
+    before = {p["route"]: p for p in previous["pages"]} if previous else {}
+    log(f"{'route':<32} {'transfer':>10} {'size':>10} {'reqs':>5} {'CO2/view':>9}  change")
+    for page in report["pages"]:
+        old = before.get(page["route"])
+        change = f"{(page['transfer'] - old['transfer']) / 1024:+.1f} KB" if old else ""
+        unmeasured = f"  (+{len(page['not_measured'])} external)" if page["not_measured"] else ""
+        log(f"{page['route']:<32} {page['transfer'] / 1024:>7.1f} KB {page['size'] / 1024:>7.1f} KB "
+            f"{page['requests']:>5} {page['co2_g']:>7.3f} g  {change}{unmeasured}")
+    for page in report["pages"]:
+        for url in page["errors"]:
+            log(f"BROKEN {page['route']}: {url}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Page weight and CO2 per view for every page")
+    parser.add_argument("-k", "--filter", default="", help="only routes containing this")
+    parser.add_argument("--external", action="store_true", help="fetch external resources to measure them")
+    parser.add_argument("--report", type=Path, default=REPORT)
+    parser.add_argument("--history", type=Path, default=HISTORY)
+    args = parser.parse_args(argv)
+
+    import main as site
+
+    start = time.perf_counter()
+    report = weigh_site(site.app, site.route_params(), args.filter, args.external)
+    previous = json.loads(args.report.read_text()) if args.report.exists() else None
+    print_report(report, previous)
+    print(f"\n{len(report['pages'])} pages, {report['total']['transfer'] / 1024:.1f} KB, "
+          f"{report['total']['co2_g']:.3f} g CO2 ({time.perf_counter() - start:.1f} s)")
+
+    args.report.write_text(json.dumps(report, indent=1) + "\n")
+    with args.history.open("a") as f:
+        f.write(json.dumps({"created": report["created"], "total": report["total"],
+                            "pages": {p["route"]: [p["transfer"], p["requests"], p["co2_g"]] for p in report["pages"]}}) + "\n")
+
+    over = [message for page in report["pages"] for message in over_budget(page)]
+    for message in over:
+        print(f"OVER BUDGET {message}")
+    return 1 if over else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
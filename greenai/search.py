@@ -0,0 +1,204 @@
+# greenai/search.py - Server-side search over the blog
+#
+# Quarto's blog search downloads the whole search.json and matches it
+# in the browser. SearchIndex loads search.json once into an inverted
+# index instead, ranks matches with BM25 and treats every query word as
+# a prefix (so "sustain" finds "sustainable"). The BM25 weight of every
+# (term, section) pair is worked out when the index is built, so a
+# query only adds up numbers. The scores of a prefix (the sum over the
+# terms it expands to) and the results of recent queries are kept until
+# the index changes, so typing "sus", "sust", "susta" only merges the
+# terms of a prefix once.
+#
+# The index is built when the app starts (start()). When search.json
+# changes on disk a new index is built in a background thread, reusing
+# the tokens of the sections that did not change, and swapped in whole:
+# searches running meanwhile keep using the previous one.
+
+import asyncio
+import bisect
+import hashlib
+import heapq
+import json
+import math
+import re
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+
+_TOKEN_RE = re.compile(r"\w+")
+
+# Words in titles and section headings count more than words in the text
+FIELD_WEIGHTS = {"title": 3, "section": 2, "text": 1}
+PREFIX_WEIGHT = 0.5
+MAX_EXPANSIONS = 64
+MAX_CACHED_QUERIES = 1024
+
+
+def tokenize(text: str):
+    return _TOKEN_RE.findall(text.lower())
+
+
+def term_counts(entry) -> Counter:
+    "Weighted term frequencies of a search.json section"
+    counts = Counter()
+    for field_name, weight in FIELD_WEIGHTS.items():
+        for token in tokenize(entry.get(field_name, "")):
+            counts[token] += weight
+    return counts
+
+
+@dataclass(eq=False)
+class Index:
+    "One build of the index; refresh() replaces it and only its result cache ever changes"
+    docs: dict = field(default_factory=dict)      # objectID -> (entry, digest, term counts)
+    postings: dict = field(default_factory=dict)  # term -> {objectID: BM25 weight}
+    terms: list = field(default_factory=list)     # sorted vocabulary, for prefix lookups
+    mtime: int | None = None
+    results: dict = field(default_factory=dict)   # (tokens, k) -> top (score, objectID) pairs
+    prefixes: dict = field(default_factory=dict)  # token -> {objectID: score} over its expansions
+
+
+def build_index(entries: dict, digests: dict, old: Index, mtime, k1=1.2, b=0.75) -> Index:
+    "An Index of `entries`, tokenizing only the sections that are new or changed since `old`"
+    docs = {}
+    for oid, entry in entries.items():
+        doc = old.docs.get(oid)
+        docs[oid] = doc if doc is not None and doc[1] == digests[oid] else (entry, digests[oid], term_counts(entry))
+    lengths = {oid: sum(doc[2].values()) for oid, doc in docs.items()}
+    avg = sum(lengths.values()) / len(docs) if docs else 0
+
+    postings = {}
+    for oid, (_, _, counts) in docs.items():
+        norm = k1 * (1 - b + b * lengths[oid] / avg)
+        for term, tf in counts.items():
+            postings.setdefault(term, {})[oid] = tf * (k1 + 1) / (tf + norm)
+    n = len(docs)
+    for docs_of_term in postings.values():
+        idf = math.log(1 + (n - len(docs_of_term) + 0.5) / (len(docs_of_term) + 0.5))
+        for oid in docs_of_term:
+            docs_of_term[oid] *= idf
+    return Index(docs, postings, sorted(postings), mtime)
+
+
+class SearchIndex:
+    "In-memory BM25 index over the sections in a Quarto search.json"
+
+    def __init__(self, path="public/blog/search.json", url_prefix="/blog/", k1=1.2, b=0.75, check_interval=1.0):
+        self.path = Path(path)
+        self.url_prefix = url_prefix
+        self.k1, self.b = k1, b
+        self.check_interval = check_interval
+        self.index = Index()
+        self.checked = 0.0
+        self.lock = threading.Lock()
+
+    # ----------------- INDEXING
+
+    def mtime(self):
+        try:
+            return self.path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def refresh(self):
+        "Build a new index if search.json changed since the current one, and swap it in"
+        with self.lock:
+            mtime = self.mtime()
+            if mtime is None or mtime == self.index.mtime:
+                return
+            entries = {e["objectID"]: e for e in json.loads(self.path.read_text())}
+            digests = {oid: hashlib.blake2b(json.dumps(e, sort_keys=True).encode(), digest_size=16).digest()
+                       for oid, e in entries.items()}
+            self.index = build_index(entries, digests, self.index, mtime, self.k1, self.b)
+
+    def check(self):
+        "Start a rebuild in the background when search.json changed (at most every `check_interval`)"
+        now = time.monotonic()
+        if now - self.checked < self.check_interval:
+            return
+        self.checked = now
+        mtime = self.mtime()
+        if mtime is None or mtime == self.index.mtime or self.lock.locked():
+            return
+        if self.index.mtime is None:
+            self.refresh()  # nothing to search yet, so wait for it
+        else:
+            threading.Thread(target=self.refresh, daemon=True).start()
+
+    async def start(self):
+        "Build the index before the app serves requests (an app startup handler)"
+        await asyncio.to_thread(self.refresh)
+
+    # ----------------- QUERYING
+
+    def expand(self, index: Index, token):
+        "The token itself plus vocabulary terms it is a prefix of, with their weights"
+        yield token, 1.0
+        i = bisect.bisect_right(index.terms, token)
+        for term in index.terms[i:i + MAX_EXPANSIONS]:
+            if not term.startswith(token):
+                break
+            yield term, PREFIX_WEIGHT
+
+    def merge(self, lists) -> dict:
+        "{objectID: summed score} of (weight, {objectID: score}) lists"
+        # The longest list is copied in one go, the others are added to it
+        lists = sorted(lists, key=lambda item: len(item[1]), reverse=True)
+        weight, docs = lists[0]
+        scores = dict(docs) if weight == 1.0 else {oid: weight * score for oid, score in docs.items()}
+        for weight, docs in lists[1:]:
+            get = scores.get
+            for oid, score in docs.items():
+                scores[oid] = get(oid, 0.0) + weight * score
+        return scores
+
+    def token_scores(self, index: Index, token):
+        "{objectID: score} for one query word: its postings, or the merged ones of everything it expands to"
+        scores = index.prefixes.get(token)
+        if scores is None:
+            lists = [(weight, index.postings[term]) for term, weight in self.expand(index, token)
+                     if term in index.postings]
+            if len(lists) == 1 and lists[0][0] == 1.0:
+                return lists[0][1]  # a whole word only: its postings as they are
+            scores = self.merge(lists) if lists else {}
+            if len(index.prefixes) >= MAX_CACHED_QUERIES:
+                index.prefixes.clear()
+            index.prefixes[token] = scores
+        return scores
+
+    def top(self, index: Index, tokens, k):
+        "The `k` best (score, objectID) pairs for `tokens`"
+        lists = [(1.0, scores) for scores in (self.token_scores(index, token) for token in tokens) if scores]
+        if not lists:
+            return []
+        scores = self.merge(lists) if len(lists) > 1 else lists[0][1]
+        return [(scores[oid], oid) for oid in heapq.nlargest(k, scores, key=scores.get)]
+
+    def search(self, query: str, k=10):
+        "Top `k` sections for `query` as (score, entry) pairs"
+        self.check()
+        index = self.index
+        key = (tuple(sorted(set(tokenize(query)))), k)
+        best = index.results.get(key)
+        if best is None:
+            best = self.top(index, key[0], k)
+            if len(index.results) >= MAX_CACHED_QUERIES:
+                index.results.clear()
+            index.results[key] = best
+        return [(score, index.docs[oid][0]) for score, oid in best]
+
+    def hits(self, query: str, k=10):
+        "Search results shaped for the JSON API"
+        return [
+            {
+                "href": self.url_prefix + entry["href"],
+                "title": entry.get("title", ""),
+                "section": entry.get("section", ""),
+                "snippet": " ".join(entry.get("text", "").split())[:200],
+                "score": round(score, 4),
+            }
+            for score, entry in self.search(query, k)
+        ]
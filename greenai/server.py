@@ -0,0 +1,109 @@
+# greenai/server.py - Production server settings and warmup
+#
+# `python main.py` runs a single uvicorn process with live reload, which
+# is what you want while editing. With SERVER_MODE=production it runs
+# run_production() instead:
+#   * one worker process per CPU (WEB_CONCURRENCY overrides it); uvicorn
+#     restarts workers that die, and `kill -HUP <pid>` restarts them all,
+#   * uvloop and httptools when they are installed,
+#   * keep-alive longer than the usual load balancer idle timeout, a
+#     larger listen backlog and a grace period for in-flight requests,
+#   * no live reload.
+#
+# Workers are separate processes that each import main, so each one
+# warms its own caches: Warmup requests every cached page once in the
+# background as the worker starts, and /readyz only answers 200 once
+# that is done, so a load balancer holds traffic back until then.
+
+import asyncio
+import importlib.util
+import logging
+import os
+import time
+
+import httpx
+
+log = logging.getLogger("greenai.server")
+
+KEEP_ALIVE = 75         # seconds; longer than the 60 s idle timeout of most load balancers
+BACKLOG = 2048
+GRACEFUL_TIMEOUT = 30   # seconds to finish in-flight requests on shutdown
+# Browsers ask for compressed pages; warm the encodings they will get
+WARMUP_HEADERS = ({"accept-encoding": "br, gzip"}, {"accept-encoding": "gzip"})
+
+
+def worker_count() -> int:
+    return int(os.environ.get("WEB_CONCURRENCY") or os.cpu_count() or 1)
+
+
+def uvicorn_options(workers=None) -> dict:
+    "uvicorn settings for production, using the fastest event loop and HTTP parser available"
+    has = lambda name: importlib.util.find_spec(name) is not None
+    return {
+        "workers": workers or worker_count(),
+        "loop": "uvloop" if has("uvloop") else "asyncio",
+        "http": "httptools" if has("httptools") else "h11",
+        "timeout_keep_alive": int(os.environ.get("KEEP_ALIVE", KEEP_ALIVE)),
+        "backlog": int(os.environ.get("BACKLOG", BACKLOG)),
+        "timeout_graceful_shutdown": GRACEFUL_TIMEOUT,
+        "proxy_headers": True,
+        "forwarded_allow_ips": os.environ.get("FORWARDED_ALLOW_IPS", "127.0.0.1"),
+        "access_log": False,
+    }
+
+
+def run_production(app="main:app", host="0.0.0.0", port=None, workers=None):
+    "Serve `app` (an import string, so every worker imports it) with the production settings"
+    import uvicorn
+
+    port = port or int(os.environ.get("PORT", 5001))
+    options = uvicorn_options(workers)
+    print(f"Serving {app} on http://{host}:{port} with {options['workers']} workers "
+          f"({options['loop']}, {options['http']})")
+    uvicorn.run(app, host=host, port=port, **options)
+
+
+class Warmup:
+    "Requests pages through the app once at startup so the first visitor gets them from cache"
+
+    def __init__(self, app, paths, base_url="http://localhost", partial_prefixes=()):
+        self.app = app
+        self.paths = paths
+        self.partial_prefixes = tuple(partial_prefixes)
+        self.base_url = base_url
+        self.ready = False
+        self.seconds = None
+        self.task = None
+
+    async def start(self):
+        "Warm up in the background (an app startup handler); uvicorn accepts connections meanwhile"
+        if self.task is None:
+            self.task = asyncio.get_running_loop().create_task(self())
+
+    async def stop(self):
+        if self.task and not self.task.done():
+            self.task.cancel()
+        self.task = None
+
+    async def __call__(self):
+        "Request every page; a page that fails is logged and skipped, and the app is ready either way"
+        start = time.perf_counter()
+        transport = httpx.ASGITransport(app=self.app)
+        try:
+            async with httpx.AsyncClient(transport=transport, base_url=self.base_url) as client:
+                for path in self.paths:
+                    # Fragments are fetched by htmx, so warm the variant it gets
+                    hx = {"hx-request": "true"} if path.startswith(self.partial_prefixes) else {}
+                    for headers in WARMUP_HEADERS:
+                        try:
+                            resp = await client.get(path, headers={**headers, **hx})
+                        except Exception:
+                            log.exception("warmup: %s failed", path)
+                            break
+                        if resp.status_code != 200:
+                            log.warning("warmup: %s returned %s", path, resp.status_code)
+        finally:
+            # A page that can't be warmed is rendered on its first visit instead
+            self.seconds = time.perf_counter() - start
+            self.ready = True
+        log.info("warmed up %d pages in %.0f ms", len(self.paths), self.seconds * 1000)
@@ -0,0 +1,70 @@
+# greenai/streaming.py - Streamed HTML pages
+#
+# A FastHTML handler returns the whole component tree, which is turned
+# into one string before the first byte is sent, so the browser waits
+# for the slowest section before it can even start on the stylesheets,
+# fonts and hero image named in <head>. stream_page() sends a page in
+# pieces instead:
+#   * the shell (<head> with the app's headers, the navbar, the hero,
+#     everything up to Streamed()) is sent at once,
+#   * then each section from `sections` (a generator, an async generator
+#     or any iterable of components) as soon as it is rendered,
+#   * then the rest of the shell (footer, closing tags).
+# Sync generators run in a worker thread, like sync handlers, so a slow
+# section does not block other requests.
+#
+# The HTML is the same as the page FastHTML would have sent in one
+# piece. Compression streams them (greenai/compression.py) and PageCache
+# passes them on while it stores them (greenai/pagecache.py), so only a
+# cache miss streams; a hit is sent in one piece.
+
+from fasthtml.common import Link, NotStr, StreamingResponse, Title, respond, to_xml
+from starlette.concurrency import iterate_in_threadpool
+
+_MARKER = "<!-- greenai:streamed -->"
+
+# The Vary FastHTML puts on the HTML responses it builds itself
+_VARY = "HX-Request, HX-History-Restore-Request"
+
+
+def Streamed():
+    "Where the streamed sections go in a page's shell"
+    return NotStr(_MARKER)
+
+
+def split_shell(req, heads, shell) -> tuple[str, str]:
+    "The page FastHTML would send for `heads` and `shell`, split at Streamed()"
+    heads = list(heads)
+    if not any(getattr(h, "tag", "") == "title" for h in heads):
+        heads.append(Title(req.app.title))
+    if req.app.canonical:
+        heads.append(Link(rel="canonical", href=getattr(req, "canonical", req.url)))
+    html = to_xml(respond(req, heads, (shell,)))
+    before, sep, after = html.partition(_MARKER)
+    if not sep:
+        raise ValueError("the page shell has no Streamed() placeholder")
+    return before, after
+
+
+async def _rendered(sections):
+    "The HTML of each section; sync sections are built and serialized in a worker thread"
+    if hasattr(sections, "__aiter__"):
+        async for section in sections:
+            yield to_xml(section)
+    else:
+        async for html in iterate_in_threadpool(to_xml(section) for section in sections):
+            yield html
+
+
+def stream_page(req, heads, shell, sections, status_code=200, headers=None) -> StreamingResponse:
+    "Send `shell` up to Streamed() at once, then each of `sections` as it is rendered, then the rest"
+    before, after = split_shell(req, heads, shell)
+
+    async def body():
+        yield before
+        async for html in _rendered(sections):
+            yield html
+        yield after
+
+    headers = {"vary": _VARY, **(headers or {})}
+    return StreamingResponse(body(), status_code=status_code, headers=headers, media_type="text/html; charset=utf-8")
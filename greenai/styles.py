@@ -0,0 +1,337 @@
+# greenai/styles.py - Self-hosted fonts and critical CSS
+#
+# Every page used to start with render-blocking requests to other
+# hosts: page_styles @import-ed the Google Fonts stylesheet (which in
+# turn loads the font files from a third host), and the MonsterUI theme
+# links its stylesheets from a CDN. build_styles() vendors all of that
+# into public/ at build time:
+#   * the fonts we use are downloaded, cut down to the weights and
+#     glyphs that appear on the site and saved as WOFF2 in public/fonts,
+#   * the theme's stylesheets are saved in public/vendor,
+#   * the CSS rules needed by the navbar and hero (the part of the page
+#     visible without scrolling) are extracted into critical.css.
+# StyleHeaders() then inlines the critical CSS and the @font-face rules
+# (with font-display: swap), preloads the fonts and loads the full
+# stylesheets without blocking rendering.
+#
+# Building needs network access and fontTools (requirements-build.txt):
+#   python -m greenai.styles
+#   python -m greenai.styles --check   # fail when the build output is missing
+# Run python -m greenai.assets afterwards to fingerprint the new files.
+# Without a build, StyleHeaders() keeps the CDN stylesheets and loads
+# Google Fonts asynchronously instead, which is fine while developing;
+# deploys run the build (or --check) so production never falls back.
+
+import io
+import json
+import re
+import string
+import sys
+import urllib.parse
+from functools import cache
+from pathlib import Path
+
+from fasthtml.common import Link, Noscript, Style
+
+from greenai.assets import asset_url
+
+STATIC_DIR = Path("public")
+FONTS_DIR = "fonts"
+VENDOR_DIR = "vendor"
+MANIFEST = f"{VENDOR_DIR}/styles.json"
+# family -> weights used in page_styles
+FONTS = {"Inter": (400,), "Roboto Mono": (400,)}
+GOOGLE_FONTS_CSS = "https://fonts.googleapis.com/css2?{families}&display=swap"
+# Google Fonts only serves WOFF2 to browsers it knows support it
+USER_AGENT = "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36"
+# Classes the theme sets from JavaScript, so they never show up in the rendered HTML
+RUNTIME_CLASSES = {"uk-theme-green", "light", "dark"}
+
+
+def google_fonts_url(fonts=FONTS) -> str:
+    families = "&".join(f"family={name.replace(' ', '+')}:wght@{';'.join(map(str, weights))}"
+                        for name, weights in fonts.items())
+    return GOOGLE_FONTS_CSS.format(families=families)
+
+
+def fetch(url: str) -> bytes:
+    import urllib.request
+    req = urllib.request.Request(url, headers={"User-Agent": USER_AGENT})
+    with urllib.request.urlopen(req, timeout=30) as resp:
+        return resp.read()
+
+
+# ----------------- FONTS
+
+_FACE_RE = re.compile(r"/\*\s*([\w-]+)\s*\*/\s*@font-face\s*{([^}]*)}")
+_DESCRIPTOR_RE = re.compile(r"([\w-]+)\s*:\s*([^;]+);")
+
+
+def font_faces(css: str, subset="latin"):
+    "The @font-face blocks of a Google Fonts stylesheet for one unicode-range subset"
+    for name, body in _FACE_RE.findall(css):
+        if name == subset:
+            face = dict(_DESCRIPTOR_RE.findall(body))
+            yield {
+                "family": face["font-family"].strip("'\""),
+                "weight": int(face["font-weight"]),
+                "url": re.search(r"url\(([^)]+)\)", face["src"]).group(1),
+            }
+
+
+def subset_font(data: bytes, text: str, weight: int) -> bytes:
+    "WOFF2 of `data` with only the glyphs for `text` (variable fonts pinned to `weight`)"
+    from fontTools import subset
+    from fontTools.varLib import instancer
+
+    options = subset.Options()
+    options.flavor = "woff2"
+    options.layout_features = ["kern", "liga", "calt"]
+    font = subset.load_font(io.BytesIO(data), options)
+    if "fvar" in font:
+        font = instancer.instantiateVariableFont(font, {"wght": weight})
+    subsetter = subset.Subsetter(options)
+    subsetter.populate(text=text)
+    subsetter.subset(font)
+    out = io.BytesIO()
+    subset.save_font(font, out, options)
+    return out.getvalue()
+
+
+def build_fonts(static_dir: Path, text: str, fonts=FONTS, log=print):
+    "Download, subset and save the fonts; returns their manifest entries"
+    # Keep all of printable ASCII so new copy never falls back to another font
+    text = "".join(sorted(set(text) | set(string.printable.strip())))
+    (static_dir / FONTS_DIR).mkdir(parents=True, exist_ok=True)
+    entries = []
+    for face in font_faces(fetch(google_fonts_url(fonts)).decode()):
+        data = subset_font(fetch(face["url"]), text, face["weight"])
+        path = f"{FONTS_DIR}/{face['family'].lower().replace(' ', '-')}-{face['weight']}.woff2"
+        (static_dir / path).write_bytes(data)
+        entries.append({"family": face["family"], "weight": face["weight"], "path": f"/{path}"})
+        log(f"  {face['family']} {face['weight']}: {len(data)} B")
+    return entries
+
+
+# ----------------- CRITICAL CSS
+
+_COMMENT_RE = re.compile(r"/\*.*?\*/", re.S)
+_CLASS_RE = re.compile(r"\.((?:[\w-]|\\.)+)")
+_ID_RE = re.compile(r"#((?:[\w-]|\\.)+)")
+_TYPE_RE = re.compile(r"(?:^|[\s>+~(])([a-zA-Z][\w-]*)")
+_PSEUDO_RE = re.compile(r"::?[\w-]+(\((?:[^()]|\([^()]*\))*\))?")
+_FUNCTIONAL_RE = re.compile(r"::?([\w-]+)\(((?:[^()]|\([^()]*\))*)\)")
+# Pseudo-classes that match when any one of their selectors does
+_ANY_OF = {"is", "where", "matches", "-webkit-any", "-moz-any"}
+_ATTR_RE = re.compile(r"\[[^\]]*\]")
+_HTML_CLASS_RE = re.compile(r'\bclass="([^"]*)"')
+_HTML_ID_RE = re.compile(r'\bid="([^"]*)"')
+_HTML_TAG_RE = re.compile(r"<([a-zA-Z][\w-]*)")
+
+
+def css_blocks(css: str):
+    "Split CSS into top-level (prelude, body) pairs; body is None for statements like @import"
+    css = _COMMENT_RE.sub("", css)
+    i, start, n = 0, 0, len(css)
+    while i < n:
+        c = css[i]
+        if c in "\"'":
+            i = css.index(c, i + 1) + 1
+            continue
+        if c == ";" and css[start:i].strip().startswith("@"):
+            yield css[start:i].strip(), None
+            start = i + 1
+        elif c == "{":
+            depth, j = 1, i + 1
+            while depth and j < n:
+                if css[j] in "\"'":
+                    j = css.index(css[j], j + 1)
+                depth += {"{": 1, "}": -1}.get(css[j], 0)
+                j += 1
+            yield css[start:i].strip(), css[i + 1:j - 1]
+            i = start = j
+            continue
+        i += 1
+
+
+def split_selectors(prelude: str):
+    "Split a selector list on top-level commas (not those inside :is(...) etc.)"
+    parts, depth, start = [], 0, 0
+    for i, c in enumerate(prelude):
+        depth += {"(": 1, ")": -1}.get(c, 0)
+        if c == "," and depth == 0:
+            parts.append(prelude[start:i])
+            start = i + 1
+    return [p.strip() for p in parts + [prelude[start:]] if p.strip()]
+
+
+def _unescape(name: str) -> str:
+    return re.sub(r"\\(.)", r"\1", name)
+
+
+def selector_matches(selector: str, classes, ids, tags) -> bool:
+    "Whether every class, id and element in `selector` appears in the page (a safe over-approximation)"
+    rest = _ATTR_RE.sub("", selector)
+    # :is(a, b) needs one of its selectors; what :not() and :has() name
+    # may well be missing from the page, so they never rule a selector out
+    for name, args in _FUNCTIONAL_RE.findall(rest):
+        if name.lower() in _ANY_OF and not any(selector_matches(s, classes, ids, tags) for s in split_selectors(args)):
+            return False
+    rest = _FUNCTIONAL_RE.sub("", rest)
+    found_classes, found_ids = _CLASS_RE.findall(rest), _ID_RE.findall(rest)
+    rest = _PSEUDO_RE.sub("", _ID_RE.sub("", _CLASS_RE.sub("", rest)))
+    return (all(_unescape(c) in classes for c in found_classes)
+            and all(_unescape(i) in ids for i in found_ids)
+            and all(t.lower() in tags for t in _TYPE_RE.findall(rest)))
+
+
+def critical_css(css: str, html: str, extra_classes=RUNTIME_CLASSES) -> str:
+    "The rules of `css` that can apply to `html`"
+    classes = {c for attr in _HTML_CLASS_RE.findall(html) for c in attr.split()} | set(extra_classes)
+    ids = set(_HTML_ID_RE.findall(html))
+    tags = {t.lower() for t in _HTML_TAG_RE.findall(html)} | {"html", "body"}
+
+    def keep(css):
+        out = []
+        for prelude, body in css_blocks(css):
+            if body is None or prelude.startswith(("@font-face", "@keyframes", "@-webkit-keyframes")):
+                continue
+            if prelude.startswith(("@media", "@supports", "@layer")):
+                inner = keep(body)
+                if inner:
+                    out.append(f"{prelude}{{{inner}}}")
+                continue
+            if prelude.startswith("@"):
+                out.append(f"{prelude}{{{body.strip()}}}")
+                continue
+            selectors = [s for s in split_selectors(prelude) if selector_matches(s, classes, ids, tags)]
+            if selectors:
+                out.append(f"{','.join(selectors)}{{{body.strip()}}}")
+        return "".join(out)
+    return keep(css)
+
+
+# ----------------- STYLESHEETS
+
+def stylesheet_urls(headers):
+    "URLs of the external stylesheets linked by `headers`"
+    return [h.attrs["href"] for h in headers
+            if getattr(h, "tag", "") == "link" and h.attrs.get("rel") == "stylesheet" and "://" in h.attrs.get("href", "")]
+
+
+def vendor_stylesheet(static_dir: Path, url: str):
+    "Save the stylesheet at `url` in public/vendor; returns its path on the site and its CSS"
+    css = fetch(url).decode()
+    # Relative references (fonts, icons) keep pointing at the CDN
+    css = re.sub(r"url\((['\"]?)(?!data:|https?:|/)([^'\")]+)\1\)",
+                 lambda m: f"url({m.group(1)}{urllib.parse.urljoin(url, m.group(2))}{m.group(1)})", css)
+    package = re.search(r"/npm/([\w-]+)@", url)
+    name = Path(urllib.parse.urlsplit(url).path).name
+    path = f"{VENDOR_DIR}/{package.group(1)}-{name}" if package else f"{VENDOR_DIR}/{name}"
+    (static_dir / path).write_text(css)
+    return f"/{path}", css
+
+
+def build_styles(headers, critical_html: str, text: str, static_dir=STATIC_DIR, log=print) -> dict:
+    "Vendor fonts and stylesheets and extract the critical CSS"
+    static_dir = Path(static_dir)
+    (static_dir / VENDOR_DIR).mkdir(parents=True, exist_ok=True)
+    manifest = {"fonts": build_fonts(static_dir, text, log=log), "stylesheets": {}}
+    sheets = []
+    for url in stylesheet_urls(headers):
+        path, css = vendor_stylesheet(static_dir, url)
+        manifest["stylesheets"][url] = path
+        sheets.append(css)
+        log(f"  {url} -> {path}")
+    critical = critical_css("\n".join(sheets), critical_html)
+    (static_dir / VENDOR_DIR / "critical.css").write_text(critical)
+    manifest["critical"] = f"/{VENDOR_DIR}/critical.css"
+    (static_dir / MANIFEST).write_text(json.dumps(manifest, indent=2) + "\n")
+    log(f"Vendored {len(manifest['fonts'])} fonts and {len(sheets)} stylesheets, "
+        f"{len(critical)} B of critical CSS")
+    return manifest
+
+
+# ----------------- HEADERS
+
+@cache
+def styles_manifest(static_dir=STATIC_DIR):
+    path = Path(static_dir) / MANIFEST
+    return json.loads(path.read_text()) if path.exists() else None
+
+
+def missing_build(static_dir=STATIC_DIR) -> list[str]:
+    "The files build_styles() writes that are missing from `static_dir`"
+    static_dir = Path(static_dir)
+    if not (static_dir / MANIFEST).exists():
+        return [f"/{MANIFEST}"]
+    manifest = json.loads((static_dir / MANIFEST).read_text())
+    paths = [f["path"] for f in manifest["fonts"]] + list(manifest["stylesheets"].values()) + [manifest["critical"]]
+    return [p for p in paths if not (static_dir / p.lstrip("/")).exists()]
+
+
+@cache
+def critical_styles(static_dir=STATIC_DIR) -> str:
+    manifest = styles_manifest(static_dir)
+    path = Path(static_dir) / manifest["critical"].lstrip("/")
+    return path.read_text() if path.exists() else ""
+
+
+def DeferredStylesheet(href: str):
+    "Stylesheet that loads without blocking the first render"
+    return (
+        Link(rel="preload", _as="style", href=href, onload="this.onload=null;this.rel='stylesheet'"),
+        Noscript(Link(rel="stylesheet", href=href)),
+    )
+
+
+def StyleHeaders(headers, static_dir=STATIC_DIR):
+    "`headers` with vendored fonts, inlined critical CSS and deferred stylesheets"
+    manifest = styles_manifest(static_dir)
+    if manifest is None:
+        return (
+            Link(rel="preconnect", href="https://fonts.googleapis.com"),
+            Link(rel="preconnect", href="https://fonts.gstatic.com", crossorigin=True),
+            *headers,
+            *DeferredStylesheet(google_fonts_url()),
+        )
+    faces = "".join(
+        f"@font-face{{font-family:'{f['family']}';font-style:normal;font-weight:{f['weight']};"
+        f"font-display:swap;src:url({asset_url(f['path'])}) format('woff2')}}"
+        for f in manifest["fonts"]
+    )
+    out = [Link(rel="preload", _as="font", type="font/woff2", href=asset_url(f["path"]), crossorigin=True)
+           for f in manifest["fonts"]]
+    out.append(Style(faces + critical_styles(static_dir)))
+    for h in headers:
+        href = getattr(h, "attrs", {}).get("href")
+        if getattr(h, "tag", "") == "link" and href in manifest["stylesheets"]:
+            out += DeferredStylesheet(asset_url(manifest["stylesheets"][href]))
+        else:
+            out.append(h)
+    return tuple(out)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    static_dir = next((a for a in argv if not a.startswith("--")), STATIC_DIR)
+    if "--check" in argv:
+        missing = missing_build(static_dir)
+        for path in missing:
+            print(f"missing {path}; run python -m greenai.styles")
+        return 1 if missing else 0
+
+    import main as site
+    from fasthtml.common import to_xml
+    from starlette.testclient import TestClient
+    from greenai.export import route_paths
+
+    client = TestClient(site.app)
+    pages = [client.get(path) for path in route_paths(site.app)]
+    text = re.sub(r"<[^>]+>", " ", " ".join(r.text for r in pages if r.headers.get("content-type", "").startswith("text/html")))
+    build_styles(site.theme_headers, to_xml((site.NavbarSection(), site.HeroSection())), text, static_dir)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,7 +3,27 @@
 # ----------------- IMPORTS
 from fasthtml.common import *
 from monsterui.all import *
+import os
+import sys
 from datetime import datetime
+from functools import cache
+from pathlib import Path
+from urllib.parse import urlencode
+from greenai.assets import AssetServer
+from greenai.blog import PostStore, etag_for, not_modified, post_response
+from greenai.compression import Compression, compression_metrics, compression_report
+from greenai.content import ContentStore
+from greenai.embeds import EmbedHeaders, FormEmbed, YouTubeEmbed
+from greenai.fragments import fragment, fragments
+from greenai.images import ImagePreload, ResponsiveImg
+from greenai.metrics import Metrics, after_handler, before_handler, find_middleware, registry
+from greenai.pagecache import PageCache, load_snapshot
+from greenai.server import Warmup, run_production
+from greenai.streaming import Streamed, stream_page
+from greenai.styles import StyleHeaders
+
+# Markdown is parsed once per string; see greenai/fragments.py
+render_md = fragment(render_md)
 
 # ----------------- LINKS & FORMS
 general_interest_link = "https://forms.gle/P9Gr877opgAxsftJ7"
@@ -11,12 +31,74 @@ team_interest_link = "https://forms.gle/pBrZJNgp6PeqGN886"
 all_events_link = "https://lu.ma/stanfordgreenai"
 workshop_link = "https://lu.ma/stanfordgreenai?k=c&tag=workshop"
 seminar_link = "https://lu.ma/stanfordgreenai?k=c&tag=seminar"
+site_url = os.environ.get("SITE_URL", "https://stanfordgreenai.com")
+
+# ----------------- CONTENT
+# The navbar links, team, initiatives and projects are stored in SQLite
+# (see greenai/content.py); edit them there. The lists below only fill
+# a new, empty database.
+content_seed = {
+    "nav_links": [
+        {"label": "About", "href": "/about"},
+        {"label": "Events", "href": all_events_link},
+        {"label": "Hackathon", "href": "https://lu.ma/3pkrjzk3"},
+        {"label": "Projects", "href": "/projects"},
+        {"label": "Blog", "href": "/blog/posts"},
+        {"label": "Contact", "href": "/contact"},
+        {"label": "Join", "href": general_interest_link},
+    ],
+    "team_members": [
+        {"name": "Alice Heiman", "role": "Stanford Green AI", "major": "Computer Science", "email": "aheiman@stanford.edu",
+         "linkedin": "https://www.linkedin.com/in/alice-heiman/", "github": "https://github.com/aliceheiman"},
+        {"name": "Jerry Huang", "role": "Green AI Institute", "major": "Computer Science & Economics",
+         "email": "contact@greenai.institute", "linkedin": "", "github": ""},
+    ],
+    "initiatives": [
+        {"title": "Green-in AI Hackathon", "info": "@ Stanford Climate Week, Oct 18 9am-9pm",
+         "description": "12-hour tech+policy hackathon to develop and shape energy-efficient AI tools.",
+         "image": "/assets/hackathon.png", "link_text": "Learn More & Register", "link": "https://lu.ma/3pkrjzk3"},
+        {"title": "Hands-on Interdisciplinary Workshops in Green AI", "info": "Every Week, Location TBD",
+         "description": "Hands-on sessions from sustainable computing, AI policy, to the economics of AI infrastructure.",
+         "image": "/assets/workshops.png", "link_text": "See Workshop Schedule", "link": workshop_link},
+        {"title": "Lunch Seminars and Industry Panels", "info": "Lunch Provided, Location TBD",
+         "description": "Attend talks with Stanford faculty and Industry professionals advancing Green AI across disciplines.",
+         "image": "/assets/seminars.jpg", "link_text": "Register Interest", "link": seminar_link},
+    ],
+    "projects": [
+        {"title": "The Stanford Green AI Explorer",
+         "description": "Explore and track GreenAI work at Stanford University through our interactive dashboard.",
+         "image": "/assets/green-dots.png", "link": "/projects", "featured": 1, "year": 2025},
+    ],
+}
+content = ContentStore(os.environ.get("CONTENT_DB", "data/content.db"), seed=content_seed)
+
+# ----------------- EVENTS
+# Upcoming events come from EVENTS_SOURCE: the lu.ma calendar's
+# iCalendar feed URL, or a local .ics/.json file. They are fetched in the
+# background and kept in data/events.json (see greenai/events.py), so no
+# request ever waits for lu.ma. Without a source only the lu.ma links
+# are shown. The cache is created on first use (when the app starts at
+# the latest), so importing main doesn't import greenai/events.py.
+@cache
+def events():
+    from greenai.events import EventsCache, source_for
+    return EventsCache(source_for(os.environ.get("EVENTS_SOURCE")),
+                       snapshot=os.environ.get("EVENTS_SNAPSHOT", "data/events.json"))
+
+async def start_events():
+    await events().start()
+
+async def stop_events():
+    await events().stop()
+
+max_events = 6
 
 # ----------------- BASE STYLES, COLOR, & FONTS
+# Fonts (Inter, Roboto Mono) and the theme's stylesheets are self-hosted
+# and loaded without blocking the page; see greenai/styles.py
+theme_headers = Theme.green.headers(mode="light")
 page_styles = Style(
 """
-@import url('https://fonts.googleapis.com/css2?family=Inter&family=Roboto+Mono&family=Merriweather&display=swap');
-
 :root {
     --primary-color: #397B5B;
     --light-color: #72EFAC;
@@ -65,15 +147,65 @@ p.lift {
 """
 )
 
+# ----------------- PAGE CACHE
+# Pages are rendered once and then served from memory. Bump the
+# content version (or set CONTENT_VERSION when deploying) to drop every
+# cached page; the cache is also dropped when the content database is
+# edited or the year changes.
+content_version = os.environ.get("CONTENT_VERSION", "1")
+
+def site_version():
+    "Deploy-time content version plus the version of the content database"
+    return f"{content_version}.{content.version()}"
+cached_pages = ["/", "/about", "/contact", "/projects"]
+
+# With PAGE_SNAPSHOT=dist the cache starts out filled with the pages of
+# the last static export (python main.py build), as long as it was built
+# for the same content version and year, so no first request renders.
+page_snapshot = load_snapshot(os.environ["PAGE_SNAPSHOT"]) if os.environ.get("PAGE_SNAPSHOT") else None
+
+# `python main.py build` pre-renders the site instead of serving it;
+# SERVER_MODE=production python main.py serves it with several workers
+building = __name__ == "__main__" and sys.argv[1:2] == ["build"]
+production = os.environ.get("SERVER_MODE") == "production"
+
+# `python main.py` is local development and reloads pages on every code
+# change. Imported by a server (Vercel, uvicorn) the app runs without
+# the live-reload websocket and script. uvicorn's reloader imports main
+# again in a child process, so the setting is passed on in the environment.
+if __name__ == "__main__" and not building and not production:
+    os.environ.setdefault("LIVE_RELOAD", "1")
+live_reload = os.environ.get("LIVE_RELOAD") == "1"
+
 # ----------------- WEBPAGE
 app, rt = fast_app(
     hdrs=(
-        Theme.green.headers(mode="light"),
+        *StyleHeaders(theme_headers),
         page_styles,
+        *EmbedHeaders(),
     ),
+    before=before_handler,
+    middleware=[
+        Middleware(Metrics),
+        Middleware(Compression),
+        Middleware(AssetServer, directory="public"),
+        Middleware(PageCache, paths=cached_pages, version=site_version, snapshot=page_snapshot),
+    ],
     static_path="public",
-    live=True,
+    live=live_reload,
+    title="Stanford Green AI",
+    # Links between pages swap only <main> (see PAGE LAYOUT)
+    exts="preload",
+    bodykw={"hx_boost": "true", "hx_target": "#main", "hx_swap": "innerHTML show:window:top", "hx_ext": "preload"},
 )
+# Every worker renders the cached pages once as it starts (see /readyz)
+warmup = Warmup(app, cached_pages, base_url=site_url, partial_prefixes=("/fragments/",))
+if production:
+    app.router.on_startup.append(warmup.start)
+    app.router.on_shutdown.append(warmup.stop)
+app.router.on_startup.append(start_events)
+app.router.on_shutdown.append(stop_events)
+app.after.append(after_handler)
 
 # @rt("/{fname:path}.{ext:static}")
 # async def get(fname: str, ext: str): 
@@ -91,6 +223,10 @@ app, rt = fast_app(
 #
 # See FastHTML and MonsterUI (https://monsterui.answer.ai/api_ref/)
 # for more details and examples.
+#
+# Components marked @fragment are turned into HTML once and then reused
+# by every page (see greenai/fragments.py). Only mark components whose
+# output depends on nothing but their arguments.
 
 def Section(tagtext: str, title: str, bcolor=None, *args, **kwargs):
     "Section with nice spacing including a header and any content"
@@ -158,28 +294,37 @@ def ImageCaption(src: str, caption: str, source_text: str|None, source_link: str
             A(source_text, href=source_link, target="_blank"),
             style={"text-align": "center"}
         )
-    return Img(
+    return Div(
+        ResponsiveImg(src, sizes="(min-width: 700px) 700px, 100vw"),
         P_caption,
-        src=src,
     )
 
 # --------- NAVBAR
-# Here you can edit the links you want to display in the main navbar
+# The links come from the nav_links table (see CONTENT above)
+@fragment(key=content.version)
 def NavbarSection():
     return (
         NavBar(
-            A("About", href="/about"),
-            A("Events", href="https://lu.ma/stanfordgreenai"),
-            A("Hackathon", href="https://lu.ma/3pkrjzk3"),
-            A("Projects", href="/projects"),
-            A("Blog", href="/blog/posts"),
-            A("Contact", href="/contact"),
-            A("Join", href=general_interest_link),
-            brand=A(Img(src="/assets/logo.png", width=150), href="/"),
+            *[SiteLink(link["label"], link["href"]) for link in content.nav_links()],
+            brand=SiteLink(ResponsiveImg("/assets/logo.png", sizes="150px", lazy=False, width=150), "/"),
+            menu_id="navbar-menu",
             cls="ml-0 mr-0 mb-2",
         ),
     )
 
+# Links to other pages of the site are boosted: htmx fetches only the
+# new page's <main> and swaps it in (see PAGE LAYOUT), after prefetching
+# it when the link is hovered. The blog is made of Quarto documents with
+# their own <head>, so links to it always load the whole page.
+full_page_prefixes = ("/blog", "/resources")
+
+def SiteLink(text, href: str, **kwargs):
+    if href.startswith(full_page_prefixes):
+        kwargs["hx_boost"] = "false"
+    elif href.startswith("/"):
+        kwargs["preload"] = "mouseover"
+    return A(text, href=href, **kwargs)
+
 # --------- FOOTER
 # Here you can edit the links you want to display in the footer
 def SocialIcon(icon: str, link: str):
@@ -188,11 +333,12 @@ def SocialIcon(icon: str, link: str):
         href="/"
     )
 
+@fragment(key=lambda: datetime.now().year)
 def FooterSection():
     current_year = str(datetime.now().year)
     return Div(
         Div(
-            Img(src="/assets/logo.png", width=200),
+            ResponsiveImg("/assets/logo.png", sizes="200px", width=200),
         ),
         DivHStacked(
             SocialIcon("instagram", "/"),
@@ -200,12 +346,13 @@ def FooterSection():
             SocialIcon("linkedin", "/"),
         ),
         DivHStacked(
-            A("Contact", href="/contact"),
-            A("Blog", href="/blog/posts"),
-            A("Projects", href="/projects"),
+            SiteLink("Contact", "/contact"),
+            SiteLink("Blog", "/blog/posts"),
+            SiteLink("Projects", "/projects"),
             A("Events", href="https://lu.ma/stanfordgreenai"),
         ),
-        Iframe(src="https://docs.google.com/forms/d/e/1FAIpQLSecLXLmDEJz7_HYF6sgjlZURLkEypPEeORhZFYrj_Z0h69Msw/viewform?embedded=true", width="100%", height="300", frameborder="0", marginheight="0", marginwidth="0"),
+        # Google Forms' scripts load only when the form is opened (see greenai/embeds.py)
+        FormEmbed("https://docs.google.com/forms/d/e/1FAIpQLSecLXLmDEJz7_HYF6sgjlZURLkEypPEeORhZFYrj_Z0h69Msw/viewform?embedded=true", "Stay up to date with Stanford Green AI"),
         DivCentered(P(f"{current_year} © Stanford Green AI"), cls="mt-6"),
         style={"background-color": "var(--gray-color)", "padding": "14px"},
         cls="mt-8 space-y-4",
@@ -213,6 +360,7 @@ def FooterSection():
 
 # ----------------- SECTIONS
 
+@fragment
 def HeroSection():
     "Creates a hero-styled header with centered text and two buttons"
 
@@ -227,8 +375,10 @@ def HeroSection():
     return Div(
         Div(
             # Background image
-            Img(
-                src="/assets/green-pattern.png",
+            ResponsiveImg(
+                "/assets/green-pattern.png",
+                lazy=False,
+                fetchpriority="high",
                 style={
                     **cover_style,
                     "object-fit": "cover",
@@ -281,6 +431,7 @@ def HeroSection():
         )
     )
 
+@fragment
 def OurMission():
     md = """Stanford GreenAI is a student-driven community dedicated to advancing sustainable artificial intelligence.
 
@@ -300,10 +451,11 @@ Learn more about [GreenAI Institute](https://www.greenai.institute/).
         ImageCaption("/assets/green-ai-workflow.jpg", "Green AI Algorithms.", "Source: (Bolón-Canedo et al., 2024)", "https://www-sciencedirect-com.stanford.idm.oclc.org/science/article/pii/S0925231224008671")
     )
 
+@fragment(key=content.version)
 def CurrentInitiatives():
     def InitiativeCard(title, info, description, src, link_text="Learn More", link="/", ):
         return Card(
-            Img(src=src, style={"height": "200px", "width": "100%", "object-fit": "cover"}),
+            ResponsiveImg(src, sizes="(min-width: 1024px) 340px, (min-width: 700px) 700px, 100vw", style={"height": "200px", "width": "100%", "object-fit": "cover"}),
             H3(title),
             Span(info, style={"color": "primary-color"}),
             P(description, style={"margin": "16px 0"}),
@@ -311,9 +463,8 @@ def CurrentInitiatives():
         )
 
     initiatives = [
-        InitiativeCard("Green-in AI Hackathon", "@ Stanford Climate Week, Oct 18 9am-9pm", "12-hour tech+policy hackathon to develop and shape energy-efficient AI tools.", "/assets/hackathon.png", "Learn More & Register", "https://lu.ma/3pkrjzk3"),
-        InitiativeCard("Hands-on Interdisciplinary Workshops in Green AI", "Every Week, Location TBD", "Hands-on sessions from sustainable computing, AI policy, to the economics of AI infrastructure.", "/assets/workshops.png", "See Workshop Schedule", workshop_link),
-        InitiativeCard("Lunch Seminars and Industry Panels", "Lunch Provided, Location TBD", "Attend talks with Stanford faculty and Industry professionals advancing Green AI across disciplines.", "/assets/seminars.jpg", "Register Interest", seminar_link)
+        InitiativeCard(i["title"], i["info"], i["description"], i["image"], i["link_text"], i["link"])
+        for i in content.initiatives()
     ]
 
     return Section(
@@ -327,6 +478,7 @@ def CurrentInitiatives():
         
     )
 
+@fragment(key=content.version)
 def Projects():
     def Project(title, description, imgsrc, link="/"):
         return Grid(
@@ -335,7 +487,7 @@ def Projects():
                 P(description, style={"color": "#fff"}),
             ),
             Grid(
-                Img(src=imgsrc, style={"height": "150px", "width": "100%", "object-fit": "cover"}),
+                ResponsiveImg(imgsrc, sizes="(min-width: 700px) 350px, 100vw", style={"height": "150px", "width": "100%", "object-fit": "cover"}),
                 
                 LinkButton("Learn More", link),
                 style={"background-color": "#ffffff", "padding": "12px", "width": "100%", "border-radius": "8px"},
@@ -345,7 +497,8 @@ def Projects():
         )
 
     featured_projects = [
-        Project("The Stanford Green AI Explorer", "Explore and track GreenAI work at Stanford University through our interactive dashboard.", "/assets/green-dots.png", "/projects"),
+        Project(p["title"], p["description"], p["image"], p["link"])
+        for p in content.projects(featured=True)
     ]
 
     return Section(
@@ -372,6 +525,7 @@ def RegisterSignup():
         cls="divround"
     )
 
+@fragment
 def Resources():
     md = """We curate tools, readings, and references for understanding and building Green AI.
 * Check out the [Green AI Summit 2025](https://www.greenai.institute/2025summit)
@@ -388,6 +542,7 @@ def Resources():
         RegisterSignup()
     )
 
+@fragment
 def FAQ():
     return Section(
         "FAQ",
@@ -397,7 +552,7 @@ def FAQ():
             AccordionItem(
                 "What is Green AI?",
                 P('According to ', A("(Bolón-Canedo et al., 2024)", href="https://www-sciencedirect-com.stanford.idm.oclc.org/science/article/pii/S0925231224008671", target="_blank"),' Green AI is an "AI paradigm which incorporates sustainable practices and techniques in model design, training, and deployment that aim to reduce the associated environmental cost and carbon footprint."'),
-                P("For more information, check out our ", A("Resources", href="/resources"), "."),
+                P("For more information, check out our ", SiteLink("Resources", "/resources"), "."),
             ),
             AccordionItem(
                 "How do I join Stanford Green AI?",
@@ -409,6 +564,7 @@ def FAQ():
         ),
     ),
 
+@fragment
 def Contact():
     return Section(
         "CONTACT",
@@ -417,26 +573,140 @@ def Contact():
         LinkButton("Contact Us", "/contact", targetblank=False)
     )
 
+# --------- LAZY SECTIONS
+# Sections below the fold are left out of the first response. The page
+# holds a placeholder that loads the section from /fragments/<name> once
+# it is scrolled into view. Without JavaScript the placeholder is a
+# plain link to the same URL, which then shows the section as a page.
+lazy_sections = {
+    # name: (component, link text, placeholder height)
+    "resources": (Resources, "Resources", "420px"),
+    "faq": (FAQ, "Frequently Asked Questions", "300px"),
+    "contact": (Contact, "Contact Us", "150px"),
+    "footer": (FooterSection, "Contact, Blog & Events", "560px"),
+}
+cached_pages += [f"/fragments/{name}" for name in lazy_sections]
+
+def LazySection(name: str):
+    "Placeholder that is swapped for the section `name` when it comes into view"
+    _, text, height = lazy_sections[name]
+    return Div(
+        A(text, href=f"/fragments/{name}", hx_boost="false"),
+        hx_get=f"/fragments/{name}",
+        hx_trigger="revealed",
+        hx_target="this",
+        hx_swap="outerHTML",
+        style={"min-height": height},
+    )
+
+# --------- EVENTS
+# Rendered from memory only; events.version() changes when a background
+# refresh brings new events, and the hour drops events that have ended.
+
+def EventItem(event):
+    from greenai.events import TZ
+    start = event.start.astimezone(TZ)
+    return Div(
+        Span(f"{start:%a, %b} {start.day} · {start:%I:%M %p}".replace(" 0", " ")),
+        H4(A(event.title, href=event.url) if event.url else event.title),
+        P(event.location) if event.location else None,
+        cls="space-y-1",
+    )
+
+@fragment(key=lambda: (events().version(), datetime.now().strftime("%Y-%m-%d %H")))
+def UpcomingEvents():
+    upcoming = events().upcoming(limit=max_events)
+    # Without a source there is nothing to list, not "no events"
+    empty = [P("No upcoming events are scheduled yet. Check back soon!")] if events().source is not None else []
+    return Section(
+        "EVENTS",
+        "Upcoming Events",
+        None,
+        Div(
+            *([EventItem(e) for e in upcoming] or empty),
+            P(A("See all events on lu.ma", href=all_events_link)),
+            cls="space-y-4",
+        ),
+        id="events",
+    )
+
+def LazyEvents():
+    "Placeholder like LazySection(); /events isn't page-cached since events change on their own"
+    return Div(
+        A("Upcoming Events", href="/events", hx_boost="false"),
+        hx_get="/events",
+        hx_trigger="revealed",
+        hx_target="this",
+        hx_swap="outerHTML",
+        style={"min-height": "200px"},
+    )
+
+@rt("/events")
+async def get(htmx: HtmxHeaders):
+    events().revalidate()
+    if htmx.request and not htmx.boosted:
+        return UpcomingEvents()
+    return Page(htmx, UpcomingEvents(), title="Upcoming Events", footer=False)
+
 # ----------------- PAGES
 # Below are the actual pages of the website, i.e. the pages
 # that display when you type / or /routes in the url bar.
 
-# --------- HOME PAGE
-@rt("/")
-def get():
+# --------- PAGE LAYOUT
+# Every page is the navbar, a <main id="main"> and the footer. A boosted
+# request (a click on a link to another page, see SiteLink) only gets
+# the new title and the content of <main>, which htmx swaps in and
+# pushes to the history; loading the URL directly gets the whole page.
+# The footer sits outside <main>, so a boosted response also sends it
+# out of band: pages without a footer empty #page-footer, the others
+# put the footer's placeholder back.
+
+def PageFooter(footer=True, oob=False):
+    return Div(LazySection("footer") if footer else None, id="page-footer", hx_swap_oob="true" if oob else None)
+
+def PageShell(*content, footer=True):
+    "The navbar, <main id=\"main\"> holding `content`, and the footer"
     return Container(
         NavbarSection(),
-        HeroSection(),
-        OurMission(),
-        CurrentInitiatives(),
-        Projects(),
-        Resources(),
-        FAQ(),
-        Contact(),
-        FooterSection()
+        Main(*content, id="main"),
+        PageFooter(footer),
     )
 
+def Page(htmx: HtmxHeaders, *content, title: str = None, footer=True):
+    title = Title(f"{title} - Stanford Green AI" if title else "Stanford Green AI")
+    if htmx.boosted and not htmx.history_restore_request:
+        return title, *content, PageFooter(footer, oob=True)
+    return title, PageShell(*content, footer=footer)
+
+# A streamed page sends the head, navbar and `content` at once and then
+# each of `sections` as it is rendered, so the browser fetches the
+# stylesheets, fonts and hero image meanwhile (see greenai/streaming.py).
+# Partial responses are small and are sent in one piece.
+
+def StreamedPage(req, htmx: HtmxHeaders, *content, sections=(), heads=(), title: str = None, footer=True):
+    if htmx.request and not htmx.history_restore_request:
+        return *heads, *Page(htmx, *content, *sections, title=title, footer=footer)
+    title, shell = Page(htmx, *content, Streamed(), title=title, footer=footer)
+    return stream_page(req, [*heads, title], shell, sections)
+
+# --------- HOME PAGE
+def home_sections():
+    yield OurMission()
+    yield CurrentInitiatives()
+    yield Projects()
+    if events().source is not None:
+        yield LazyEvents()
+    yield LazySection("resources")
+    yield LazySection("faq")
+    yield LazySection("contact")
+
+@rt("/")
+def get(req, htmx: HtmxHeaders):
+    return StreamedPage(req, htmx, HeroSection(), sections=home_sections(),
+                        heads=[ImagePreload("/assets/green-pattern.png")])
+
 # --------- ABOUT PAGE
+@fragment
 def AboutUs():
     md_1 = """### Why Green AI?
 
@@ -463,14 +733,16 @@ Curious to learn more? Check out the [2025 Green AI Summit](https://www.youtube.
         None,
         render_md(md_1),
         Grid(
-            Iframe(width="100%", height="350", src="https://www.youtube.com/embed/dZokRm7esxU?si=Zz-O8aIKsf2KXHsc", title="YouTube video player", frameborder="0", allow="accelerometer; autoplay; clipboard-write; encrypted-media; gyroscope; picture-in-picture; web-share", referrerpolicy="strict-origin-when-cross-origin", allowfullscreen=True),
-            Iframe(width="100%", height="350", src="https://www.youtube.com/embed/QjFHNz33wAs?si=7AvgSoKUX_ta226K", title="YouTube video player", frameborder="0", allow="accelerometer; autoplay; clipboard-write; encrypted-media; gyroscope; picture-in-picture; web-share", referrerpolicy="strict-origin-when-cross-origin", allowfullscreen=True),
+            # Thumbnails until played; the player loads on click (see greenai/embeds.py)
+            YouTubeEmbed("https://www.youtube.com/embed/dZokRm7esxU?si=Zz-O8aIKsf2KXHsc", "Stanford Green AI"),
+            YouTubeEmbed("https://www.youtube.com/embed/QjFHNz33wAs?si=7AvgSoKUX_ta226K", "2025 Green AI Summit"),
             col_sm=1,
             col_md=2,
         ),
         render_md(md_2),
     )
 
+@fragment(key=content.version)
 def Team():
     def _TeamMember(name, role, major, email="", linkedin=None, github=None):
         def get_icon(major):
@@ -493,8 +765,8 @@ def Team():
                 )
             ))
     team = [
-        _TeamMember("Alice Heiman", "Stanford Green AI", "Computer Science", "aheiman@stanford.edu", "https://www.linkedin.com/in/alice-heiman/", "https://github.com/aliceheiman"),
-        _TeamMember("Jerry Huang", "Green AI Institute", "Computer Science & Economics", "contact@greenai.institute", "", ""),
+        _TeamMember(m["name"], m["role"], m["major"], m["email"], m["linkedin"], m["github"])
+        for m in content.team()
     ]
     return Section(
         "TEAM",
@@ -505,16 +777,12 @@ def Team():
     )
 
 @rt("/about")
-def get():
-    return Container(
-        NavbarSection(),
-        AboutUs(),
-        Team(),
-        FooterSection()
-    )
+def get(htmx: HtmxHeaders):
+    return Page(htmx, AboutUs(), Team(), title="About")
 
 # --------- CONTACT PAGE
 
+@fragment
 def ContactBox():
     md = """For ideas, sponsorship opportunities or general inquiries, contact `aheiman@stanford.edu`."""
 
@@ -526,56 +794,269 @@ def ContactBox():
     )
 
 @rt("/contact")
-def get():
-    return Container(
-        NavbarSection(),
-        ContactBox(),
-        Team(),
-        FooterSection()
-    )
+def get(htmx: HtmxHeaders):
+    return Page(htmx, ContactBox(), Team(), title="Contact")
 
 # --------- PROJECTS PAGE
+# The Stanford Green AI Explorer: search and filter the projects in the
+# content database (queries in greenai/explorer.py). Typing or picking
+# a filter swaps in /projects/results via HTMX; without JavaScript the
+# form and the "More projects" link load /projects with the same query.
+# Both need the app server: the static export (python main.py build)
+# only has the unfiltered first page of /projects.
 
+@fragment
 def SeeProjects():
     return Section(
         "OUR PROJECTS",
         "Explore Green-in and Green-by AI Projects",
         None,
-        Alert(
-            DivLAligned(UkIcon('info'), 
-                    P("This page is currently under construction. Please check back soon!")),
-                    cls=AlertT.info)
+        P("Search Green AI work at Stanford, or narrow it down by type, department and year."),
     )
 
-@rt("/projects")
-def get():
-    return Container(
-        NavbarSection(),
-        SeeProjects(),
-        # FooterSection()
+# Years outside this range (or not plain ASCII digits) count as no year
+PROJECT_YEARS = range(1900, 2101)
+
+# The explorer's queries (greenai/explorer.py) are imported by the
+# functions below that need them, on the first visit to /projects
+
+def project_filters(q: str, category: str, department: str, year: str):
+    from greenai.explorer import ProjectFilters
+    year = int(year) if year.isascii() and year.isdigit() else None
+    return ProjectFilters(q.strip(), category, department, year if year in PROJECT_YEARS else None)
+
+def ProjectCard(project):
+    from greenai.explorer import CATEGORIES
+    return Card(
+        H4(project["title"]),
+        P(project["description"]),
+        footer=DivHStacked(
+            Span(CATEGORIES[project["category"]]) if project["category"] in CATEGORIES else None,
+            Span(project["department"]) if project["department"] else None,
+            Span(str(project["year"])) if project["year"] else None,
+            A("Learn More", href=project["link"]) if project["link"] else None,
+            cls="space-x-4",
+        ),
     )
 
+def FacetSelect(name: str, label: str, options, selected):
+    "Native <select> (MonsterUI's Select is a web component HTMX can't read)"
+    from greenai.explorer import CATEGORIES
+    return ft_hx(
+        "select",
+        Option(f"All {label}", value=""),
+        *[Option(f"{CATEGORIES.get(value, value)} ({n})", value=value, selected=str(value) == str(selected or ""))
+          for value, n in options],
+        name=name,
+        aria_label=label,
+        cls="uk-select",
+    )
+
+def ProjectFacets(filters, oob=False):
+    from greenai.explorer import facets
+    counts = facets(content, filters)
+    return Grid(
+        FacetSelect("category", "types", counts["category"], filters.category),
+        FacetSelect("department", "departments", counts["department"], filters.department),
+        FacetSelect("year", "years", counts["year"], filters.year),
+        id="project-facets",
+        hx_swap_oob="true" if oob else None,
+        cols_sm=1, cols_md=3,
+    )
+
+def ProjectResults(filters, after=None):
+    "One page of results and a link to the next; the HTMX response to the explorer form"
+    from greenai.explorer import count_projects, search_projects
+    projects, next_cursor = search_projects(content, filters, after)
+    more = None
+    if next_cursor:
+        params = urlencode(filters.params(after=next_cursor))
+        more = Div(
+            A("More projects", href=f"/projects?{params}", hx_get=f"/projects/results?{params}",
+              hx_target="#more-projects", hx_swap="outerHTML"),
+            id="more-projects",
+            cls="mt-4",
+        )
+    if after is None:
+        total = count_projects(content, filters)
+        header = P(f"{total} project{'s' if total != 1 else ''}", cls="mb-2")
+        return header, *[ProjectCard(p) for p in projects], more
+    return *[ProjectCard(p) for p in projects], more
+
+def ProjectExplorer(filters, after=None):
+    return Form(
+        DivHStacked(
+            Input(type="search", name="q", value=filters.q, placeholder="Search projects", aria_label="Search projects"),
+            Button("Search", type="submit", cls=ButtonT.primary),
+        ),
+        ProjectFacets(filters),
+        Div(*tuplify(ProjectResults(filters, after)), id="project-results", cls="space-y-4 mt-4"),
+        action="/projects",
+        method="get",
+        hx_get="/projects/results",
+        hx_trigger="input changed delay:250ms from:input[name=q], change from:select, submit",
+        hx_target="#project-results",
+        hx_swap="innerHTML",
+        cls="section space-y-4 mt-4",
+    )
+
+@rt("/projects")
+def get(htmx: HtmxHeaders, q: str = "", category: str = "", department: str = "", year: str = "", after: str = ""):
+    filters = project_filters(q, category, department, year)
+    return Page(htmx, SeeProjects(), ProjectExplorer(filters, after or None), title="Projects", footer=False)
+
+@rt("/projects/results")
+def get(q: str = "", category: str = "", department: str = "", year: str = "", after: str = ""):
+    filters = project_filters(q, category, department, year)
+    if after:
+        return ProjectResults(filters, after)
+    # A new search: the facet counts change too
+    return *tuplify(ProjectResults(filters)), ProjectFacets(filters, oob=True)
+
 # --------- BLOG PAGE
-@rt("/blog/posts/{postname}")
-def get(postname: str):
-    if postname != "":
-        return Redirect(f"/blog/posts/{postname}.html")
-    else:
-        return Redirect("/blog/posts/index.html")
+# Posts are served straight from memory (see greenai/blog.py). Set
+# BLOG_CHROME=1 to show them inside the site's navbar and footer instead
+# of Quarto's own page.
+blog_posts = PostStore("public/blog/posts", url_prefix="/blog/posts/")
+blog_chrome = os.environ.get("BLOG_CHROME") == "1"
+
+def BlogPost(post):
+    return NotStr(to_xml(PageShell(Div(NotStr(post.main), cls="section"))))
+
+def blog_page(req, postname: str):
+    post = blog_posts.get(postname)
+    if post is None:
+        return Response("404 Not Found", status_code=404)
+    if req.headers.get("hx-boosted"):
+        # A boosted link that should have been a plain one (see SiteLink)
+        return Response(headers={"HX-Redirect": str(req.url)})
+    if not blog_chrome:
+        return post_response(req, post)
+    # The navbar and footer come from the content database, so a content
+    # edit changes the page as much as the post itself does
+    version, year = site_version(), datetime.now().year
+    etag = etag_for(post.etag, version, year)
+    if not_modified(req, etag):
+        return Response(status_code=304, headers={"etag": etag})
+    return (
+        Title(post.title),
+        blog_posts.wrapped(post, BlogPost, key=(version, year)),
+        HttpHeader("ETag", etag),
+        HttpHeader("Cache-Control", "no-cache"),
+    )
 
-    # with open(f"public/blog/posts/{postname}/index.html") as f:
-    #     post_content = f.read()
-    # return Container(
-    #     NavbarSection(),
-    #     Html(post_content),
-    #     FooterSection()
-    # )
+@rt("/fragments/{name}")
+def get(htmx: HtmxHeaders, name: str):
+    if name not in lazy_sections:
+        return Response("404 Not Found", status_code=404)
+    section, text, _ = lazy_sections[name]
+    if htmx.request and not htmx.boosted:
+        return section()
+    # Without JavaScript the section is shown as a page of its own
+    return Page(htmx, section(), title=text, footer=name != "footer")
+
+@rt("/blog/posts")
+def get(req):
+    return blog_page(req, "index")
+
+@rt("/blog/posts/{postname}")
+def get(req, postname: str):
+    return blog_page(req, postname)
 
 # --------- RESOURCES PAGE
 @rt("/resources")
+def get(req):
+    return blog_page(req, "resources")
+
+
+# --------- BLOG SEARCH
+# Searches the sections of the blog (public/blog/search.json). Returns
+# JSON, or a list of results when called from HTMX, e.g.
+# Input(name="q", hx_get="/api/search", hx_trigger="keyup changed delay:200ms", hx_target="#results")
+# The index is built when the app starts; greenai/search.py is only
+# imported then, not by a cold import of main.
+@cache
+def search_index():
+    from greenai.search import SearchIndex
+    return SearchIndex("public/blog/search.json", url_prefix="/blog/")
+
+async def start_search():
+    await search_index().start()
+
+app.router.on_startup.append(start_search)
+
+def SearchResults(hits):
+    if not hits:
+        return P("No matching posts.")
+    return Ul(
+        *[Li(A(H4(h["title"] + (f" – {h['section']}" if h["section"] else "")), href=h["href"]), P(h["snippet"]))
+          for h in hits],
+        cls="space-y-2",
+    )
+
+@rt("/api/search")
+def get(htmx: HtmxHeaders, q: str = "", k: int = 10):
+    hits = search_index().hits(q, min(max(k, 1), 50))
+    if htmx.request:
+        return SearchResults(hits)
+    return {"query": q, "hits": hits}
+
+# --------- SITE STATS
+# Compression ratio and CPU time per route, used to tune the levels in
+# greenai/compression.py
+@rt("/_stats/compression")
+def get():
+    return compression_report()
+
+# Request counts, latency, response sizes and render/serialize time per
+# route, plus the page cache and compression counters, for Prometheus
+def page_cache_metrics():
+    cache = find_middleware(app, PageCache)
+    yield "# TYPE greenai_page_cache_hits_total counter"
+    yield f"greenai_page_cache_hits_total {cache.hits}"
+    yield "# TYPE greenai_page_cache_misses_total counter"
+    yield f"greenai_page_cache_misses_total {cache.misses}"
+
+registry.extra += [compression_metrics, page_cache_metrics, fragments.metrics, lambda: events().metrics()]
+
+@rt("/metrics")
 def get():
-    return Redirect(f"/blog/posts/resources.html")
+    return Response(registry.exposition(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+# Readiness check for load balancers: 503 until the worker has warmed
+# up its caches (only done in production)
+@rt("/readyz")
+def get():
+    if production and not warmup.ready:
+        return Response("warming up", status_code=503)
+    return Response("ready")
+
+# --------- STATIC EXPORT
+# Pre-renders every page into `out_dir` (default: dist/) together with
+# the files in public/, so a CDN can serve the site without Python.
+# The explorer's results and the events listing depend on the query
+# string or change on their own, so they are not exported.
+# Run with: python main.py build [out_dir]
+def route_params():
+    "Values for the path parameters of the routes, to list every page"
+    posts = [p.stem for p in Path("public/blog/posts").glob("*.html")]
+    return {"postname": posts, "name": list(lazy_sections)}
 
+def build_site(out_dir="dist"):
+    from greenai.embeds import build_thumbnails, thumbnail_manifest, videos_in
+    from greenai.export import export_site
+    # Thumbnails for videos added since the last build (kept when offline)
+    build_thumbnails(videos_in(__file__), "public")
+    thumbnail_manifest.cache_clear()
+    return export_site(app, out_dir, static_dir="public", params=route_params(),
+                       base_url=site_url, partial_prefixes=("/fragments/",),
+                       dynamic=("/projects/results", "/events"),
+                       meta={"generation": [site_version(), datetime.now().year]})
 
 # --------- SERVE THE PAGE
-serve()
+if building:
+    build_site(*sys.argv[2:3])
+elif production and __name__ == "__main__":
+    run_production("main:app")
+else:
+    serve()
@@ -0,0 +1,29 @@
+import gzip
+import os
+
+from starlette.applications import Starlette
+from starlette.testclient import TestClient
+
+from greenai.assets import AssetServer
+
+
+def client_for(directory):
+    return TestClient(AssetServer(Starlette(), directory=directory))
+
+
+def test_serves_sidecar_for_unchanged_file(tmp_path):
+    (tmp_path / "app.js").write_text("console.log('new')")
+    (tmp_path / "app.js.gz").write_bytes(gzip.compress(b"console.log('new')"))
+    response = client_for(tmp_path).get("/app.js", headers={"accept-encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.text == "console.log('new')"
+
+
+def test_ignores_sidecar_older_than_its_file(tmp_path):
+    (tmp_path / "app.js.gz").write_bytes(gzip.compress(b"console.log('old')"))
+    (tmp_path / "app.js").write_text("console.log('new')")
+    stat = (tmp_path / "app.js").stat()
+    os.utime(tmp_path / "app.js.gz", ns=(stat.st_atime_ns, stat.st_mtime_ns - 1_000_000_000))
+    response = client_for(tmp_path).get("/app.js", headers={"accept-encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+    assert response.text == "console.log('new')"
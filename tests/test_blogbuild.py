@@ -0,0 +1,113 @@
+import json
+import os
+import sys
+
+import pytest
+
+from greenai.blogbuild import build_blog, replace_entries
+
+# Stands in for `quarto render <page>`: writes the page, its search entries
+# and, for a listing, the listing of the other pages in the private copy
+FAKE_QUARTO = f"""#!{sys.executable}
+import json, re, sys
+from pathlib import Path
+source = Path(sys.argv[2])
+title = re.search(r"^title: (.*)$", source.read_text(), re.M).group(1)
+page = source.with_suffix(".html").as_posix()
+out = Path("public/blog")
+(out / page).parent.mkdir(parents=True, exist_ok=True)
+(out / page).write_text(f"<html><title>{{title}}</title></html>")
+entries = [{{"objectID": page, "href": page, "title": title, "section": "", "text": title}},
+           {{"objectID": page + "#more", "href": page + "#more", "title": title, "section": "More", "text": ""}}]
+(out / "search.json").write_text(json.dumps(entries))
+if "listing:" in source.read_text():
+    items = sorted("/" + p.with_suffix(".html").as_posix() for p in source.parent.glob("*.qmd") if p != source)
+    (out / "listings.json").write_text(json.dumps([{{"listing": "/" + page, "items": items}}]))
+"""
+
+
+def page(title, listing=False):
+    return f"---\ntitle: {title}\n" + ("listing: {}\n" if listing else "") + "---\n\nText.\n"
+
+
+@pytest.fixture
+def blog(tmp_path):
+    quarto = tmp_path / "fake-quarto"
+    quarto.write_text(FAKE_QUARTO)
+    quarto.chmod(0o755)
+    root = tmp_path / "site"
+    (root / "posts").mkdir(parents=True)
+    (root / "_quarto.yml").write_text("project:\n  type: website\n  output-dir: public/blog\n")
+    (root / "posts" / "index.qmd").write_text(page("Blog", listing=True))
+    (root / "posts" / "a.qmd").write_text(page("A"))
+    (root / "posts" / "b.qmd").write_text(page("B"))
+
+    def build():
+        return build_blog(root, jobs=2, quarto=str(quarto), log=lambda *a: None)
+
+    def indexes():
+        out = root / "public" / "blog"
+        search = json.loads((out / "search.json").read_text())
+        return [(e["href"], e["title"]) for e in search], json.loads((out / "listings.json").read_text())
+
+    return root, build, indexes
+
+
+def test_build_renders_every_page(blog):
+    root, build, indexes = blog
+    assert build()["rendered"] == ["posts/a.qmd", "posts/b.qmd", "posts/index.qmd"]
+    search, listings = indexes()
+    assert search == [("posts/a.html", "A"), ("posts/a.html#more", "A"), ("posts/b.html", "B"),
+                      ("posts/b.html#more", "B"), ("posts/index.html", "Blog"), ("posts/index.html#more", "Blog")]
+    assert listings == [{"listing": "/posts/index.html", "items": ["/posts/a.html", "/posts/b.html"]}]
+    assert (root / "_blog_build.json").exists()
+    assert build()["rendered"] == []
+
+
+def test_update_renders_the_page_and_its_listing(blog):
+    root, build, indexes = blog
+    build()
+    (root / "posts" / "a.qmd").write_text(page("A, retitled"))
+    assert build()["rendered"] == ["posts/a.qmd", "posts/index.qmd"]
+    search, _ = indexes()
+    # The page's entries are replaced where they were
+    assert search[:3] == [("posts/a.html", "A, retitled"), ("posts/a.html#more", "A, retitled"), ("posts/b.html", "B")]
+    assert "A, retitled" in (root / "public" / "blog" / "posts" / "a.html").read_text()
+
+
+def test_update_of_body_renders_only_the_page(blog):
+    root, build, _ = blog
+    build()
+    (root / "posts" / "b.qmd").write_text(page("B") + "More text.\n")
+    assert build()["rendered"] == ["posts/b.qmd"]
+
+
+def test_add_page(blog):
+    root, build, indexes = blog
+    build()
+    (root / "posts" / "c.qmd").write_text(page("C"))
+    assert build()["rendered"] == ["posts/c.qmd", "posts/index.qmd"]
+    search, listings = indexes()
+    assert ("posts/c.html", "C") in search and len(search) == 8
+    assert listings[0]["items"] == ["/posts/a.html", "/posts/b.html", "/posts/c.html"]
+
+
+def test_remove_page(blog):
+    root, build, indexes = blog
+    build()
+    os.remove(root / "posts" / "b.qmd")
+    result = build()
+    assert result["removed"] == ["posts/b.qmd"] and result["rendered"] == ["posts/index.qmd"]
+    search, listings = indexes()
+    assert [href for href, _ in search if href.startswith("posts/b.html")] == []
+    assert listings[0]["items"] == ["/posts/a.html"]
+    assert not (root / "public" / "blog" / "posts" / "b.html").exists()
+    assert "posts/b.qmd" not in json.loads((root / "_blog_build.json").read_text())
+
+
+def test_replace_entries_keeps_position():
+    search = [{"href": "a.html"}, {"href": "b.html"}, {"href": "b.html#x"}, {"href": "c.html"}]
+    replace_entries(search, "b.html", [{"href": "b.html", "new": True}])
+    assert search == [{"href": "a.html"}, {"href": "b.html", "new": True}, {"href": "c.html"}]
+    replace_entries(search, "d.html", [{"href": "d.html"}])
+    assert search[-1] == {"href": "d.html"}
@@ -0,0 +1,27 @@
+import subprocess
+import sys
+
+from greenai.coldstart import BUDGET_MS, LAZY_MODULES, check_budget, offenders, parse_importtime
+
+
+def test_parse_importtime():
+    stderr = ("import time: self [us] | cumulative | imported package\n"
+              "import time:       120 |        120 |   fasthtml.core\n"
+              "import time:        40 |        300 | main\n")
+    assert parse_importtime(stderr) == {"fasthtml.core": (120, 120, 1), "main": (40, 300, 0)}
+
+
+def test_offenders():
+    report = {"module": "main", "total_ms": 900.0, "own_ms": 25.0, "modules": ["main", "greenai.export"]}
+    assert offenders(report, 30, lazy=()) == []
+    assert offenders(report, 20, lazy=()) == ["import main took 25.0 ms after the frameworks (budget 20.0 ms)"]
+    assert offenders(report, None, lazy=("greenai.export", "PIL")) == ["greenai.export is imported at startup"]
+
+
+def test_main_imports_no_lazy_modules():
+    code = f"import sys, main; print(' '.join(m for m in {LAZY_MODULES!r} if m in sys.modules))"
+    assert subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout.split() == []
+
+
+def test_main_cold_start_within_budget():
+    assert check_budget(BUDGET_MS) == []
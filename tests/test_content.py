@@ -0,0 +1,19 @@
+from greenai.content import ContentStore, in_memory_copy
+
+SEED = {"nav_links": [{"label": "About", "href": "/about"}]}
+
+
+def test_in_memory_copy_of_deployed_database(tmp_path):
+    path = tmp_path / "content.db"
+    store = ContentStore(path, seed=SEED)
+    store.db["nav_links"].update(1, {"label": "About us"})
+    store.db.conn.close()
+    db = in_memory_copy(path)
+    assert [row["label"] for row in db["nav_links"].rows] == ["About us"]
+    db.conn.close()
+
+
+def test_in_memory_copy_without_database(tmp_path):
+    db = in_memory_copy(tmp_path / "missing.db")
+    assert db.table_names() == []
+    db.conn.close()
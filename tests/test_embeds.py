@@ -0,0 +1,73 @@
+import io
+import json
+
+import pytest
+from fasthtml.common import to_xml
+from PIL import Image
+
+from greenai import assets, embeds
+from greenai.embeds import YouTubeEmbed, build_thumbnails
+
+VIDEO = "dZokRm7esxU"
+URL = f"https://www.youtube.com/embed/{VIDEO}?si=abc"
+
+
+def jpeg(width=640, height=480):
+    "A 4:3 thumbnail with the video letterboxed in it, like YouTube's"
+    im = Image.new("RGB", (width, height))
+    im.paste((40, 120, 80), (0, 60, width, height - 60))
+    buf = io.BytesIO()
+    im.save(buf, "JPEG")
+    return buf.getvalue()
+
+
+@pytest.fixture
+def site(tmp_path, monkeypatch):
+    "A checkout with an empty public/, as the current directory"
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "public").mkdir()
+    yield tmp_path / "public"
+    embeds.thumbnail_manifest.cache_clear()
+    assets.asset_manifest.cache_clear()
+
+
+def render(url, title):
+    embeds.thumbnail_manifest.cache_clear()
+    assets.asset_manifest.cache_clear()
+    return to_xml(YouTubeEmbed(url, title))
+
+
+def test_build_thumbnails(site):
+    fetched = []
+
+    def fetch(url):
+        fetched.append(url)
+        if "maxresdefault" in url:
+            raise OSError("404")
+        return jpeg()
+
+    manifest = build_thumbnails([VIDEO], site, fetch=fetch, log=lambda *a: None)
+    entry = manifest[VIDEO]
+    assert fetched == [f"https://i.ytimg.com/vi/{VIDEO}/maxresdefault.jpg", f"https://i.ytimg.com/vi/{VIDEO}/sddefault.jpg"]
+    assert (entry["width"], entry["height"]) == (640, 360)
+    assert entry["src"].startswith(f"/assets/embeds/{VIDEO}.") and entry["src"].endswith(".webp")
+    assert json.loads((site / "assets/embeds/manifest.json").read_text()) == manifest
+    with Image.open(site / entry["src"].lstrip("/")) as im:
+        assert im.format == "WEBP" and im.size == (640, 360)
+
+    html = render(URL, "Stanford Green AI")
+    assert f'src="{entry["src"]}"' in html and 'width="640" height="360"' in html
+    assert "ytimg" not in html
+
+    # Built thumbnails are kept without fetching them again
+    assert build_thumbnails([VIDEO], site, fetch=None, log=lambda *a: None) == manifest
+
+
+def test_video_without_thumbnail_shows_title(site):
+    def fetch(url):
+        raise OSError("no network")
+
+    assert build_thumbnails([VIDEO], site, fetch=fetch, log=lambda *a: None) == {}
+    html = render(URL, "Stanford Green AI")
+    assert "<img" not in html and "ytimg" not in html
+    assert '<span class="embed-title">Stanford Green AI</span>' in html
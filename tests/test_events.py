@@ -0,0 +1,158 @@
+import asyncio
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from greenai import events as events_module
+from greenai.events import Event, EventsCache
+
+NOW = datetime(2026, 10, 18, 12, tzinfo=timezone.utc)
+TALK = Event("Talk", NOW + timedelta(days=1))
+WORKSHOP = Event("Workshop", NOW + timedelta(days=2))
+
+
+class Clock:
+    "Stands in for the time module: wall clock and monotonic time move together"
+
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+class StubSource:
+    "Returns the next of `results` on each fetch; an exception in it is raised"
+
+    def __init__(self, *results):
+        self.results = list(results)
+        self.fetches = 0
+
+    async def fetch(self):
+        self.fetches += 1
+        result = self.results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(events_module, "time", clock)
+    return clock
+
+
+def cache(source, tmp_path, **kwargs):
+    return EventsCache(source, snapshot=tmp_path / "events.json", ttl=100, stale=1000, retry=10, **kwargs)
+
+
+def revalidated(events):
+    "Run revalidate() in an event loop and wait for the refresh it started, if any"
+    async def go():
+        events.revalidate()
+        if events.refreshing is not None:
+            await events.refreshing
+    asyncio.run(go())
+
+
+def test_fresh_then_stale_then_expired(clock, tmp_path):
+    events = cache(StubSource([TALK]), tmp_path)
+    assert events.state() == "empty"
+    assert asyncio.run(events.refresh())
+    assert events.state() == "fresh" and events.events == [TALK]
+    clock.advance(99)
+    assert events.state() == "fresh"
+    clock.advance(2)
+    assert events.state() == "stale"
+    clock.advance(1000)
+    assert events.state() == "expired"
+
+
+def test_stale_while_revalidate(clock, tmp_path):
+    source = StubSource([TALK], [TALK, WORKSHOP])
+    events = cache(source, tmp_path)
+    asyncio.run(events.refresh())
+    version = events.version()
+
+    revalidated(events)  # fresh: no fetch
+    assert source.fetches == 1
+
+    clock.advance(150)
+    assert events.state() == "stale"
+    assert events.upcoming(now=NOW) == [TALK]  # served while stale
+    revalidated(events)
+    assert source.fetches == 2
+    assert events.state() == "fresh" and events.upcoming(now=NOW) == [TALK, WORKSHOP]
+    assert events.version() > version
+
+
+def test_error_backoff_keeps_last_good_list(clock, tmp_path):
+    source = StubSource([TALK], OSError("down"), OSError("down"), OSError("down"), [WORKSHOP])
+    events = cache(source, tmp_path)
+    asyncio.run(events.refresh())
+    clock.advance(150)
+
+    revalidated(events)
+    assert events.events == [TALK] and events.refreshes == {"ok": 1, "error": 1}
+    assert events.backoff() == 10
+
+    # No new fetch until the retry time
+    clock.advance(9)
+    revalidated(events)
+    assert source.fetches == 2
+    clock.advance(1)
+    revalidated(events)
+    assert source.fetches == 3 and events.backoff() == 20
+    clock.advance(20)
+    revalidated(events)
+    assert source.fetches == 4 and events.backoff() == 40
+
+    # The delay doubles up to the TTL
+    events.failures = 10
+    assert events.backoff() == 100
+    events.failures = 3
+
+    clock.advance(40)
+    revalidated(events)
+    assert events.events == [WORKSHOP] and events.failures == 0 and events.state() == "fresh"
+
+
+def test_slow_fetch_times_out(clock, tmp_path):
+    class SlowSource:
+        async def fetch(self):
+            await asyncio.sleep(10)
+
+    events = cache(SlowSource(), tmp_path, timeout=0.01)
+    events.events = [TALK]
+    assert not asyncio.run(events.refresh())
+    assert events.events == [TALK] and events.refreshes["error"] == 1
+
+
+def test_snapshot_fallback(clock, tmp_path):
+    first = cache(StubSource([TALK, WORKSHOP]), tmp_path)
+    asyncio.run(first.refresh())
+    saved = json.loads((tmp_path / "events.json").read_text())
+    assert [e["title"] for e in saved["events"]] == ["Talk", "Workshop"]
+
+    # A new process shows the snapshot before (and without) a good fetch
+    clock.advance(50)
+    second = cache(StubSource(OSError("down")), tmp_path)
+    assert second.events == [TALK, WORKSHOP] and second.state() == "fresh"
+    clock.advance(100)
+    assert second.state() == "stale"
+    revalidated(second)
+    assert second.events == [TALK, WORKSHOP] and second.refreshes["error"] == 1
+
+
+def test_unreadable_snapshot_is_ignored(clock, tmp_path):
+    (tmp_path / "events.json").write_text("{not json")
+    events = cache(StubSource(), tmp_path)
+    assert events.events == [] and events.state() == "empty"
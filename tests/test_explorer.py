@@ -0,0 +1,23 @@
+import pytest
+from starlette.testclient import TestClient
+
+from greenai.explorer import parse_cursor
+
+
+def test_parse_cursor():
+    assert parse_cursor("2024.137") == (2024, 137)
+    assert parse_cursor("-1.0") == (-1, 0)
+    assert parse_cursor("") is None
+    assert parse_cursor("2024") is None
+    assert parse_cursor("١٢.٣") is None
+    assert parse_cursor("9999999999999999999999.1") is None
+    assert parse_cursor("1.9223372036854775808") is None
+
+
+@pytest.mark.parametrize("query", ["year=²", "year=99999999999999999999", "year=1066",
+                                   "after=9999999999999999999999.1", "year=2024&after=2024.1"])
+def test_odd_queries_are_not_errors(query):
+    import main
+    client = TestClient(main.app)
+    assert client.get(f"/projects?{query}").status_code == 200
+    assert client.get(f"/projects/results?{query}").status_code == 200
@@ -0,0 +1,45 @@
+from datetime import datetime
+
+from fasthtml.common import Div, FastHTML, P
+from starlette.testclient import TestClient
+
+from greenai.pagecache import CachedPage, PageCache, Snapshot
+from greenai.streaming import Streamed, stream_page
+
+VARY = "hx-request, hx-history-restore-request, hx-boosted"
+
+
+def make_app(snapshot=None):
+    app = FastHTML()
+
+    @app.route("/page")
+    def get():
+        return P("page")
+
+    @app.route("/streamed")
+    def get(req):
+        return stream_page(req, [], Div(Streamed()), [P("one"), P("two")])
+
+    return app, PageCache(app, paths={"/page", "/snapshot"}, version="v", snapshot=snapshot)
+
+
+def test_cached_pages_vary_on_every_key_header():
+    app, cache = make_app()
+    client = TestClient(cache)
+    for _ in range(2):  # the miss, then the hit
+        assert client.get("/page").headers.get_list("vary") == [VARY]
+
+
+def test_snapshot_pages_vary_on_every_key_header():
+    page = CachedPage(200, [(b"content-type", b"text/html; charset=utf-8")], b"<p>snapshot</p>")
+    app, cache = make_app(Snapshot(("v", datetime.now().year), {("/snapshot", b""): page}))
+    response = TestClient(cache).get("/snapshot")
+    assert response.text == "<p>snapshot</p>"
+    assert response.headers.get_list("vary") == [VARY]
+
+
+def test_streamed_pages_keep_fasthtml_vary():
+    app, _ = make_app()
+    response = TestClient(app).get("/streamed")
+    assert "<p>one</p>\n<p>two</p>" in response.text
+    assert response.headers["vary"] == "HX-Request, HX-History-Restore-Request"
@@ -0,0 +1,36 @@
+from types import SimpleNamespace
+
+import pytest
+from starlette.testclient import TestClient
+
+
+@pytest.fixture(scope="module")
+def main():
+    import main
+    return main
+
+
+@pytest.fixture(scope="module")
+def client(main):
+    return TestClient(main.app)
+
+
+@pytest.mark.parametrize("path", ["/about", "/projects", "/fragments/faq", "/fragments/footer"])
+def test_pages_have_main_and_footer(client, path):
+    html = client.get(path).text
+    assert 'id="main"' in html and 'id="page-footer"' in html
+
+
+def test_boosted_fragment_fallback_swaps_footer(client):
+    html = client.get("/fragments/faq", headers={"HX-Request": "true", "HX-Boosted": "true"}).text
+    assert "<title>" in html and 'hx-swap-oob="true"' in html
+
+
+def test_lazy_fragment_is_the_section_alone(client):
+    html = client.get("/fragments/faq", headers={"HX-Request": "true"}).text
+    assert 'id="main"' not in html and "page-footer" not in html
+
+
+def test_blog_post_chrome(main):
+    html = str(main.BlogPost(SimpleNamespace(main="<p>post</p>")))
+    assert 'id="main"' in html and 'id="page-footer"' in html and "<p>post</p>" in html
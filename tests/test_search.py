@@ -0,0 +1,38 @@
+import json
+
+from greenai.search import SearchIndex
+
+ENTRIES = [
+    {"objectID": "a.html", "href": "a.html", "title": "Sustainable training", "section": "", "text": "energy use"},
+    {"objectID": "b.html", "href": "b.html", "title": "Sustainability", "section": "", "text": "grid carbon"},
+    {"objectID": "c.html", "href": "c.html", "title": "Solar", "section": "", "text": "energy storage"},
+]
+
+
+def index_of(tmp_path, entries=ENTRIES):
+    path = tmp_path / "search.json"
+    path.write_text(json.dumps(entries))
+    index = SearchIndex(path)
+    index.refresh()
+    return index
+
+
+def test_prefix_matches_every_expansion(tmp_path):
+    index = index_of(tmp_path)
+    assert {e["objectID"] for _, e in index.search("sustain")} == {"a.html", "b.html"}
+    assert [e["objectID"] for _, e in index.search("sustain energy")][0] == "a.html"
+    assert index.search("missing") == []
+
+
+def test_prefix_scores_are_cached_per_index(tmp_path):
+    index = index_of(tmp_path)
+    first = index.search("sustain")
+    assert "sustain" in index.index.prefixes and "energy" not in index.index.prefixes
+    index.index.results.clear()
+    assert index.search("sustain") == first
+    old = index.index
+    index.path.write_text(json.dumps(ENTRIES[2:]))
+    index.index.mtime = None  # treat the file as changed
+    index.refresh()
+    assert index.index is not old and index.index.prefixes == {}
+    assert index.search("sustain") == []
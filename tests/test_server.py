@@ -0,0 +1,30 @@
+import asyncio
+
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+from greenai.server import Warmup
+
+
+def boom(request):
+    raise RuntimeError("boom")
+
+
+def ok(request):
+    return PlainTextResponse("ok")
+
+
+def test_warmup_is_ready_after_a_failing_page(caplog):
+    app = Starlette(routes=[Route("/boom", boom), Route("/ok", ok)])
+    calls = []
+
+    async def counting(scope, receive, send):
+        calls.append(scope["path"])
+        await app(scope, receive, send)
+
+    warmup = Warmup(counting, ["/boom", "/ok"])
+    asyncio.run(warmup())
+    assert warmup.ready and warmup.seconds is not None
+    assert calls.count("/ok") == 2 and calls.count("/boom") == 1
+    assert "warmup: /boom failed" in caplog.text
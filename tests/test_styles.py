@@ -0,0 +1,66 @@
+import json
+
+from greenai.styles import critical_css, missing_build, selector_matches
+
+CLASSES, IDS, TAGS = {"uk-navbar", "hero", "btn"}, {"main"}, {"html", "body", "div", "a", "nav"}
+
+
+def matches(selector):
+    return selector_matches(selector, CLASSES, IDS, TAGS)
+
+
+def test_selector_matches_needs_every_class_id_and_tag():
+    assert matches(".uk-navbar a")
+    assert matches("#main > div.hero")
+    assert matches("a.btn:hover::after")
+    assert matches("a[href^='https']")
+    assert not matches(".missing")
+    assert not matches("#other .hero")
+    assert not matches("ul .btn")
+
+
+def test_selector_matches_keeps_negations():
+    assert matches(".btn:not(.disabled)")
+    assert matches("div:not(:first-child)")
+    assert matches(".uk-navbar:has(> .missing)")
+    assert not matches(".missing:not(.btn)")
+
+
+def test_selector_matches_any_of():
+    assert matches(":is(.hero, .missing) a")
+    assert matches("a:where(.btn)")
+    assert not matches(":is(.missing, .gone) a")
+
+
+def test_critical_css_keeps_matching_rules_only():
+    css = """
+    /* theme */
+    @import url("other.css");
+    .hero { color: red }
+    .missing, .btn:not(.disabled) { margin: 0 }
+    @media (min-width: 640px) { .uk-navbar { display: flex } .card { padding: 1px } }
+    @media print { .card { display: none } }
+    @font-face { font-family: X; src: url(x.woff2) }
+    @keyframes spin { to { transform: rotate(1turn) } }
+    """
+    html = '<nav class="uk-navbar"><div class="hero"><a class="btn" href="/">Go</a></div></nav>'
+    assert critical_css(css, html) == (
+        ".hero{color: red}"
+        ".btn:not(.disabled){margin: 0}"
+        "@media (min-width: 640px){.uk-navbar{display: flex}}"
+    )
+
+
+def test_critical_css_keeps_runtime_classes():
+    assert critical_css(".uk-theme-green .hero { color: green }", '<div class="hero"></div>') == \
+        ".uk-theme-green .hero{color: green}"
+
+
+def test_missing_build(tmp_path):
+    assert missing_build(tmp_path) == ["/vendor/styles.json"]
+    (tmp_path / "vendor").mkdir()
+    (tmp_path / "vendor" / "critical.css").write_text("")
+    manifest = {"fonts": [{"family": "Inter", "weight": 400, "path": "/fonts/inter-400.woff2"}],
+                "stylesheets": {}, "critical": "/vendor/critical.css"}
+    (tmp_path / "vendor" / "styles.json").write_text(json.dumps(manifest))
+    assert missing_build(tmp_path) == ["/fonts/inter-400.woff2"]